@@ -0,0 +1,122 @@
+import random
+from pathlib import Path
+
+import pymupdf
+from langchain_core.documents import Document
+
+from pdf_ask.backend.loader import LocalLoader
+from pdf_ask.backend.spliter import LinearTokenTextSplitter
+from pdf_ask.backend.vector_store import FaissVectorStore
+
+import pytest
+from benchmarks.fakes import LatencyEmbeddings
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "qua", "tor", "bel"]
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+CHUNKS_PER_DOCUMENT = 50
+PDF_PAGES = 20
+ATTRIBUTES = [
+    "operating temperature",
+    "rated voltage",
+    "maximum pressure",
+    "service interval",
+    "warranty period",
+]
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def make_corpus(
+    documents: int = 40, facts_per_document: int = 5, seed: int = 0
+) -> tuple[list[Document], list[tuple[str, str]]]:
+    """Generate a fixed synthetic corpus with planted, retrievable facts.
+
+    Returns:
+        The documents and a list of (question, expected value) pairs.
+    """
+    rng = random.Random(seed)
+    vocabulary = [_word(rng) for _ in range(2000)]
+    corpus, questions = [], []
+    for document_index in range(documents):
+        paragraphs = []
+        for fact_index in range(facts_per_document):
+            product = f"{_word(rng)}{document_index}x{fact_index}"
+            attribute = rng.choice(ATTRIBUTES)
+            value = f"v{rng.randint(100000, 999999)}"
+            filler = " ".join(rng.choices(vocabulary, k=rng.randint(80, 160)))
+            paragraphs.append(f"{filler} The {attribute} of the {product} is {value}.")
+            questions.append((f"What is the {attribute} of the {product}?", value))
+        corpus.append(
+            Document(
+                page_content="\n\n".join(paragraphs),
+                metadata={"source": f"document_{document_index}.txt"},
+            )
+        )
+    return corpus, questions
+
+
+def write_pdf(path: Path, document: Document, pages: int) -> None:
+    """Write the paragraphs of a document over the pages of a PDF file."""
+    paragraphs = document.page_content.split("\n\n")
+    per_page = -(-len(paragraphs) // pages)
+    pdf = pymupdf.open()
+    for start in range(0, len(paragraphs), per_page):
+        page = pdf.new_page()
+        page.insert_textbox(
+            pymupdf.Rect(36, 36, page.rect.width - 36, page.rect.height - 36),
+            "\n\n".join(paragraphs[start : start + per_page]),
+            fontsize=6,
+        )
+    pdf.save(path)
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--scales",
+        default="1k",
+        help=f"Comma separated corpus scales of the pipeline benchmarks, among {list(SCALES)}",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "scale" in metafunc.fixturenames:
+        scales = metafunc.config.getoption("scales").split(",")
+        metafunc.parametrize("scale", scales, scope="session")
+
+
+@pytest.fixture(scope="session")
+def pipeline_corpus(tmp_path_factory, scale):
+    """Write a synthetic corpus of about ``scale`` chunks as TXT files and one PDF.
+
+    Returns:
+        The folder of the corpus and its (question, expected value) pairs.
+    """
+    documents, questions = make_corpus(
+        documents=max(SCALES[scale] // CHUNKS_PER_DOCUMENT, 1),
+        facts_per_document=2 * CHUNKS_PER_DOCUMENT,
+        seed=1,
+    )
+    path = tmp_path_factory.mktemp(f"corpus_{scale}")
+    for document in documents:
+        (path / document.metadata["source"]).write_text(document.page_content)
+    write_pdf(path / "sample.pdf", documents[0], PDF_PAGES)
+    return path, questions
+
+
+@pytest.fixture(scope="session")
+def corpus():
+    return make_corpus()
+
+
+@pytest.fixture(scope="session")
+def rag_store(tmp_path_factory, corpus):
+    documents, _ = corpus
+    store = FaissVectorStore(
+        LocalLoader(LinearTokenTextSplitter()),
+        LatencyEmbeddings(),
+        tmp_path_factory.mktemp("rag_store").as_posix(),
+    )
+    store._add_documents(store.loader.splitter.split_documents(documents))
+    return store
@@ -0,0 +1,47 @@
+from typing import Any
+
+import asyncio
+import time
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from pdf_ask.backend.embedding import HashingEmbeddings
+
+
+class LatencyEmbeddings(HashingEmbeddings):
+    """Hashing embeddings simulating the network latency of a remote embedder."""
+
+    def __init__(self, size: int = 256, latency: float = 0.01) -> None:
+        """Initialize the embedder with a fixed latency per query."""
+        super().__init__(size=size)
+        self.latency = latency
+
+    def embed_query(self, text: str) -> list[float]:
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        await asyncio.sleep(self.latency)
+        return super().embed_query(text)
+
+
+class LatencyChatModel(FakeListChatModel):
+    """Fake chat model simulating the latency of a remote LLM."""
+
+    responses: list[str] = ["The answer is in the context [1]."]  # noqa: RUF012
+    latency: float = 0.05
+
+    def _call(self, messages: list[BaseMessage], *args: Any, **kwargs: Any) -> str:
+        time.sleep(self.latency)
+        return super()._call(messages, *args, **kwargs)
+
+    async def _agenerate(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        content = super()._call(messages, *args, **kwargs)
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=content))]
+        )
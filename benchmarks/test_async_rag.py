@@ -0,0 +1,59 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from pdf_ask.backend.llm import ChatMessage, Role, SimpleRAGChatBot
+
+import pytest
+from benchmarks.fakes import LatencyChatModel
+
+QUESTIONS = 32
+CONCURRENCY = 16
+
+
+@pytest.fixture(scope="module")
+def bot(rag_store):
+    return SimpleRAGChatBot(LatencyChatModel(), rag_store)
+
+
+@pytest.fixture(scope="module")
+def questions(corpus):
+    _, facts = corpus
+    return [ChatMessage(Role.USER, question) for question, _ in facts[:QUESTIONS]]
+
+
+def _record_throughput(benchmark):
+    benchmark.extra_info["questions_per_second"] = (
+        QUESTIONS / benchmark.stats.stats.mean
+    )
+
+
+def test_sequential_get_response(benchmark, bot, questions):
+    benchmark.pedantic(
+        lambda: [bot.get_response(question, []) for question in questions], rounds=3
+    )
+    _record_throughput(benchmark)
+
+
+def test_threaded_get_response(benchmark, bot, questions):
+    def run():
+        with ThreadPoolExecutor(CONCURRENCY) as executor:
+            return list(
+                executor.map(lambda question: bot.get_response(question, []), questions)
+            )
+
+    benchmark.pedantic(run, rounds=3)
+    _record_throughput(benchmark)
+
+
+def test_concurrent_aget_response(benchmark, bot, questions):
+    async def run():
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+
+        async def ask(question):
+            async with semaphore:
+                return await bot.aget_response(question, [])
+
+        return await asyncio.gather(*(ask(question) for question in questions))
+
+    benchmark.pedantic(lambda: asyncio.run(run()), rounds=3)
+    _record_throughput(benchmark)
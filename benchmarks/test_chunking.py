@@ -0,0 +1,48 @@
+import pickle
+
+import faiss
+from langchain_community.vectorstores import FAISS
+
+from pdf_ask.backend.embedding import HashingEmbeddings
+from pdf_ask.backend.spliter import get_text_splitter_instance
+
+import pytest
+
+TOP_K = 3
+SETTINGS = {
+    "recursive-200c": ("recursive", {}),
+    "token-64-8": ("token", {"chunk_size": 64, "chunk_overlap": 8}),
+    "token-128-16": ("token", {"chunk_size": 128, "chunk_overlap": 16}),
+    "token-256-32": ("token", {"chunk_size": 256, "chunk_overlap": 32}),
+    "token-512-64": ("token", {"chunk_size": 512, "chunk_overlap": 64}),
+}
+
+
+@pytest.mark.parametrize("setting", SETTINGS)
+def test_chunking(benchmark, corpus, setting):
+    """Compare chunk count, split throughput, index memory and recall of a splitter setting."""
+    documents, questions = corpus
+    splitter_name, kwargs = SETTINGS[setting]
+    splitter = get_text_splitter_instance(splitter_name, **kwargs)
+
+    chunks = benchmark(splitter.split_documents, documents)
+
+    store = FAISS.from_documents(chunks, HashingEmbeddings())
+    hits = sum(
+        any(
+            value in chunk.page_content
+            for chunk in store.similarity_search(question, k=TOP_K)
+        )
+        for question, value in questions
+    )
+    characters = sum(len(document.page_content) for document in documents)
+    benchmark.extra_info.update(
+        {
+            "chunk_count": len(chunks),
+            "characters_per_second": characters / benchmark.stats.stats.mean,
+            "index_bytes": faiss.serialize_index(store.index).nbytes,
+            "docstore_bytes": len(pickle.dumps(store.docstore)),
+            f"recall_at_{TOP_K}": hits / len(questions),
+        }
+    )
+    assert chunks
@@ -0,0 +1,71 @@
+import pickle
+import random
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+from pdf_ask.backend.docstore import CompressedDocstore
+from pdf_ask.backend.spliter import get_text_splitter_instance
+
+import pytest
+from benchmarks.conftest import make_corpus
+
+TOP_K = 10
+LOOKUPS = 100
+DOCSTORES = {"in_memory": InMemoryDocstore, "compressed": CompressedDocstore}
+
+
+@pytest.fixture(scope="module")
+def chunks():
+    documents, _ = make_corpus(documents=200, facts_per_document=10)
+    splitter = get_text_splitter_instance("token", chunk_size=128, chunk_overlap=16)
+    return {
+        f"{index}": chunk
+        for index, chunk in enumerate(splitter.split_documents(documents))
+    }
+
+
+@pytest.mark.parametrize("docstore_name", DOCSTORES)
+def test_docstore_lookup(benchmark, chunks, docstore_name):
+    """Compare the pickled size and the top-k lookup latency of the docstores."""
+    docstore = pickle.loads(pickle.dumps(DOCSTORES[docstore_name](chunks)))  # noqa: S301
+    rng = random.Random(0)
+    lookups = [rng.sample(list(chunks), TOP_K) for _ in range(LOOKUPS)]
+
+    def look_up():
+        return [[docstore.search(_id) for _id in ids] for ids in lookups]
+
+    results = benchmark(look_up)
+
+    text_bytes = sum(len(chunk.page_content.encode()) for chunk in chunks.values())
+    pickled_bytes = len(pickle.dumps(docstore))
+    benchmark.extra_info.update(
+        {
+            "chunk_count": len(chunks),
+            "text_bytes": text_bytes,
+            "docstore_bytes": pickled_bytes,
+            "compression_ratio": text_bytes / pickled_bytes,
+            f"top_{TOP_K}_lookup_us": benchmark.stats.stats.mean / LOOKUPS * 1e6,
+        }
+    )
+    assert results[0][0] == chunks[lookups[0][0]]
+
+
+def test_compressed_docstore_cold_lookup(benchmark, chunks):
+    """Measure the top-k lookup latency of a compressed docstore with an empty cache."""
+    content = pickle.dumps(CompressedDocstore(chunks))
+    rng = random.Random(0)
+    lookups = [rng.sample(list(chunks), TOP_K) for _ in range(LOOKUPS)]
+
+    def look_up(docstore):
+        return [[docstore.search(_id) for _id in ids] for ids in lookups]
+
+    results = benchmark.pedantic(
+        look_up,
+        setup=lambda: ((pickle.loads(content),), {}),  # noqa: S301
+        rounds=20,
+    )
+
+    benchmark.extra_info[f"top_{TOP_K}_lookup_us"] = (
+        benchmark.stats.stats.mean / LOOKUPS * 1e6
+    )
+    assert results[0][0] == chunks[lookups[0][0]]
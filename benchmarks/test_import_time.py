@@ -0,0 +1,36 @@
+import re
+import subprocess
+import sys
+
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)$")
+SLOWEST_MODULES = 10
+
+
+def _import_app():
+    """Import the app in a fresh interpreter, returning its ``-X importtime`` report."""
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import streamlit_app"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+
+
+def test_cold_import(benchmark):
+    report = benchmark.pedantic(_import_app, rounds=5, warmup_rounds=1)
+
+    cumulative = {}
+    for line in report.splitlines():
+        if match := IMPORT_TIME_PATTERN.match(line):
+            microseconds, indent, module = match.groups()
+            if len(indent) <= 3:  # noqa: PLR2004
+                cumulative[module] = int(microseconds)
+    benchmark.extra_info["import_ms"] = cumulative["streamlit_app"] / 1000
+    benchmark.extra_info["slowest_imports_ms"] = {
+        module: microseconds / 1000
+        for module, microseconds in sorted(
+            cumulative.items(), key=lambda item: item[1], reverse=True
+        )[:SLOWEST_MODULES]
+    }
+    assert "langchain_openai" not in cumulative
+    assert "langchain_community" not in cumulative
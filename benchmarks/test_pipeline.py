@@ -0,0 +1,180 @@
+import tracemalloc
+
+from pdf_ask.backend.chat_model import ExtractiveChatModel
+from pdf_ask.backend.embedding import HashingEmbeddings
+from pdf_ask.backend.llm import ChatMessage, Role, SimpleRAGChatBot
+from pdf_ask.backend.loader import LocalLoader, load_and_parse_document
+from pdf_ask.backend.spliter import LinearTokenTextSplitter
+from pdf_ask.backend.vector_store import FaissVectorStore
+
+import pytest
+
+QUERIES = 50
+FILES_PER_BATCH = 500
+
+
+def _peak_memory(function, *args):
+    """Run a function once and return the peak of memory it allocated, in bytes."""
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _text_files(corpus_path):
+    return sorted(path.as_posix() for path in corpus_path.glob("*.txt"))
+
+
+def _new_store(path):
+    return FaissVectorStore(
+        LocalLoader(LinearTokenTextSplitter()), HashingEmbeddings(), path.as_posix()
+    )
+
+
+def _add_files(store, file_paths):
+    """Bulk-load files, saving the store once per batch rather than once per file."""
+    for start in range(0, len(file_paths), FILES_PER_BATCH):
+        store.add_files(file_paths[start : start + FILES_PER_BATCH])
+
+
+@pytest.fixture(scope="session")
+def pipeline_store(tmp_path_factory, pipeline_corpus, scale):
+    corpus_path, _ = pipeline_corpus
+    store = _new_store(tmp_path_factory.mktemp(f"store_{scale}"))
+    _add_files(store, _text_files(corpus_path))
+    return store
+
+
+@pytest.fixture(scope="session")
+def pipeline_questions(pipeline_corpus):
+    _, questions = pipeline_corpus
+    return [question for question, _ in questions[:QUERIES]]
+
+
+def test_load_and_parse_txt(benchmark, pipeline_corpus):
+    file_paths = _text_files(pipeline_corpus[0])
+
+    documents = benchmark(
+        lambda: [doc for path in file_paths for doc in load_and_parse_document(path)]
+    )
+
+    characters = sum(len(document.page_content) for document in documents)
+    benchmark.extra_info["characters_per_second"] = (
+        characters / benchmark.stats.stats.mean
+    )
+
+
+def test_load_and_parse_pdf(benchmark, pipeline_corpus):
+    file_path = (pipeline_corpus[0] / "sample.pdf").as_posix()
+
+    pages = benchmark(load_and_parse_document, file_path)
+
+    benchmark.extra_info["pages_per_second"] = len(pages) / benchmark.stats.stats.mean
+
+
+def test_split(benchmark, pipeline_corpus):
+    documents = [
+        document
+        for path in _text_files(pipeline_corpus[0])
+        for document in load_and_parse_document(path)
+    ]
+    splitter = LinearTokenTextSplitter()
+
+    chunks = benchmark(splitter.split_documents, documents)
+
+    benchmark.extra_info["chunks"] = len(chunks)
+    benchmark.extra_info["chunks_per_second"] = len(chunks) / benchmark.stats.stats.mean
+
+
+def test_add_files(benchmark, tmp_path_factory, pipeline_corpus, scale):
+    file_paths = _text_files(pipeline_corpus[0])
+
+    def setup():
+        return (_new_store(tmp_path_factory.mktemp(f"add_{scale}")), file_paths), {}
+
+    benchmark.pedantic(_add_files, setup=setup, rounds=3)
+
+    store = _new_store(tmp_path_factory.mktemp(f"memory_{scale}"))
+    benchmark.extra_info["peak_memory_bytes"] = _peak_memory(
+        _add_files, store, file_paths
+    )
+    chunks = len(store.list_documents())
+    benchmark.extra_info["chunks"] = chunks
+    benchmark.extra_info["chunks_per_second"] = chunks / benchmark.stats.stats.mean
+
+
+def test_load_vector_store(benchmark, pipeline_store):
+    benchmark(pipeline_store._load_vector_store)
+
+    benchmark.extra_info["peak_memory_bytes"] = _peak_memory(
+        pipeline_store._load_vector_store
+    )
+
+
+def test_open_snapshot(benchmark, tmp_path, pipeline_store):
+    snapshot_path = tmp_path / "store.snapshot"
+    header = pipeline_store.export_snapshot(snapshot_path)
+
+    def open_snapshot():
+        return FaissVectorStore(
+            pipeline_store.loader, pipeline_store.embeddings, snapshot_path.as_posix()
+        )
+
+    benchmark(open_snapshot)
+
+    benchmark.extra_info["snapshot_bytes"] = snapshot_path.stat().st_size
+    benchmark.extra_info["index_bytes"] = header.sections["index"].length
+    benchmark.extra_info["peak_memory_bytes"] = _peak_memory(open_snapshot)
+
+
+def test_similarity_search(benchmark, pipeline_store, pipeline_questions):
+    benchmark(
+        lambda: [
+            pipeline_store.similarity_search(question, top_k=3)
+            for question in pipeline_questions
+        ]
+    )
+
+    benchmark.extra_info["queries_per_second"] = (
+        len(pipeline_questions) / benchmark.stats.stats.mean
+    )
+
+
+def _distinct_words(results):
+    return len({word for result in results for word in result["content"].split()})
+
+
+def test_mmr_similarity_search(benchmark, pipeline_store, pipeline_questions):
+    results = benchmark(
+        lambda: [
+            pipeline_store.similarity_search(question, top_k=3, mmr_lambda=0.5)
+            for question in pipeline_questions
+        ]
+    )
+
+    relevant = [
+        pipeline_store.similarity_search(question, top_k=3)
+        for question in pipeline_questions
+    ]
+    benchmark.extra_info["queries_per_second"] = (
+        len(pipeline_questions) / benchmark.stats.stats.mean
+    )
+    benchmark.extra_info["distinct_words_per_query"] = sum(
+        map(_distinct_words, results)
+    ) / len(results)
+    benchmark.extra_info["distinct_words_per_query_without_mmr"] = sum(
+        map(_distinct_words, relevant)
+    ) / len(relevant)
+
+
+def test_get_response(benchmark, pipeline_store, pipeline_questions):
+    bot = SimpleRAGChatBot(ExtractiveChatModel(), pipeline_store)
+    questions = [ChatMessage(Role.USER, question) for question in pipeline_questions]
+
+    benchmark(lambda: [bot.get_response(question, []) for question in questions])
+
+    benchmark.extra_info["questions_per_second"] = (
+        len(questions) / benchmark.stats.stats.mean
+    )
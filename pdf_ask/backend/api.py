@@ -0,0 +1,746 @@
+from typing import Any, BinaryIO, Self
+
+import argparse
+import contextlib
+import ctypes
+import json
+import logging
+import multiprocessing
+import os
+import re
+import signal
+import socket
+import threading
+from collections.abc import Callable, Iterator
+from dataclasses import asdict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from pdf_ask.backend.cache import SemanticAnswerCache
+from pdf_ask.backend.catalog import ResourceCatalog
+from pdf_ask.backend.chat_model import ALLOWED_CHAT_MODELS
+from pdf_ask.backend.clients import get_client_pool
+from pdf_ask.backend.embedding import ALLOWED_EMBEDDERS
+from pdf_ask.backend.jobs import IngestionJobQueue
+from pdf_ask.backend.llm import ChatMessage, Role, SimpleRAGChatBot
+from pdf_ask.backend.snapshot import SNAPSHOT_SUFFIX
+from pdf_ask.backend.spliter import ALLOWED_SPLITTER
+from pdf_ask.backend.store_cache import StoreCache
+from pdf_ask.backend.uploads import save_upload
+from pdf_ask.backend.vector_store import (
+    EmbeddingMismatchError,
+    FaissVectorStore,
+    has_index,
+    stored_file_hash,
+)
+from pdf_ask.backend.warmup import StoreUsageLog, StoreWarmer, WarmupPlan
+
+logger = logging.getLogger(__name__)
+
+NAME_PATTERN = re.compile(r"[\w][\w .-]*")
+
+
+class ApiError(Exception):
+    """Exception raised when a request cannot be served, with the HTTP status to return."""
+
+    def __init__(self: Self, status: HTTPStatus, message: str) -> None:
+        """Initialize the error.
+
+        Args:
+            status: The HTTP status of the response.
+            message: The error message.
+        """
+        super().__init__(message)
+        self.status = status
+
+
+class WorkerReadiness:
+    """The readiness of the worker processes of a server.
+
+    The flags live in shared memory created before the workers are forked, so any
+    worker answering ``/ready`` reports whether all of them finished their warm-up.
+
+    Attributes:
+        workers: The number of worker processes.
+    """
+
+    def __init__(self: Self, workers: int) -> None:
+        """Initialize the readiness, no worker being ready.
+
+        Args:
+            workers: The number of worker processes.
+        """
+        self.workers = workers
+        self._ready = multiprocessing.RawArray(ctypes.c_bool, workers)
+
+    def mark_ready(self: Self, worker: int) -> None:
+        """Record that a worker finished its warm-up.
+
+        Args:
+            worker: The index of the worker.
+        """
+        self._ready[worker] = True
+
+    def ready_workers(self: Self) -> int:
+        """Count the workers that finished their warm-up.
+
+        Returns:
+            int: The number of ready workers.
+        """
+        return sum(self._ready)
+
+
+class PdfAskApi:
+    """The search, question answering and ingestion operations served over HTTP.
+
+    Each process keeps its stores open in a :class:`StoreCache`, read-only with
+    memory-mapped indexes, so the workers serving the same store share its pages.
+    Uploaded files are written to the store folder and ingested by the job queue.
+    The searched stores are recorded in the usage log, if any, and the stores of the
+    warm-up plan are opened by :meth:`start_warm_up` before the process reports ready.
+
+    Attributes:
+        resource_path: The folder holding one folder per vector store.
+        llm: The language model answering the questions.
+        job_queue: The queue of the ingestion jobs.
+        embedder_name: The name of the embedder of the stores.
+        splitter_name: The name of the text splitter of the ingested files.
+        top_k: The default number of retrieved documents.
+        usage_log: The log of the recently used stores and queries, if any.
+        warmup_plan: The stores opened before the process reports ready.
+        warmer: The warmer opening the stores in the store cache.
+        worker_readiness: The readiness of all the workers of the server, if the
+            process is one of several workers.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: Self,
+        resource_path: str,
+        llm: BaseChatModel,
+        job_queue: IngestionJobQueue,
+        *,
+        embedder_name: str,
+        splitter_name: str,
+        top_k: int = 3,
+        usage_log: StoreUsageLog | None = None,
+        warmup_plan: WarmupPlan | None = None,
+    ) -> None:
+        """Initialize the API.
+
+        Args:
+            resource_path: The folder holding one folder per vector store.
+            llm: The language model answering the questions.
+            job_queue: The queue of the ingestion jobs.
+            embedder_name: The name of the embedder of the stores.
+            splitter_name: The name of the text splitter of the ingested files.
+            top_k: The default number of retrieved documents.
+            usage_log: The log of the recently used stores and queries, if any.
+            warmup_plan: The stores opened before the process reports ready.
+        """
+        self.resource_path = Path(resource_path)
+        self.llm = llm
+        self.job_queue = job_queue
+        self.embedder_name = embedder_name
+        self.splitter_name = splitter_name
+        self.top_k = top_k
+        self.catalog = ResourceCatalog(self.resource_path)
+        self.store_cache = StoreCache(read_only=True)
+        self.answer_cache = SemanticAnswerCache()
+        self.usage_log = usage_log
+        self.warmup_plan = warmup_plan or WarmupPlan()
+        self.warmer = StoreWarmer(self.store_cache, usage_log)
+        self.worker_readiness: WorkerReadiness | None = None
+
+    def start_warm_up(
+        self: Self, worker_readiness: WorkerReadiness | None = None, worker: int = 0
+    ) -> None:
+        """Open the stores of the warm-up plan in a background thread.
+
+        Args:
+            worker_readiness: The readiness of all the workers of the server, if the
+                process is one of several workers.
+            worker: The index of the worker of the process.
+        """
+        thread = self.warmer.start(
+            self.warmup_plan, self.embedder_name, self.splitter_name
+        )
+        if worker_readiness is None:
+            return
+        self.worker_readiness = worker_readiness
+
+        def mark_ready() -> None:
+            thread.join()
+            worker_readiness.mark_ready(worker)
+
+        threading.Thread(target=mark_ready, name="warmup-ready", daemon=True).start()
+
+    def ready(self: Self) -> tuple[HTTPStatus, dict]:
+        """Tell whether the warm-up finished, in every worker of the server.
+
+        Returns:
+            tuple[HTTPStatus, dict]: ``200`` once ready, ``503`` before, with the
+                progress of the warm-up of the process and the number of ready
+                workers.
+        """
+        status = self.warmer.status()
+        if readiness := self.worker_readiness:
+            status["workers"] = readiness.workers
+            status["workers_ready"] = readiness.ready_workers()
+            status["ready"] = status["workers_ready"] == readiness.workers
+        if status["ready"]:
+            return HTTPStatus.OK, status
+        return HTTPStatus.SERVICE_UNAVAILABLE, status
+
+    def list_stores(self: Self) -> dict:
+        """List the vector stores.
+
+        Returns:
+            dict: The names of the stores.
+        """
+        return {"stores": self.catalog.store_names()}
+
+    def search(self: Self, store_name: str, body: dict) -> dict:
+        """Search a store for the chunks most similar to a query.
+
+        Args:
+            store_name: The name of the store.
+            body: The request, with a ``query`` and optionally a ``top_k`` and a
+                ``mmr_lambda`` diversity factor.
+
+        Returns:
+            dict: The results, with their content, metadata and id.
+        """
+        query = self._field(body, "query", str)
+        top_k = body.get("top_k", self.top_k)
+        store = self._store(store_name, [query])
+        return {
+            "results": store.similarity_search(query, top_k, body.get("mmr_lambda"))
+        }
+
+    def batch_search(self: Self, store_name: str, body: dict) -> dict:
+        """Search a store for several queries at once.
+
+        Args:
+            store_name: The name of the store.
+            body: The request, with a list of ``queries`` and optionally a ``top_k``
+                and a ``mmr_lambda`` diversity factor.
+
+        Returns:
+            dict: The results of each query.
+        """
+        queries = self._field(body, "queries", list)
+        top_k = body.get("top_k", self.top_k)
+        store = self._store(store_name, queries)
+        return {
+            "results": store.batch_similarity_search(
+                queries, top_k, body.get("mmr_lambda")
+            )
+        }
+
+    def ask(self: Self, store_name: str, body: dict) -> tuple[dict, Iterator[str]]:
+        """Answer a question with the documents of a store.
+
+        Args:
+            store_name: The name of the store.
+            body: The request, with a ``question``, optionally the previous messages
+                as a ``history`` list of ``role`` and ``text``, a ``top_k`` and a
+                ``mmr_lambda`` diversity factor.
+
+        Returns:
+            tuple[dict, Iterator[str]]: The cited documents and the chunks of the
+                answer, generated as the iterator is consumed.
+        """
+        question = ChatMessage(Role.USER, self._field(body, "question", str))
+        try:
+            history = [
+                ChatMessage(Role(message["role"]), message["text"])
+                for message in body.get("history", [])
+            ]
+        except (KeyError, TypeError, ValueError) as error:
+            raise ApiError(
+                HTTPStatus.BAD_REQUEST, f"Invalid history: {error}"
+            ) from error
+        bot = SimpleRAGChatBot(
+            self.llm,
+            self._store(store_name, [question.text]),
+            top_k=body.get("top_k", self.top_k),
+            answer_cache=self.answer_cache,
+            mmr_lambda=body.get("mmr_lambda"),
+        )
+        answer = bot.stream_response(question, [*history, question])
+        return {"documents": answer.documents or {}}, iter(answer)
+
+    def ingest(
+        self: Self,
+        store_name: str,
+        file_name: str,
+        upload: BinaryIO,
+        size: int,
+        *,
+        force: bool = True,
+    ) -> tuple[HTTPStatus, dict]:
+        """Write an uploaded file to a store folder and queue its ingestion.
+
+        Args:
+            store_name: The name of the store, created if it does not exist.
+            file_name: The name of the file.
+            upload: The content of the file.
+            size: The number of bytes of the file.
+            force: Whether to replace a file already in the store.
+
+        Returns:
+            tuple[HTTPStatus, dict]: ``202`` with the queued job, or ``200`` if the
+                store already holds the same content for the file.
+        """
+        if Path(file_name).suffix not in self.catalog.extensions:
+            msg = f"Unsupported file type {file_name}"
+            raise ApiError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, msg)
+        store_path = self.resource_path / self._name(store_name)
+        store_path.mkdir(parents=True, exist_ok=True)
+        file_path = store_path / self._name(file_name)
+        content_hash = save_upload(upload, file_path, size=size)
+        self.catalog.invalidate(store_name)
+        if stored_file_hash(store_path, file_path.as_posix()) == content_hash:
+            return HTTPStatus.OK, {"skipped": True, "sha256": content_hash}
+        job = self.job_queue.submit(
+            store_path.as_posix(),
+            file_path.as_posix(),
+            self.embedder_name,
+            self.splitter_name,
+            force=force,
+        )
+        return HTTPStatus.ACCEPTED, {"job": self._job(job), "sha256": content_hash}
+
+    def get_job(self: Self, job_id: str) -> dict:
+        """Get the status and progress of an ingestion job.
+
+        Args:
+            job_id: The identifier of the job.
+
+        Returns:
+            dict: The job.
+        """
+        if (job := self.job_queue.get_job(job_id)) is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Unknown job {job_id}")
+        return {"job": self._job(job)}
+
+    def _store(
+        self: Self, store_name: str, queries: list[str] | None = None
+    ) -> FaissVectorStore:
+        """Get the open store of a name, recording its use.
+
+        A ``<name>.snapshot`` file is served when there is no store folder of the name.
+
+        Args:
+            store_name: The name of the store.
+            queries: The queries searched in the store.
+
+        Returns:
+            FaissVectorStore: The store.
+        """
+        store_path = self.resource_path / self._name(store_name)
+        if not has_index(store_path):
+            store_path = store_path.with_name(f"{store_path.name}{SNAPSHOT_SUFFIX}")
+        if not store_path.is_file() and not has_index(store_path):
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Unknown vector store {store_name}")
+        if self.usage_log:
+            self.usage_log.record(
+                store_path.as_posix(),
+                self.embedder_name,
+                self.splitter_name,
+                [query for query in queries or [] if isinstance(query, str)],
+            )
+        return self.store_cache.get(
+            store_path.as_posix(), self.embedder_name, self.splitter_name
+        )
+
+    @staticmethod
+    def _name(name: str) -> str:
+        """Check a store or file name cannot escape the resource folder.
+
+        Args:
+            name: The name.
+
+        Returns:
+            str: The name.
+        """
+        if not NAME_PATTERN.fullmatch(name) or ".." in name:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Invalid name {name!r}")
+        return name
+
+    @staticmethod
+    def _field(body: dict, name: str, kind: type) -> Any:
+        """Get a required field of a request.
+
+        Args:
+            body: The request.
+            name: The name of the field.
+            kind: The type of the field.
+
+        Returns:
+            Any: The value of the field.
+        """
+        if not isinstance(value := body.get(name), kind):
+            msg = f"Missing or invalid field {name!r}, expected {kind.__name__}"
+            raise ApiError(HTTPStatus.BAD_REQUEST, msg)
+        return value
+
+    @staticmethod
+    def _job(job: Any) -> dict:
+        """Convert a job to JSON-compatible values.
+
+        Args:
+            job: The ingestion job.
+
+        Returns:
+            dict: The fields of the job.
+        """
+        return {**asdict(job), "status": job.status.value}
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """Route the HTTP requests to the :class:`PdfAskApi` of the server.
+
+    Responses are JSON, except the streamed answers which are sent as chunked
+    newline-delimited JSON: the cited documents first, then the answer chunks, and a
+    last ``error`` line if the answer failed once streaming had started.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server: "ApiServer"
+
+    ROUTES: tuple[tuple[str, re.Pattern, str], ...] = (
+        ("GET", re.compile(r"/health"), "_health"),
+        ("GET", re.compile(r"/ready"), "_ready"),
+        ("GET", re.compile(r"/stores"), "_list_stores"),
+        ("POST", re.compile(r"/stores/([^/]+)/search"), "_search"),
+        ("POST", re.compile(r"/stores/([^/]+)/batch_search"), "_batch_search"),
+        ("POST", re.compile(r"/stores/([^/]+)/ask"), "_ask"),
+        ("PUT", re.compile(r"/stores/([^/]+)/files/([^/]+)"), "_ingest"),
+        ("GET", re.compile(r"/jobs/([^/]+)"), "_get_job"),
+    )
+
+    def do_GET(self: Self) -> None:
+        """Serve a GET request."""
+        self._dispatch("GET")
+
+    def do_POST(self: Self) -> None:
+        """Serve a POST request."""
+        self._dispatch("POST")
+
+    def do_PUT(self: Self) -> None:
+        """Serve a PUT request."""
+        self._dispatch("PUT")
+
+    def log_message(self: Self, format: str, *args: Any) -> None:
+        """Log the requests at the debug level instead of printing them."""
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _dispatch(self: Self, method: str) -> None:
+        """Call the handler of the route of the request and send its errors.
+
+        Args:
+            method: The HTTP method of the request.
+        """
+        url = urlsplit(self.path)
+        self.query = parse_qs(url.query)
+        try:
+            handler, arguments = self._route(method, url.path)
+            handler(*arguments)
+        except ApiError as error:
+            self._send_error(error.status, str(error))
+        except FileNotFoundError as error:
+            self._send_error(HTTPStatus.NOT_FOUND, str(error))
+        except EmbeddingMismatchError as error:
+            self._send_error(HTTPStatus.CONFLICT, str(error))
+        except (ValueError, EOFError) as error:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(error))
+        except Exception:
+            logger.exception(f"Failed to serve {method} {url.path}")
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal server error")
+
+    def _route(
+        self: Self, method: str, path: str
+    ) -> tuple[Callable[..., None], list[str]]:
+        """Find the handler of a request.
+
+        Args:
+            method: The HTTP method of the request.
+            path: The path of the request.
+
+        Returns:
+            tuple[Callable[..., None], list[str]]: The handler and its arguments taken
+                from the path.
+        """
+        matches = [
+            (route_method, handler, match)
+            for route_method, pattern, handler in self.ROUTES
+            if (match := pattern.fullmatch(path))
+        ]
+        if not matches:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"No route for {path}")
+        for route_method, handler, match in matches:
+            if route_method == method:
+                return getattr(self, handler), [unquote(g) for g in match.groups()]
+        msg = f"{method} is not allowed on {path}"
+        raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, msg)
+
+    def _health(self: Self) -> None:
+        self._send_json({"status": "ok"})
+
+    def _ready(self: Self) -> None:
+        status, content = self.server.api.ready()
+        self._send_json(content, status)
+
+    def _list_stores(self: Self) -> None:
+        self._send_json(self.server.api.list_stores())
+
+    def _search(self: Self, store_name: str) -> None:
+        self._send_json(self.server.api.search(store_name, self._read_json()))
+
+    def _batch_search(self: Self, store_name: str) -> None:
+        self._send_json(self.server.api.batch_search(store_name, self._read_json()))
+
+    def _ask(self: Self, store_name: str) -> None:
+        body = self._read_json()
+        head, chunks = self.server.api.ask(store_name, body)
+        if not body.get("stream"):
+            self._send_json({"answer": "".join(chunks), **head})
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._write_chunk(head)
+        end = object()
+        while True:
+            try:
+                chunk = next(chunks, end)
+            except Exception:
+                # The status was sent, so the failure is reported in the stream itself
+                logger.exception(f"Failed to stream the answer of {self.path}")
+                self._write_chunk({"error": "Internal server error"})
+                break
+            if chunk is end:
+                break
+            self._write_chunk({"answer": chunk})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _ingest(self: Self, store_name: str, file_name: str) -> None:
+        force = self.query.get("force", ["true"])[0].lower() not in {"0", "false"}
+        status, content = self.server.api.ingest(
+            store_name,
+            file_name,
+            self.rfile,
+            int(self.headers.get("Content-Length", 0)),
+            force=force,
+        )
+        self._send_json(content, status)
+
+    def _get_job(self: Self, job_id: str) -> None:
+        self._send_json(self.server.api.get_job(job_id))
+
+    def _read_json(self: Self) -> dict:
+        """Read the JSON object of the request body.
+
+        Returns:
+            dict: The request.
+        """
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "The request must be a JSON object")
+        return body
+
+    def _send_json(
+        self: Self, content: dict, status: HTTPStatus = HTTPStatus.OK
+    ) -> None:
+        """Send a JSON response.
+
+        Args:
+            content: The content of the response.
+            status: The HTTP status of the response.
+        """
+        data = json.dumps(content, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self: Self, status: HTTPStatus, message: str) -> None:
+        """Send an error response and close the connection.
+
+        The request body may not have been read, so the connection cannot be reused,
+        which the response tells the client so it does not send another request on it.
+
+        Args:
+            status: The HTTP status of the response.
+            message: The error message.
+        """
+        self.close_connection = True
+        self._send_json({"error": message}, status)
+
+    def _write_chunk(self: Self, content: dict) -> None:
+        """Write a line of JSON as a chunk of a chunked response.
+
+        Args:
+            content: The content of the line.
+        """
+        data = json.dumps(content, default=str).encode() + b"\n"
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class ApiServer(ThreadingHTTPServer):
+    """A threading HTTP server serving a :class:`PdfAskApi`."""
+
+    daemon_threads = True
+
+    def __init__(
+        self: Self,
+        api: PdfAskApi,
+        server_address: tuple[str, int],
+        sock: socket.socket | None = None,
+    ) -> None:
+        """Initialize the server.
+
+        Args:
+            api: The API to serve.
+            server_address: The address and port to listen on.
+            sock: An already listening socket shared with other worker processes.
+        """
+        super().__init__(server_address, ApiRequestHandler, bind_and_activate=not sock)
+        if sock:
+            self.socket = sock
+            self.server_address = sock.getsockname()
+        self.api = api
+
+
+ApiFactory = Callable[..., PdfAskApi]
+
+
+def serve(api_factory: ApiFactory, host: str, port: int, workers: int = 1) -> None:
+    """Serve the API until interrupted.
+
+    With several workers, the listening socket is opened once and shared by forked
+    worker processes, each with its own open stores. The ingestion jobs recorded by
+    the workers are run by the parent process only, so the jobs of a store still run
+    one at a time. Each serving process warms up its own store cache, and reports
+    ready once every worker finished its warm-up, whichever worker the load balancer
+    probes.
+
+    Args:
+        api_factory: The function creating the API of a process, called with a
+            ``run_jobs`` keyword telling whether the process runs the ingestion jobs.
+        host: The address to listen on.
+        port: The port to listen on.
+        workers: The number of worker processes.
+    """
+    if workers == 1:
+        api = api_factory(run_jobs=True)
+        api.start_warm_up()
+        with ApiServer(api, (host, port)) as server:
+            logger.info(f"Serving the API on http://{host}:{server.server_address[1]}")
+            server.serve_forever()
+        return
+    sock = socket.create_server((host, port), backlog=128)
+    readiness = WorkerReadiness(workers)
+    pids = []
+    for worker in range(workers):
+        if (pid := os.fork()) == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            api = api_factory(run_jobs=False)
+            api.start_warm_up(readiness, worker)
+            with ApiServer(api, (host, port), sock) as server:
+                server.serve_forever()
+            os._exit(0)
+        pids.append(pid)
+    logger.info(f"Serving the API on http://{host}:{port} with {workers} workers")
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    job_queue = api_factory(run_jobs=True).job_queue
+    job_queue.watch()
+    try:
+        os.wait()
+    except KeyboardInterrupt:
+        logger.info("Stopping the API workers")
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        for pid in pids:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+        job_queue.shutdown()
+
+
+def main() -> None:
+    """Serve the API from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Serve search, question answering and ingestion over HTTP."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--resources", default="resources", help="Stores folder.")
+    parser.add_argument("--embedder", default="openAI", choices=ALLOWED_EMBEDDERS)
+    parser.add_argument("--splitter", default="recursive", choices=ALLOWED_SPLITTER)
+    parser.add_argument("--llm", default="openAI", choices=ALLOWED_CHAT_MODELS)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument(
+        "--jobs-db", default=os.getenv("PDF_ASK_JOBS_DB", "resources/.jobs.sqlite3")
+    )
+    parser.add_argument(
+        "--usage-db",
+        default=os.getenv("PDF_ASK_USAGE_DB", "resources/.usage.sqlite3"),
+        help="Log of the recently used stores and queries.",
+    )
+    parser.add_argument(
+        "--warm-store",
+        action="append",
+        default=[],
+        help="Name of a store opened before reporting ready, repeatable.",
+    )
+    parser.add_argument(
+        "--warm-recent",
+        type=int,
+        default=0,
+        help="Number of most recently used stores opened before reporting ready.",
+    )
+    parser.add_argument(
+        "--warm-queries",
+        type=int,
+        default=0,
+        help="Number of recent queries of each warmed store replayed.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    def create_api(*, run_jobs: bool) -> PdfAskApi:
+        return PdfAskApi(
+            args.resources,
+            get_client_pool().get_chat_model(args.llm),
+            IngestionJobQueue(args.jobs_db, run_jobs=run_jobs),
+            embedder_name=args.embedder,
+            splitter_name=args.splitter,
+            top_k=args.top_k,
+            usage_log=StoreUsageLog(args.usage_db),
+            warmup_plan=WarmupPlan(
+                tuple(
+                    Path(args.resources, name).as_posix() for name in args.warm_store
+                ),
+                args.warm_recent,
+                args.warm_queries,
+            ),
+        )
+
+    serve(create_api, args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+from typing import TYPE_CHECKING, Self
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from pdf_ask.backend.metrics import METRICS
+
+if TYPE_CHECKING:
+    from pdf_ask.backend.llm import LlmAnswer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _CacheEntry:
+    store: str
+    generation: str
+    options: tuple
+    embedding: np.ndarray
+    answer: "LlmAnswer"
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """Cache answers by vector store generation and question embedding.
+
+    A cached answer is returned for a question whose embedding has a cosine similarity
+    of at least ``threshold`` with the embedding of a cached question asked against the
+    same store with the same search options, e.g. ``top_k`` and ``mmr_lambda``. Entries
+    of a store are dropped as soon as the store is seen with a new generation, expire
+    after ``ttl`` seconds, and the least recently used entries are evicted beyond
+    ``max_size`` entries.
+
+    Attributes:
+        threshold: The minimal cosine similarity of a cache hit.
+        ttl: The number of seconds an entry stays valid.
+        max_size: The maximal number of entries.
+        hits: The number of cache hits.
+        misses: The number of cache misses.
+    """
+
+    def __init__(
+        self: Self, threshold: float = 0.95, ttl: float = 3600, max_size: int = 1024
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            threshold: The minimal cosine similarity of a cache hit.
+            ttl: The number of seconds an entry stays valid.
+            max_size: The maximal number of entries.
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, _CacheEntry] = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self: Self) -> float:
+        """The share of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self: Self) -> int:
+        """Return the number of cached answers."""
+        return len(self._entries)
+
+    def get(
+        self: Self,
+        store: str,
+        generation: str,
+        embedding: list[float],
+        options: dict | None = None,
+    ) -> "LlmAnswer | None":
+        """Look up the answer to a similar question.
+
+        Args:
+            store: The identifier of the vector store.
+            generation: The current generation of the vector store.
+            embedding: The embedding of the question.
+            options: The search options the answer must have been retrieved with.
+
+        Returns:
+            LlmAnswer | None: The cached answer, or None on a cache miss.
+        """
+        query = self._normalize(embedding)
+        options_key = self._options_key(options)
+        with self._lock:
+            self._evict(store, generation)
+            keys = [
+                key
+                for key, entry in self._entries.items()
+                if entry.store == store
+                and entry.generation == generation
+                and entry.options == options_key
+            ]
+            if keys:
+                matrix = np.vstack([self._entries[key].embedding for key in keys])
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.hits += 1
+                    METRICS.increment("answer_cache_lookups_total", result="hit")
+                    logger.info(
+                        f"Answer cache hit ({similarities[best]:.3f}), hit rate {self.hit_rate:.2f}"
+                    )
+                    return self._entries[keys[best]].answer
+            self.misses += 1
+            METRICS.increment("answer_cache_lookups_total", result="miss")
+            return None
+
+    def put(
+        self: Self,
+        store: str,
+        generation: str,
+        embedding: list[float],
+        answer: "LlmAnswer",
+        options: dict | None = None,
+    ) -> None:
+        """Cache the answer to a question.
+
+        Args:
+            store: The identifier of the vector store.
+            generation: The current generation of the vector store.
+            embedding: The embedding of the question.
+            answer: The answer to cache.
+            options: The search options the answer was retrieved with.
+        """
+        with self._lock:
+            self._entries[self._next_key] = _CacheEntry(
+                store,
+                generation,
+                self._options_key(options),
+                self._normalize(embedding),
+                answer,
+                time.monotonic(),
+            )
+            self._next_key += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self: Self) -> None:
+        """Drop all cached answers."""
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self: Self, store: str, generation: str) -> None:
+        """Drop expired entries and the entries of older generations of a store.
+
+        Args:
+            store: The identifier of the vector store.
+            generation: The current generation of the vector store.
+        """
+        expired_before = time.monotonic() - self.ttl
+        for key, entry in list(self._entries.items()):
+            if entry.created_at < expired_before or (
+                entry.store == store and entry.generation != generation
+            ):
+                del self._entries[key]
+
+    @staticmethod
+    def _options_key(options: dict | None) -> tuple:
+        """Turn search options into a comparable key.
+
+        Args:
+            options: The search options.
+
+        Returns:
+            tuple: The sorted items of the options.
+        """
+        return tuple(sorted((options or {}).items()))
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        """Normalize an embedding to unit length.
+
+        Args:
+            embedding: The embedding to normalize.
+
+        Returns:
+            np.ndarray: The normalized embedding.
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
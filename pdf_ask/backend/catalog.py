@@ -0,0 +1,164 @@
+from typing import Self
+
+import functools
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_EXTENSIONS = (".pdf", ".txt")
+
+
+@dataclass(frozen=True)
+class CatalogFile:
+    path: Path
+    size: int
+
+    @property
+    def name(self: Self) -> str:
+        """The name of the file."""
+        return self.path.name
+
+
+@dataclass
+class CatalogStore:
+    name: str
+    path: Path
+    files: list[CatalogFile] = field(default_factory=list)
+    mtime_ns: int = 0
+
+
+class ResourceCatalog:
+    """Cached index of the vector store folders and of their documents.
+
+    Listing the stores on every rerun of every session stats each document, which is
+    slow on network filesystems. The catalog only rescans a store folder when its
+    modification time changed, which happens when a file is created, renamed or removed
+    in it, and checks the modification times at most every ``refresh_interval``
+    seconds. Writers such as the upload path call :meth:`invalidate` so their changes
+    are listed at once.
+
+    Attributes:
+        root: The folder holding one folder per vector store.
+        extensions: The extensions of the listed documents.
+        refresh_interval: The minimal number of seconds between two checks of the
+            modification times.
+    """
+
+    def __init__(
+        self: Self,
+        root: str | Path,
+        extensions: tuple[str, ...] = DOCUMENT_EXTENSIONS,
+        refresh_interval: float = 5.0,
+    ) -> None:
+        """Initialize an empty catalog, scanned on first use.
+
+        Args:
+            root: The folder holding one folder per vector store.
+            extensions: The extensions of the listed documents.
+            refresh_interval: The minimal number of seconds between two checks of the
+                modification times.
+        """
+        self.root = Path(root)
+        self.extensions = extensions
+        self.refresh_interval = refresh_interval
+        self._stores: dict[str, CatalogStore] = {}
+        self._root_mtime_ns: int | None = None
+        self._checked_at = float("-inf")
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+
+    def stores(self: Self) -> dict[str, CatalogStore]:
+        """Get the vector stores, refreshing the catalog if it may be outdated.
+
+        Returns:
+            dict[str, CatalogStore]: The stores by name, sorted by name.
+        """
+        with self._lock:
+            if (
+                self._dirty
+                or time.monotonic() - self._checked_at >= self.refresh_interval
+            ):
+                self._refresh()
+            return dict(self._stores)
+
+    def store_names(self: Self) -> list[str]:
+        """Get the names of the vector stores.
+
+        Returns:
+            list[str]: The sorted names of the stores.
+        """
+        return list(self.stores())
+
+    def invalidate(self: Self, store_name: str | None = None) -> None:
+        """Rescan a store, or all of them, on the next access.
+
+        Args:
+            store_name: The name of the store to rescan, all stores if None.
+        """
+        with self._lock:
+            if store_name is None:
+                self._root_mtime_ns = None
+                self._dirty.update(self._stores)
+            else:
+                self._dirty.add(store_name)
+
+    def _refresh(self: Self) -> None:
+        """Rescan the store list and the stores whose folder changed."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        root_mtime_ns = self.root.stat().st_mtime_ns
+        if root_mtime_ns != self._root_mtime_ns or self._dirty - set(self._stores):
+            with os.scandir(self.root) as entries:
+                names = sorted(entry.name for entry in entries if entry.is_dir())
+            self._stores = {
+                name: self._stores.get(name) or CatalogStore(name, self.root / name)
+                for name in names
+            }
+            self._root_mtime_ns = root_mtime_ns
+        for name, store in self._stores.items():
+            try:
+                mtime_ns = store.path.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if mtime_ns != store.mtime_ns or name in self._dirty:
+                store.files = self._scan(store.path)
+                store.mtime_ns = mtime_ns
+                logger.debug(f"Scanned {len(store.files)} documents of store {name}")
+        self._dirty.clear()
+        self._checked_at = time.monotonic()
+
+    def _scan(self: Self, path: Path) -> list[CatalogFile]:
+        """List the documents of a store folder.
+
+        Args:
+            path: The path to the store folder.
+
+        Returns:
+            list[CatalogFile]: The documents, sorted by name.
+        """
+        with os.scandir(path) as entries:
+            return sorted(
+                (
+                    CatalogFile(Path(entry.path), entry.stat().st_size)
+                    for entry in entries
+                    if entry.is_file() and Path(entry.name).suffix in self.extensions
+                ),
+                key=lambda file: file.name,
+            )
+
+
+@functools.cache
+def get_resource_catalog(root: str = "resources") -> ResourceCatalog:
+    """Get the resource catalog of a folder, shared by all sessions of the process.
+
+    Args:
+        root: The folder holding one folder per vector store.
+
+    Returns:
+        ResourceCatalog: The resource catalog.
+    """
+    return ResourceCatalog(root)
@@ -0,0 +1,108 @@
+from typing import Any, Self
+
+import re
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from pdf_ask.backend.lazy import LazyRegistry
+from pdf_ask.backend.spliter import TOKEN_PATTERN
+
+CONTEXT_PATTERN = re.compile(
+    r"^\[(\d+)\] - (.*?)(?=^\[\d+\] - |^Chat history:)", re.MULTILINE | re.DOTALL
+)
+QUESTION_PATTERN = re.compile(r"^Question: (.*)$", re.MULTILINE)
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+class ExtractiveChatModel(BaseChatModel):
+    """Local, deterministic chat model answering from the context of the RAG prompt.
+
+    The answer is the sentence of the context sharing the most words with the question,
+    followed by the citation marker of its passage, or "I don't know." if no sentence
+    shares a word with the question. It makes the RAG pipeline usable offline, in tests,
+    benchmarks and evaluation runs.
+    """
+
+    @property
+    def _llm_type(self: Self) -> str:
+        return "extractive"
+
+    def _generate(
+        self: Self, messages: list[BaseMessage], *_args: Any, **_kwargs: Any
+    ) -> ChatResult:
+        """Answer the question of the last message from its context.
+
+        Args:
+            messages: The messages of the prompt.
+            *_args: Unused positional arguments.
+            **_kwargs: Unused keyword arguments.
+
+        Returns:
+            ChatResult: The answer.
+        """
+        answer = self.answer(messages[-1].content if messages else "")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(answer))])
+
+    @staticmethod
+    def answer(prompt: str) -> str:
+        r"""Extract the answer to the question of a RAG prompt.
+
+        Args:
+            prompt: The RAG prompt with a question and numbered context passages.
+
+        Returns:
+            str: The best matching sentence and its citation marker.
+
+        Examples:
+            >>> ExtractiveChatModel.answer(
+            ...     "Question: What is the pressure?\nContext:\n"
+            ...     "[1] - Clean the filter. The pressure is 10 bar.\nChat history:\n"
+            ... )
+            'The pressure is 10 bar. [1]'
+        """
+        question = QUESTION_PATTERN.search(prompt)
+        words = (
+            set(TOKEN_PATTERN.findall(question.group(1).lower())) if question else set()
+        )
+        best, best_score = "I don't know.", 0
+        for marker, passage in CONTEXT_PATTERN.findall(prompt):
+            for sentence in SENTENCE_PATTERN.split(passage.strip()):
+                score = len(words & set(TOKEN_PATTERN.findall(sentence.lower())))
+                if score > best_score:
+                    best, best_score = f"{sentence} [{marker}]", score
+        return best
+
+
+ALLOWED_CHAT_MODELS = LazyRegistry(
+    {"openAI": "langchain_openai:ChatOpenAI", "extractive": ExtractiveChatModel}
+)
+
+
+class ChatModelNotAllowedError(Exception):
+    """Exception raised when a chat model is not allowed."""
+
+    pass
+
+
+def get_chat_model_instance(
+    chat_model_name: str, *args: Any, **kwargs: Any
+) -> BaseChatModel:
+    """Retrieve a chat model instance based on the provided chat model name.
+
+    Args:
+        chat_model_name (str): The name of the chat model to retrieve.
+        *args: Additional arguments to pass to the chat model.
+        **kwargs: Additional keyword arguments to pass to the chat model.
+
+    Returns:
+        BaseChatModel: An instance of the requested chat model.
+
+    Raises:
+        ChatModelNotAllowedError: If the chat model is not allowed.
+    """
+    if chat_model_class := ALLOWED_CHAT_MODELS.get(chat_model_name):
+        return chat_model_class(*args, **kwargs)
+    msg = f"{chat_model_name} is not allowed"
+    raise ChatModelNotAllowedError(msg)
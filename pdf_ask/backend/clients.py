@@ -0,0 +1,483 @@
+from typing import Any, Self
+
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from collections.abc import Callable
+from concurrent.futures import Future
+
+import httpx
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from pdf_ask.backend.chat_model import ALLOWED_CHAT_MODELS, get_chat_model_instance
+from pdf_ask.backend.embedding import ALLOWED_EMBEDDERS, get_embedding_instance
+from pdf_ask.backend.spliter import count_tokens
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+COALESCED_PATHS = ("/embeddings",)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at a rate per minute.
+
+    Tokens are reserved rather than awaited: a reservation always succeeds and returns
+    how long the caller must wait for the bucket to have refilled its share, so callers
+    are served in order and a large request cannot be starved by smaller ones.
+
+    Attributes:
+        rate_per_minute: The number of tokens added per minute.
+        capacity: The maximal number of tokens, i.e. the allowed burst.
+    """
+
+    def __init__(
+        self: Self, rate_per_minute: float, capacity: float | None = None
+    ) -> None:
+        """Initialize a full bucket.
+
+        Args:
+            rate_per_minute: The number of tokens added per minute.
+            capacity: The maximal number of tokens, defaults to 10 seconds of refill.
+        """
+        self.rate_per_minute = rate_per_minute
+        self.capacity = capacity or max(rate_per_minute / 6, 1)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self: Self, amount: float = 1) -> float:
+        """Take tokens from the bucket.
+
+        Args:
+            amount: The number of tokens to take, capped to the capacity.
+
+        Returns:
+            float: The number of seconds to wait before using the tokens.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= min(amount, self.capacity)
+            return max(-self._tokens, 0) * 60 / self.rate_per_minute
+
+    def drain(self: Self) -> None:
+        """Empty the bucket, e.g. after the server reported a rate limit."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0)
+
+    def _refill(self: Self) -> None:
+        """Add the tokens accumulated since the last update."""
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity,
+            self._tokens + (now - self._updated_at) * self.rate_per_minute / 60,
+        )
+        self._updated_at = now
+
+
+def estimate_request_tokens(request: httpx.Request) -> int:
+    """Estimate the number of tokens an OpenAI request counts against the limits.
+
+    Args:
+        request: The request.
+
+    Returns:
+        int: The tokens of the messages or inputs plus the requested completion tokens.
+    """
+    try:
+        body = json.loads(request.content or b"{}")
+    except ValueError:
+        return 0
+    if not isinstance(body, dict):
+        return 0
+    tokens = body.get("max_tokens") or 0
+    for message in body.get("messages", []):
+        if isinstance(message.get("content"), str):
+            tokens += count_tokens(message["content"])
+    inputs = body.get("input", [])
+    for item in [inputs] if isinstance(inputs, str) else inputs:
+        tokens += count_tokens(item) if isinstance(item, str) else len(item)
+    return tokens
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """HTTP transport applying the limits of a client pool to every request.
+
+    Each attempt takes one request and the estimated tokens from the buckets of the
+    pool. Rate limited and failed requests are retried with exponential backoff and
+    full jitter, honoring ``Retry-After``, and a rate limit empties the request bucket so
+    concurrent callers back off too. Identical embedding requests in flight are sent
+    once and their response is shared.
+    """
+
+    def __init__(
+        self: Self, pool: "ClientPool", transport: httpx.BaseTransport
+    ) -> None:
+        """Initialize the transport.
+
+        Args:
+            pool: The client pool holding the limits.
+            transport: The transport sending the requests.
+        """
+        self.pool = pool
+        self.transport = transport
+        self._in_flight: dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def handle_request(self: Self, request: httpx.Request) -> httpx.Response:
+        """Send a request, coalescing it with an identical one in flight.
+
+        Args:
+            request: The request.
+
+        Returns:
+            httpx.Response: The response.
+        """
+        request.read()
+        if not request.url.path.endswith(COALESCED_PATHS):
+            return self._send(request)
+        key = (request.method, str(request.url), request.content)
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            self.pool.coalesced += 1
+            return self._copy_response(*future.result())
+        try:
+            response = self._send(request)
+            content = b"".join(response.iter_raw())
+            response.close()
+            future.set_result((response.status_code, response.headers, content))
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return self._copy_response(response.status_code, response.headers, content)
+
+    def close(self: Self) -> None:
+        """Close the underlying transport."""
+        self.transport.close()
+
+    @staticmethod
+    def _copy_response(
+        status_code: int, headers: httpx.Headers, content: bytes
+    ) -> httpx.Response:
+        """Create a response from the raw content of another response.
+
+        Args:
+            status_code: The status code of the response.
+            headers: The headers of the response.
+            content: The raw, possibly compressed, content of the response.
+
+        Returns:
+            httpx.Response: The new response.
+        """
+        headers = httpx.Headers(headers)
+        headers.pop("transfer-encoding", None)
+        return httpx.Response(status_code, headers=headers, content=content)
+
+    def _send(self: Self, request: httpx.Request) -> httpx.Response:
+        """Send a request within the limits, retrying it with backoff.
+
+        Args:
+            request: The request.
+
+        Returns:
+            httpx.Response: The last response.
+        """
+        tokens = estimate_request_tokens(request)
+        for attempt in range(self.pool.max_retries + 1):
+            time.sleep(self.pool.reserve(tokens))
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError:
+                if attempt == self.pool.max_retries:
+                    raise
+                time.sleep(self.pool.backoff(attempt))
+                continue
+            if (
+                response.status_code not in RETRY_STATUS_CODES
+                or attempt == self.pool.max_retries
+            ):
+                return response
+            response.close()
+            time.sleep(self.pool.backoff(attempt, response))
+        return response
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Asynchronous HTTP transport applying the limits of a client pool.
+
+    It shares the buckets of the pool with :class:`RateLimitedTransport` and waits for
+    them without blocking the event loop. Requests are not coalesced.
+
+    Pooled connections belong to the event loop that opened them, so each running event
+    loop sends its requests through its own transport, created on first use. This lets
+    a single shared client serve successive ``asyncio.run`` calls.
+    """
+
+    def __init__(
+        self: Self,
+        pool: "ClientPool",
+        transport_factory: Callable[[], httpx.AsyncBaseTransport],
+    ) -> None:
+        """Initialize the transport.
+
+        Args:
+            pool: The client pool holding the limits.
+            transport_factory: The function creating the transport sending the requests
+                of an event loop.
+        """
+        self.pool = pool
+        self.transport_factory = transport_factory
+        self._transports: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, httpx.AsyncBaseTransport
+        ] = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def transport(self: Self) -> httpx.AsyncBaseTransport:
+        """The transport sending the requests of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._transports:
+                self._transports[loop] = self.transport_factory()
+            return self._transports[loop]
+
+    async def handle_async_request(
+        self: Self, request: httpx.Request
+    ) -> httpx.Response:
+        """Send a request within the limits, retrying it with backoff.
+
+        Args:
+            request: The request.
+
+        Returns:
+            httpx.Response: The last response.
+        """
+        await request.aread()
+        tokens = estimate_request_tokens(request)
+        transport = self.transport
+        for attempt in range(self.pool.max_retries + 1):
+            await asyncio.sleep(self.pool.reserve(tokens))
+            try:
+                response = await transport.handle_async_request(request)
+            except httpx.TransportError:
+                if attempt == self.pool.max_retries:
+                    raise
+                await asyncio.sleep(self.pool.backoff(attempt))
+                continue
+            if (
+                response.status_code not in RETRY_STATUS_CODES
+                or attempt == self.pool.max_retries
+            ):
+                return response
+            await response.aclose()
+            await asyncio.sleep(self.pool.backoff(attempt, response))
+        return response
+
+    async def aclose(self: Self) -> None:
+        """Close the transport of the running event loop."""
+        with self._lock:
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+class ClientPool:
+    """Process-wide LLM and embedding clients sharing connections and rate limits.
+
+    Chat models and embedders are created once per configuration and send their
+    requests through shared HTTP clients with pooled connections, whose transports apply
+    the request and token limits of the pool. The OpenAI clients get ``max_retries=0``
+    so failed requests are only retried by the pool.
+
+    Attributes:
+        requests: The bucket of requests per minute.
+        tokens: The bucket of tokens per minute.
+        max_retries: The maximal number of retries of a request.
+        base_delay: The backoff delay of the first retry, in seconds.
+        max_delay: The maximal backoff delay, in seconds.
+        http_client: The shared synchronous HTTP client.
+        http_async_client: The shared asynchronous HTTP client.
+        coalesced: The number of requests answered by an identical request in flight.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: Self,
+        requests_per_minute: float = 3500,
+        tokens_per_minute: float = 90000,
+        *,
+        max_retries: int = 6,
+        base_delay: float = 0.5,
+        max_delay: float = 30,
+        max_connections: int = 20,
+    ) -> None:
+        """Initialize the pool.
+
+        Args:
+            requests_per_minute: The maximal number of requests per minute.
+            tokens_per_minute: The maximal number of tokens per minute.
+            max_retries: The maximal number of retries of a request.
+            base_delay: The backoff delay of the first retry, in seconds.
+            max_delay: The maximal backoff delay, in seconds.
+            max_connections: The maximal number of open connections per client.
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.coalesced = 0
+        limits = httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        )
+        self.http_client = httpx.Client(
+            transport=RateLimitedTransport(self, httpx.HTTPTransport(limits=limits)),
+            timeout=httpx.Timeout(60, connect=5),
+        )
+        self.http_async_client = httpx.AsyncClient(
+            transport=AsyncRateLimitedTransport(
+                self, functools.partial(httpx.AsyncHTTPTransport, limits=limits)
+            ),
+            timeout=httpx.Timeout(60, connect=5),
+        )
+        self._models: dict[tuple, BaseChatModel | Embeddings] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self: Self, tokens: int) -> float:
+        """Take one request and some tokens from the buckets.
+
+        Args:
+            tokens: The estimated number of tokens of the request.
+
+        Returns:
+            float: The number of seconds to wait before sending the request.
+        """
+        delay = self.requests.reserve()
+        if tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return delay
+
+    def backoff(
+        self: Self, attempt: int, response: httpx.Response | None = None
+    ) -> float:
+        """Compute the delay before retrying a request.
+
+        Args:
+            attempt: The number of the failed attempt, starting at 0.
+            response: The response of the failed attempt, if any.
+
+        Returns:
+            float: A random delay up to the exponential backoff, at least the
+                ``Retry-After`` delay of the response.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))  # noqa: S311
+        if response is not None:
+            if response.status_code == httpx.codes.TOO_MANY_REQUESTS:
+                self.requests.drain()
+            with contextlib.suppress(ValueError):
+                delay = max(delay, float(response.headers.get("retry-after", 0)))
+        logger.warning(
+            f"Request failed (attempt {attempt + 1}), retrying in {delay:.2f}s"
+        )
+        return delay
+
+    def get_chat_model(
+        self: Self, chat_model_name: str, **kwargs: Any
+    ) -> BaseChatModel:
+        """Get the shared chat model of a configuration.
+
+        Args:
+            chat_model_name: The name of the chat model in ``ALLOWED_CHAT_MODELS``.
+            **kwargs: Keyword arguments passed to the chat model.
+
+        Returns:
+            BaseChatModel: The chat model.
+        """
+        return self._get(
+            ALLOWED_CHAT_MODELS.get(chat_model_name),
+            get_chat_model_instance,
+            chat_model_name,
+            kwargs,
+        )
+
+    def get_embeddings(self: Self, embedder_name: str, **kwargs: Any) -> Embeddings:
+        """Get the shared embedder of a configuration.
+
+        Args:
+            embedder_name: The name of the embedder in ``ALLOWED_EMBEDDERS``.
+            **kwargs: Keyword arguments passed to the embedder.
+
+        Returns:
+            Embeddings: The embedder.
+        """
+        return self._get(
+            ALLOWED_EMBEDDERS.get(embedder_name),
+            get_embedding_instance,
+            embedder_name,
+            kwargs,
+        )
+
+    def close(self: Self) -> None:
+        """Close the synchronous HTTP client and forget the created models."""
+        self.http_client.close()
+        self._models.clear()
+
+    def _get(
+        self: Self, model_class: type | None, factory: Any, name: str, kwargs: dict
+    ) -> Any:
+        """Get or create a model, plugging the shared HTTP clients if it takes any.
+
+        Args:
+            model_class: The class of the model, None if the name is not allowed.
+            factory: The registry function creating the model.
+            name: The name of the model.
+            kwargs: Keyword arguments passed to the model.
+
+        Returns:
+            Any: The model.
+        """
+        key = (factory.__name__, name, tuple(sorted(kwargs.items())))
+        with self._lock:
+            if key not in self._models:
+                if "http_client" in getattr(model_class, "__fields__", {}):
+                    kwargs = {
+                        "http_client": self.http_client,
+                        "http_async_client": self.http_async_client,
+                        "max_retries": 0,
+                        **kwargs,
+                    }
+                logger.info(f"Creating shared client {name} {key[2]}")
+                self._models[key] = factory(name, **kwargs)
+            return self._models[key]
+
+
+@functools.cache
+def get_client_pool() -> ClientPool:
+    """Get the client pool of the process.
+
+    The limits are read from the ``PDF_ASK_REQUESTS_PER_MINUTE``,
+    ``PDF_ASK_TOKENS_PER_MINUTE`` and ``PDF_ASK_MAX_RETRIES`` environment variables.
+
+    Returns:
+        ClientPool: The client pool.
+    """
+    return ClientPool(
+        requests_per_minute=float(os.getenv("PDF_ASK_REQUESTS_PER_MINUTE", "3500")),
+        tokens_per_minute=float(os.getenv("PDF_ASK_TOKENS_PER_MINUTE", "90000")),
+        max_retries=int(os.getenv("PDF_ASK_MAX_RETRIES", "6")),
+    )
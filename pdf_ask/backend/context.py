@@ -0,0 +1,185 @@
+from typing import Self
+
+import logging
+from dataclasses import dataclass, field
+
+from pdf_ask.backend.metrics import METRICS
+from pdf_ask.backend.spliter import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Passage:
+    key: tuple | None
+    content: str
+    metadata: dict = field(default_factory=dict)
+    tokens: int = 0
+    chunks: range | None = None
+
+    def accepts(self: Self, key: tuple | None, chunk_index: int | None) -> bool:
+        """Check whether a chunk may be merged into the passage.
+
+        Args:
+            key: The merge key of the chunk.
+            chunk_index: The index of the chunk in its text window, None for a page.
+
+        Returns:
+            bool: Whether the chunk has the key of the passage and, within a text
+                window, is next to or among the chunks of the passage.
+        """
+        if key is None or key != self.key:
+            return False
+        return (
+            chunk_index is None
+            or self.chunks is None
+            or self.chunks.start - 1 <= chunk_index <= self.chunks.stop
+        )
+
+
+class ContextPacker:
+    """Assemble the retrieved chunks into the context of the prompt.
+
+    Chunks are taken by decreasing relevance. A chunk from the same source and page as
+    an already packed passage, or next to one of its chunks in a text file, is merged
+    into it, dropping the text the two chunks overlap on, and a chunk whose text is already in the context is
+    dropped. Chunks that would exceed the token budget are skipped, except for the most
+    relevant one. Passages are numbered from 1 in order of relevance, which is the
+    numbering used for citations.
+
+    Attributes:
+        token_budget: The maximal number of tokens of the context.
+        min_overlap: The minimal number of characters of an overlap between two chunks.
+    """
+
+    def __init__(self: Self, token_budget: int = 1500, min_overlap: int = 16) -> None:
+        """Initialize the context packer.
+
+        Args:
+            token_budget: The maximal number of tokens of the context.
+            min_overlap: The minimal number of characters of an overlap between two
+                chunks.
+        """
+        self.token_budget = token_budget
+        self.min_overlap = min_overlap
+
+    def pack(self: Self, documents: list[dict]) -> list[dict]:
+        """Merge, deduplicate and select the retrieved documents.
+
+        Args:
+            documents: The retrieved documents sorted by decreasing relevance, with a
+                ``content`` and optionally a ``metadata`` entry.
+
+        Returns:
+            list[dict]: The packed passages, with an ``id`` starting at 1, a ``content``
+                and the ``metadata`` of their most relevant chunk.
+        """
+        passages: list[_Passage] = []
+        used_tokens = 0
+        for document in documents:
+            content = document["content"].strip()
+            metadata = document.get("metadata") or {}
+            key, chunk_index = self._merge_key(metadata)
+            passage = next((p for p in passages if p.accepts(key, chunk_index)), None)
+            if passage:
+                merged = self._merge(passage.content, content)
+                tokens = count_tokens(merged)
+                if used_tokens + tokens - passage.tokens <= self.token_budget:
+                    used_tokens += tokens - passage.tokens
+                    passage.content, passage.tokens = merged, tokens
+                    if chunk_index is not None and passage.chunks is not None:
+                        passage.chunks = range(
+                            min(passage.chunks.start, chunk_index),
+                            max(passage.chunks.stop, chunk_index + 1),
+                        )
+                continue
+            if any(content in p.content for p in passages):
+                continue
+            tokens = count_tokens(content)
+            if passages and used_tokens + tokens > self.token_budget:
+                continue
+            chunks = (
+                None if chunk_index is None else range(chunk_index, chunk_index + 1)
+            )
+            passages.append(_Passage(key, content, metadata, tokens, chunks))
+            used_tokens += tokens
+        METRICS.increment("context_tokens_total", used_tokens)
+        logger.debug(
+            f"Packed {len(documents)} chunks into {len(passages)} passages of {used_tokens} tokens"
+        )
+        return [
+            {"id": idx, "content": passage.content, "metadata": passage.metadata}
+            for idx, passage in enumerate(passages, start=1)
+        ]
+
+    @staticmethod
+    def _merge_key(metadata: dict) -> tuple[tuple | None, int | None]:
+        """Get the key of the chunks that may be merged together.
+
+        Chunks of the same page are merged, while chunks of a text window are only
+        merged with their neighbours, since a window spans up to a megabyte of text.
+
+        Args:
+            metadata: The metadata of a chunk.
+
+        Returns:
+            tuple[tuple | None, int | None]: The source and page or text window of the
+                chunk, None if the chunk has no known position, and the index of the
+                chunk in its text window, None for a page.
+        """
+        if (source := metadata.get("source")) is None:
+            return None, None
+        if (page := metadata.get("page")) is not None:
+            return (source, page), None
+        window = metadata.get("start_byte")
+        chunk_index = metadata.get("chunk_index")
+        if window is None or chunk_index is None:
+            return None, None
+        return (source, window), chunk_index
+
+    def _merge(self: Self, first: str, second: str) -> str:
+        """Merge two chunks of the same page, dropping the text they overlap on.
+
+        Args:
+            first: The text of the packed passage.
+            second: The text of the new chunk.
+
+        Returns:
+            str: The merged text.
+
+        Examples:
+            >>> packer = ContextPacker(min_overlap=5)
+            >>> packer._merge("The pump is rated", "pump is rated for 10 bar.")
+            'The pump is rated for 10 bar.'
+            >>> packer._merge("for 10 bar.", "The pump is rated for 10 bar.")
+            'The pump is rated for 10 bar.'
+        """
+        if second in first:
+            return first
+        if first in second:
+            return second
+        if overlap := self._overlap(first, second):
+            return first + second[overlap:]
+        if overlap := self._overlap(second, first):
+            return second + first[overlap:]
+        return f"{first}\n{second}"
+
+    def _overlap(self: Self, first: str, second: str) -> int:
+        """Find the longest suffix of a text that is a prefix of another text.
+
+        Args:
+            first: The text whose suffix is searched.
+            second: The text whose prefix is searched.
+
+        Returns:
+            int: The length of the overlap, 0 if shorter than ``min_overlap``.
+        """
+        if len(second) < self.min_overlap:
+            return 0
+        head = second[: self.min_overlap]
+        start = first.find(head, max(len(first) - len(second), 0))
+        while start != -1:
+            if second.startswith(first[start:]):
+                return len(first) - start
+            start = first.find(head, start + 1)
+        return 0
@@ -0,0 +1,588 @@
+from typing import Any, Self
+
+import json
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from collections.abc import Iterable, Iterator
+
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+BLOCK_SIZE = 4 * 1024
+DICTIONARY_SIZE = 16 * 1024
+TRAINING_SIZE = 256 * 1024
+CACHE_BYTES = 4 * 1024 * 1024
+COMPRESSION_LEVEL = 9
+MAX_NGRAM = 4
+DOCSTORE_MAGIC = b"PDFASKDS"
+DOCSTORE_HEADER = struct.Struct("<8sQ")
+ROW_COLUMNS = ("_block", "_start", "_end", "_record")
+
+
+def train_dictionary(samples: Iterable[str], size: int = DICTIONARY_SIZE) -> bytes:
+    """Build a preset compression dictionary from sample texts.
+
+    The word n-grams repeated across the samples are scored by the bytes they would
+    save and the best ones are concatenated, the most valuable last since zlib encodes
+    shorter distances more cheaply.
+
+    Args:
+        samples (Iterable[str]): The sample texts.
+        size (int): The maximal size of the dictionary in bytes.
+
+    Returns:
+        bytes: The dictionary, empty if no n-gram is repeated.
+
+    >>> train_dictionary(["the pump is rated", "the pump is cold"], size=12)
+    b'the pump is'
+    """
+    counts: Counter[str] = Counter()
+    for sample in samples:
+        words = sample.split()
+        for n in range(1, MAX_NGRAM + 1):
+            counts.update(" ".join(words[i : i + n]) for i in range(len(words) - n + 1))
+    ranked = sorted(
+        (ngram for ngram, count in counts.items() if count > 1),
+        key=lambda ngram: (counts[ngram] - 1) * len(ngram),
+        reverse=True,
+    )
+    picked: list[str] = []
+    used = 0
+    for ngram in ranked:
+        if used + len(ngram) + 1 > size + 1:
+            continue
+        if any(ngram in other for other in picked):
+            continue
+        picked.append(ngram)
+        used += len(ngram) + 1
+    return " ".join(reversed(picked)).encode()[:size]
+
+
+class CompressedDocstore(Docstore, AddableMixin):
+    """Docstore keeping the chunk texts compressed in blocks and the metadata interned.
+
+    A store of small chunks mostly holds repeated text: the same source path and page
+    fields on every chunk, and the vocabulary of the documents. Distinct metadata
+    dictionaries are kept once in a table referenced by each chunk, and the chunk
+    texts are concatenated in blocks of about ``block_size`` bytes compressed with
+    zlib and a preset dictionary trained on the first chunks of the store. A lookup
+    by id decompresses a single block outside the lock, and the last decompressed
+    blocks are cached up to ``CACHE_BYTES`` bytes.
+
+    New chunks wait uncompressed until they fill a block. Pickling compresses the
+    partial last block of a copy, so saving a store leaves the docstore unchanged, and
+    a docstore whose blocks were compressed before the dictionary could be trained is
+    compressed again once it holds ``TRAINING_SIZE`` bytes of chunks.
+    """
+
+    def __init__(
+        self: Self,
+        documents: dict[str, Document] | None = None,
+        block_size: int = BLOCK_SIZE,
+        dictionary_size: int = DICTIONARY_SIZE,
+    ) -> None:
+        """Initialize the docstore.
+
+        Args:
+            documents (dict[str, Document], optional): The documents by id.
+            block_size (int): The number of text bytes compressed together.
+            dictionary_size (int): The maximal size of the trained dictionary.
+        """
+        self.block_size = block_size
+        self.dictionary_size = dictionary_size
+        self.dictionary = b""
+        self._trained = False
+        self._blocks: list[bytes] = []
+        self._rows: dict[str, int] = {}
+        self._block = array("I")
+        self._start = array("I")
+        self._end = array("I")
+        self._record = array("I")
+        self._records: list[dict] = []
+        self._deleted = 0
+        self._raw_bytes = 0
+        self._lock = threading.RLock()
+        self._init_transient()
+        if documents:
+            self.add(documents)
+
+    def _init_transient(self: Self) -> None:
+        """Initialize the state rebuilt instead of pickled."""
+        self._tail: dict[str, tuple[bytes, int]] = {}
+        self._tail_bytes = 0
+        self._record_ids = {
+            self._record_key(record): record_id
+            for record_id, record in enumerate(self._records)
+        }
+        self._cache: OrderedDict[int, bytes] = OrderedDict()
+        self._cache_bytes = 0
+
+    def __getstate__(self: Self) -> dict:
+        """Get the state to pickle, with the waiting chunks compressed.
+
+        Returns:
+            dict: The state, without the caches and the lock.
+        """
+        with self._lock:
+            packed = object.__new__(type(self))
+            packed.__dict__.update(
+                self.__dict__,
+                _blocks=list(self._blocks),
+                _rows=dict(self._rows),
+                _block=array("I", self._block),
+                _start=array("I", self._start),
+                _end=array("I", self._end),
+                _record=array("I", self._record),
+                _records=list(self._records),
+                _tail=dict(self._tail),
+                _record_ids=dict(self._record_ids),
+                _cache=OrderedDict(),
+                _lock=threading.RLock(),
+            )
+        packed._pack(final=True)
+        state = packed.__dict__.copy()
+        for name in (
+            "_tail",
+            "_tail_bytes",
+            "_record_ids",
+            "_cache",
+            "_cache_bytes",
+            "_lock",
+        ):
+            del state[name]
+        return state
+
+    def __setstate__(self: Self, state: dict) -> None:
+        """Restore a pickled docstore.
+
+        Args:
+            state (dict): The pickled state.
+        """
+        # docstores pickled before the training flag was kept retrain once large enough
+        state.setdefault("_trained", state["_raw_bytes"] >= TRAINING_SIZE)
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+        self._init_transient()
+
+    def __len__(self: Self) -> int:
+        """Get the number of documents."""
+        return len(self._rows) + len(self._tail)
+
+    def __iter__(self: Self) -> Iterator[str]:
+        """Iterate over the document ids."""
+        with self._lock:
+            ids = [*self._rows, *self._tail]
+        return iter(ids)
+
+    def __contains__(self: Self, document_id: object) -> bool:
+        """Check whether a document is stored."""
+        return document_id in self._rows or document_id in self._tail
+
+    def add(self: Self, texts: dict[str, Document]) -> None:
+        """Add documents.
+
+        Args:
+            texts (dict[str, Document]): The documents by id.
+
+        Raises:
+            ValueError: If a document with the same id is already stored.
+        """
+        with self._lock:
+            if overlapping := {_id for _id in texts if _id in self}:
+                msg = f"Tried to add ids that already exist: {overlapping}"
+                raise ValueError(msg)
+            for document_id, document in texts.items():
+                text = document.page_content.encode()
+                self._tail[document_id] = (text, self._intern(document.metadata))
+                self._tail_bytes += len(text)
+            self._pack(final=False)
+
+    def delete(self: Self, ids: list) -> None:
+        """Delete documents.
+
+        The space of deleted chunks is reclaimed once they outnumber the stored ones.
+
+        Args:
+            ids (list): The ids of the documents.
+
+        Raises:
+            ValueError: If none of the documents is stored.
+        """
+        with self._lock:
+            if not any(_id in self for _id in ids):
+                msg = f"Tried to delete ids that does not exist: {ids}"
+                raise ValueError(msg)
+            for _id in ids:
+                if (waiting := self._tail.pop(_id, None)) is not None:
+                    self._tail_bytes -= len(waiting[0])
+                elif self._rows.pop(_id, None) is not None:
+                    self._deleted += 1
+            if self._deleted > max(len(self._rows), 1024):
+                self.compact()
+
+    def search(self: Self, search: str) -> str | Document:
+        """Look up a document by id.
+
+        Args:
+            search (str): The id of the document.
+
+        Returns:
+            str | Document: The document, or an error message if it is not stored.
+        """
+        with self._lock:
+            if (waiting := self._tail.get(search)) is not None:
+                text, record_id = waiting
+                return Document(
+                    page_content=text.decode(), metadata=dict(self._records[record_id])
+                )
+            if (row := self._rows.get(search)) is None:
+                return f"ID {search} not found."
+            # the row and its block are read together, so a compaction cannot change
+            # the layout in between, and the block is decompressed outside the lock
+            block_id, start, end = self._block[row], self._start[row], self._end[row]
+            metadata = dict(self._records[self._record[row]])
+            cache = self._cache
+            if (block := cache.get(block_id)) is not None:
+                cache.move_to_end(block_id)
+            else:
+                compressed, dictionary = self._blocks[block_id], self.dictionary
+        if block is None:
+            block = self._decompress(compressed, dictionary)
+            self._cache_block(cache, block_id, block)
+        # the text and metadata were validated when added, so validation is skipped
+        return Document.construct(
+            page_content=block[start:end].decode(), metadata=metadata
+        )
+
+    def metadata(self: Self, document_id: str) -> dict:
+        """Get the metadata of a document without decompressing its text.
+
+        Args:
+            document_id (str): The id of the document.
+
+        Returns:
+            dict: The metadata of the document.
+
+        Raises:
+            KeyError: If the document is not stored.
+        """
+        with self._lock:
+            if (waiting := self._tail.get(document_id)) is not None:
+                return dict(self._records[waiting[1]])
+            return dict(self._records[self._record[self._rows[document_id]]])
+
+    def compact(self: Self, retrain: bool = True) -> None:
+        """Rewrite the blocks without the deleted chunks.
+
+        Args:
+            retrain (bool): Whether to train a new dictionary on the stored chunks.
+        """
+        with self._lock:
+            documents = {_id: self.search(_id) for _id in self}
+            if retrain:
+                self.dictionary, self._trained = b"", False
+            self._blocks.clear()
+            self._rows.clear()
+            for column in (self._block, self._start, self._end, self._record):
+                del column[:]
+            self._records.clear()
+            self._deleted = 0
+            self._raw_bytes = 0
+            self._init_transient()
+            self.add(documents)
+
+    def stats(self: Self) -> dict[str, Any]:
+        """Get the size of the docstore.
+
+        Returns:
+            dict[str, Any]: The number of documents, blocks and metadata records, the
+                bytes of the compressed texts and of the dictionary, and the
+                compression ratio of the texts.
+        """
+        with self._lock:
+            compressed_bytes = sum(map(len, self._blocks)) + len(self.dictionary)
+            return {
+                "documents": len(self),
+                "blocks": len(self._blocks),
+                "metadata_records": len(self._records),
+                "text_bytes": self._raw_bytes,
+                "compressed_bytes": compressed_bytes,
+                "compression_ratio": self._raw_bytes / compressed_bytes
+                if compressed_bytes
+                else 1.0,
+            }
+
+    def _intern(self: Self, metadata: dict) -> int:
+        """Get the id of a metadata dictionary in the record table, adding it if new.
+
+        Args:
+            metadata (dict): The metadata of a document.
+
+        Returns:
+            int: The id of the record.
+        """
+        key = self._record_key(metadata)
+        if (record_id := self._record_ids.get(key)) is None:
+            record_id = self._record_ids[key] = len(self._records)
+            self._records.append(dict(metadata))
+        return record_id
+
+    @staticmethod
+    def _record_key(metadata: dict) -> str:
+        """Get the key identifying equal metadata dictionaries.
+
+        Args:
+            metadata (dict): The metadata of a document.
+
+        Returns:
+            str: The canonical JSON of the metadata.
+        """
+        return json.dumps(metadata, sort_keys=True, default=repr)
+
+    def _pack(self: Self, final: bool) -> None:
+        """Compress the waiting chunks into blocks.
+
+        The dictionary is trained once the docstore holds ``TRAINING_SIZE`` bytes of
+        chunks. Blocks compressed without a dictionary before, when pickling, are then
+        compressed again with it.
+
+        Args:
+            final (bool): Whether to also compress the last partial block.
+        """
+        if not self._trained:
+            trainable = self._raw_bytes + self._tail_bytes >= TRAINING_SIZE
+            if trainable and self._blocks:
+                self.compact()
+                return
+            if not trainable and not final:
+                return
+            if trainable:
+                self.dictionary = train_dictionary(
+                    (text.decode() for text, _ in self._tail.values()),
+                    self.dictionary_size,
+                )
+                self._trained = True
+        chunks: list[tuple[str, bytes, int]] = []
+        size = 0
+        for document_id, (text, record_id) in list(self._tail.items()):
+            chunks.append((document_id, text, record_id))
+            size += len(text)
+            if size >= self.block_size:
+                self._write_block(chunks)
+                chunks, size = [], 0
+        if final and chunks:
+            self._write_block(chunks)
+
+    def _write_block(self: Self, chunks: list[tuple[str, bytes, int]]) -> None:
+        """Compress chunks into a new block and index them.
+
+        Args:
+            chunks (list[tuple[str, bytes, int]]): The id, text and record of the chunks.
+        """
+        block_id = len(self._blocks)
+        offset = 0
+        for document_id, text, record_id in chunks:
+            self._rows[document_id] = len(self._block)
+            self._block.append(block_id)
+            self._start.append(offset)
+            self._end.append(offset + len(text))
+            self._record.append(record_id)
+            offset += len(text)
+            del self._tail[document_id]
+            self._tail_bytes -= len(text)
+        compressor = (
+            zlib.compressobj(COMPRESSION_LEVEL, zdict=self.dictionary)
+            if self.dictionary
+            else zlib.compressobj(COMPRESSION_LEVEL)
+        )
+        content = b"".join(text for _, text, _ in chunks)
+        self._blocks.append(compressor.compress(content) + compressor.flush())
+        self._raw_bytes += offset
+
+    @staticmethod
+    def _decompress(compressed: bytes, dictionary: bytes) -> bytes:
+        """Decompress a block.
+
+        Args:
+            compressed (bytes): The compressed block.
+            dictionary (bytes): The preset dictionary of the block, empty if none.
+
+        Returns:
+            bytes: The concatenated texts of the block.
+        """
+        decompressor = (
+            zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        )
+        return decompressor.decompress(compressed)
+
+    def _cache_block(
+        self: Self, cache: OrderedDict[int, bytes], block_id: int, block: bytes
+    ) -> None:
+        """Keep a decompressed block, dropping the least recently used ones.
+
+        Args:
+            cache (OrderedDict[int, bytes]): The cache the block was looked up in,
+                replaced by a compaction since then if not the current cache.
+            block_id (int): The id of the block.
+            block (bytes): The decompressed block.
+        """
+        with self._lock:
+            if cache is not self._cache or block_id in cache:
+                return
+            cache[block_id] = block
+            self._cache_bytes += len(block)
+            while self._cache_bytes > CACHE_BYTES:
+                self._cache_bytes -= len(cache.popitem(last=False)[1])
+
+
+def dump_docstore(docstore: Docstore, index_to_docstore_id: dict[int, str]) -> bytes:
+    """Serialize the docstore of a FAISS store without pickle.
+
+    The content holds a JSON header with the ids, the metadata and the layout of the
+    docstore, followed by the binary blocks and row columns of a compressed docstore.
+    Loading it builds documents and arrays only, so it can be read from untrusted
+    files, unlike the pickle files of store folders.
+
+    Args:
+        docstore (Docstore): A compressed or in-memory docstore.
+        index_to_docstore_id (dict[int, str]): The docstore id of each index position.
+
+    Returns:
+        bytes: The serialized docstore.
+    """
+    blobs: list[bytes] = []
+    if isinstance(docstore, CompressedDocstore):
+        state = docstore.__getstate__()
+        blobs = [
+            state["dictionary"],
+            *state["_blocks"],
+            *(_column_bytes(state[column]) for column in ROW_COLUMNS),
+        ]
+        header = {
+            "type": "compressed",
+            "block_size": state["block_size"],
+            "dictionary_size": state["dictionary_size"],
+            "trained": state["_trained"],
+            "rows": state["_rows"],
+            "records": state["_records"],
+            "deleted": state["_deleted"],
+            "raw_bytes": state["_raw_bytes"],
+            "blob_lengths": [len(blob) for blob in blobs],
+        }
+    else:
+        header = {
+            "type": "in_memory",
+            "documents": {
+                document_id: {
+                    "id": document.id,
+                    "page_content": document.page_content,
+                    "metadata": document.metadata,
+                }
+                for document_id, document in docstore._dict.items()
+            },
+        }
+    header["index_to_docstore_id"] = index_to_docstore_id
+    content = json.dumps(header, default=repr).encode()
+    return b"".join(
+        [DOCSTORE_HEADER.pack(DOCSTORE_MAGIC, len(content)), content, *blobs]
+    )
+
+
+def load_docstore(content: bytes) -> tuple[Docstore, dict[int, str]]:
+    """Load a docstore serialized by ``dump_docstore``.
+
+    Args:
+        content (bytes): The serialized docstore.
+
+    Returns:
+        tuple[Docstore, dict[int, str]]: The docstore and the docstore id of each
+            index position.
+
+    Raises:
+        ValueError: If the content is not a serialized docstore.
+    """
+    if len(content) < DOCSTORE_HEADER.size:
+        msg = "Not a serialized docstore"
+        raise ValueError(msg)
+    magic, length = DOCSTORE_HEADER.unpack_from(content)
+    if magic != DOCSTORE_MAGIC:
+        msg = "Not a serialized docstore"
+        raise ValueError(msg)
+    start = DOCSTORE_HEADER.size
+    header = json.loads(content[start : start + length])
+    index_to_docstore_id = {
+        int(position): document_id
+        for position, document_id in header["index_to_docstore_id"].items()
+    }
+    if header["type"] == "in_memory":
+        documents = {
+            document_id: Document(**document)
+            for document_id, document in header["documents"].items()
+        }
+        return InMemoryDocstore(documents), index_to_docstore_id
+    blobs: list[bytes] = []
+    offset = start + length
+    for blob_length in header["blob_lengths"]:
+        blobs.append(content[offset : offset + blob_length])
+        offset += blob_length
+    if offset != len(content):
+        msg = "Truncated serialized docstore"
+        raise ValueError(msg)
+    dictionary, *blocks = blobs[: -len(ROW_COLUMNS)]
+    docstore = object.__new__(CompressedDocstore)
+    docstore.__setstate__(
+        {
+            "block_size": header["block_size"],
+            "dictionary_size": header["dictionary_size"],
+            "dictionary": dictionary,
+            "_trained": header["trained"],
+            "_blocks": blocks,
+            "_rows": header["rows"],
+            **{
+                column: _column(blob)
+                for column, blob in zip(
+                    ROW_COLUMNS, blobs[-len(ROW_COLUMNS) :], strict=True
+                )
+            },
+            "_records": header["records"],
+            "_deleted": header["deleted"],
+            "_raw_bytes": header["raw_bytes"],
+        }
+    )
+    return docstore, index_to_docstore_id
+
+
+def _column_bytes(column: array) -> bytes:
+    """Get the little-endian bytes of a row column.
+
+    Args:
+        column (array): The column.
+
+    Returns:
+        bytes: The content of the column.
+    """
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _column(content: bytes) -> array:
+    """Build a row column from its little-endian bytes.
+
+    Args:
+        content (bytes): The content of the column.
+
+    Returns:
+        array: The column.
+    """
+    column = array("I")
+    column.frombytes(content)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
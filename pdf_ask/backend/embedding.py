@@ -1,9 +1,62 @@
-from typing import Any
+from typing import Any, Self
+
+import hashlib
+import math
 
 from langchain_core.embeddings import Embeddings
-from langchain_openai import OpenAIEmbeddings
 
-ALLOWED_EMBEDDERS: dict[str, type[Embeddings]] = {"openAI": OpenAIEmbeddings}
+from pdf_ask.backend.lazy import LazyRegistry
+from pdf_ask.backend.spliter import TOKEN_PATTERN
+
+
+class HashingEmbeddings(Embeddings):
+    """Local, deterministic bag-of-words embeddings based on feature hashing.
+
+    Every lower-cased token is hashed into one of ``size`` signed buckets and the
+    resulting vector is L2 normalized. Texts sharing words get similar vectors, which
+    makes this embedder usable offline, in tests and in benchmarks.
+    """
+
+    def __init__(self: Self, size: int = 256) -> None:
+        """Initialize the embedder.
+
+        Args:
+            size (int): The dimension of the produced vectors.
+        """
+        self.size = size
+
+    def embed_documents(self: Self, texts: list[str]) -> list[list[float]]:
+        """Embed a list of documents.
+
+        Args:
+            texts (list[str]): The texts to embed.
+
+        Returns:
+            list[list[float]]: One vector per text.
+        """
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self: Self, text: str) -> list[float]:
+        """Embed a single text.
+
+        Args:
+            text (str): The text to embed.
+
+        Returns:
+            list[float]: The normalized vector of the text.
+        """
+        vector = [0.0] * self.size
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.size] += 1.0 if value >> 63 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+
+ALLOWED_EMBEDDERS = LazyRegistry(
+    {"openAI": "langchain_openai:OpenAIEmbeddings", "hashing": HashingEmbeddings}
+)
 
 
 class EmbedderNotAllowedError(Exception):
@@ -0,0 +1,373 @@
+from typing import Self
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from pdf_ask.backend.chat_model import ALLOWED_CHAT_MODELS
+from pdf_ask.backend.clients import get_client_pool
+from pdf_ask.backend.embedding import ALLOWED_EMBEDDERS
+from pdf_ask.backend.llm import ChatMessage, Role, SimpleRAGChatBot
+from pdf_ask.backend.loader import LocalLoader
+from pdf_ask.backend.spliter import (
+    ALLOWED_SPLITTER,
+    count_tokens,
+    get_text_splitter_instance,
+)
+from pdf_ask.backend.vector_store import FaissVectorStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EvaluationQuestion:
+    question: str
+    expected_answer: str | None = None
+    expected_sources: list[str] | None = None
+
+
+@dataclass
+class EvaluationResult:
+    question: str
+    answer: str | None = None
+    sources: list[str] = field(default_factory=list)
+    expected_answer: str | None = None
+    answer_match: bool | None = None
+    expected_sources: list[str] | None = None
+    retrieval_hit: bool | None = None
+    retrieval_s: float = 0.0
+    prompt_s: float = 0.0
+    llm_s: float = 0.0
+    prompt_tokens: int = 0
+    answer_tokens: int = 0
+    error: str | None = None
+
+
+def load_questions(file_path: str) -> list[EvaluationQuestion]:
+    """Load the questions of an evaluation run.
+
+    A ``.jsonl`` file holds one object per line with a ``question`` and optionally an
+    ``expected_answer`` and a list of ``expected_sources`` (file names). Any other file
+    holds one question per line.
+
+    Args:
+        file_path (str): The path to the questions file.
+
+    Returns:
+        list[EvaluationQuestion]: The questions.
+    """
+    path = Path(file_path)
+    lines = [line for line in path.read_text().splitlines() if line.strip()]
+    if path.suffix == ".jsonl":
+        return [EvaluationQuestion(**json.loads(line)) for line in lines]
+    return [EvaluationQuestion(line.strip()) for line in lines]
+
+
+def write_results(results: list[EvaluationResult], file_path: str) -> None:
+    """Write the results of an evaluation run, one JSON object per line.
+
+    Args:
+        results (list[EvaluationResult]): The results.
+        file_path (str): The path to the output file.
+    """
+    with Path(file_path).open("w") as file:
+        for result in results:
+            file.write(json.dumps(asdict(result)) + "\n")
+
+
+def summarize(results: list[EvaluationResult]) -> dict:
+    """Aggregate the results of an evaluation run.
+
+    Args:
+        results (list[EvaluationResult]): The results.
+
+    Returns:
+        dict: The number of questions and errors, the retrieval hit rate and answer
+            accuracy over the questions having expectations, the mean and 95th
+            percentile of the LLM latency and the total number of tokens.
+    """
+    answered = [result for result in results if result.error is None]
+    hits = [r.retrieval_hit for r in answered if r.retrieval_hit is not None]
+    matches = [r.answer_match for r in answered if r.answer_match is not None]
+    latencies = sorted(result.llm_s for result in answered)
+    return {
+        "questions": len(results),
+        "errors": len(results) - len(answered),
+        "retrieval_hit_rate": sum(hits) / len(hits) if hits else None,
+        "answer_accuracy": sum(matches) / len(matches) if matches else None,
+        "llm_s_mean": statistics.fmean(latencies) if latencies else None,
+        "llm_s_p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+        "prompt_tokens": sum(result.prompt_tokens for result in answered),
+        "answer_tokens": sum(result.answer_tokens for result in answered),
+    }
+
+
+class _RateLimiter:
+    """Space the start of requests to at most ``rate`` per second."""
+
+    def __init__(self: Self, rate: float) -> None:
+        self.interval = 1 / rate
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self: Self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+@dataclass
+class _LlmCallLimits:
+    """The bounds of the concurrency and of the rate of the LLM calls of a run."""
+
+    semaphore: asyncio.Semaphore
+    limiter: _RateLimiter | None = None
+
+
+class BatchRunner:
+    """Answer many independent questions with a RAG chatbot.
+
+    Questions are retrieved in batches with one embedding call and one FAISS search per
+    batch, then answered concurrently with at most ``concurrency`` LLM calls in flight
+    and at most ``requests_per_second`` LLM calls started per second. Retrieval of the
+    next batch overlaps with the LLM calls of the previous one. A failing question is
+    recorded with its error instead of stopping the run: when the retrieval of a batch
+    fails, its questions are retrieved one by one to isolate the failing ones.
+
+    Attributes:
+        bot: The chatbot whose vector store, context packer and chain are used.
+        concurrency: The maximal number of concurrent LLM calls.
+        requests_per_second: The maximal rate of LLM calls, unlimited if None.
+        batch_size: The number of questions retrieved at once.
+    """
+
+    def __init__(
+        self: Self,
+        bot: SimpleRAGChatBot,
+        concurrency: int = 8,
+        requests_per_second: float | None = None,
+        batch_size: int = 64,
+    ) -> None:
+        """Initialize the batch runner.
+
+        Args:
+            bot: The chatbot whose vector store, context packer and chain are used.
+            concurrency: The maximal number of concurrent LLM calls.
+            requests_per_second: The maximal rate of LLM calls, unlimited if None.
+            batch_size: The number of questions retrieved at once.
+        """
+        self.bot = bot
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.batch_size = batch_size
+
+    def run(self: Self, questions: list[EvaluationQuestion]) -> list[EvaluationResult]:
+        """Answer the questions.
+
+        Args:
+            questions: The questions.
+
+        Returns:
+            list[EvaluationResult]: The result of each question, in the same order.
+        """
+        return asyncio.run(self.arun(questions))
+
+    async def arun(
+        self: Self, questions: list[EvaluationQuestion]
+    ) -> list[EvaluationResult]:
+        """Asynchronously answer the questions.
+
+        Args:
+            questions: The questions.
+
+        Returns:
+            list[EvaluationResult]: The result of each question, in the same order.
+        """
+        limits = _LlmCallLimits(
+            asyncio.Semaphore(self.concurrency),
+            _RateLimiter(self.requests_per_second)
+            if self.requests_per_second
+            else None,
+        )
+        tasks = []
+        for start in range(0, len(questions), self.batch_size):
+            batch = questions[start : start + self.batch_size]
+            started_at = time.perf_counter()
+            batch_documents = await self._retrieve(batch)
+            retrieval_s = (time.perf_counter() - started_at) / len(batch)
+            tasks.extend(
+                asyncio.create_task(
+                    self._answer(question, documents, retrieval_s, limits)
+                )
+                for question, documents in zip(batch, batch_documents, strict=True)
+            )
+            logger.info(f"Retrieved {start + len(batch)}/{len(questions)} questions")
+        return list(await asyncio.gather(*tasks))
+
+    async def _retrieve(
+        self: Self, batch: list[EvaluationQuestion]
+    ) -> list[list[dict] | Exception]:
+        """Retrieve the documents of a batch of questions.
+
+        Args:
+            batch: The questions.
+
+        Returns:
+            list[list[dict] | Exception]: The documents of each question, or the error
+                raised while retrieving them.
+        """
+        queries = [question.question for question in batch]
+        try:
+            return await asyncio.to_thread(
+                self.bot.vector_store.batch_similarity_search,
+                queries,
+                **self.bot.search_options(),
+            )
+        except Exception:
+            logger.exception(f"Failed to retrieve a batch of {len(batch)} questions")
+        results = []
+        for query in queries:
+            try:
+                (documents,) = await asyncio.to_thread(
+                    self.bot.vector_store.batch_similarity_search,
+                    [query],
+                    **self.bot.search_options(),
+                )
+            except Exception as error:
+                logger.exception(f"Failed to retrieve '{query}'")
+                documents = error
+            results.append(documents)
+        return results
+
+    async def _answer(
+        self: Self,
+        question: EvaluationQuestion,
+        documents: list[dict] | Exception,
+        retrieval_s: float,
+        limits: _LlmCallLimits,
+    ) -> EvaluationResult:
+        """Answer one question from its retrieved documents.
+
+        Args:
+            question: The question.
+            documents: The documents retrieved for the question, or the error raised
+                while retrieving them.
+            retrieval_s: The share of the batched retrieval time of the question.
+            limits: The bounds of the concurrency and rate of the LLM calls.
+
+        Returns:
+            EvaluationResult: The result of the question, with the error that stopped
+                it if any.
+        """
+        result = EvaluationResult(
+            question.question,
+            expected_answer=question.expected_answer,
+            expected_sources=question.expected_sources,
+            retrieval_s=retrieval_s,
+        )
+        if isinstance(documents, Exception):
+            result.error = repr(documents)
+            return result
+        try:
+            await self._complete(result, question, documents, limits)
+        except Exception as error:
+            logger.exception(f"Failed to answer '{question.question}'")
+            result.error = repr(error)
+        return result
+
+    async def _complete(
+        self: Self,
+        result: EvaluationResult,
+        question: EvaluationQuestion,
+        documents: list[dict],
+        limits: _LlmCallLimits,
+    ) -> None:
+        """Fill the result of a question from its retrieved documents.
+
+        Args:
+            result: The result of the question, updated in place.
+            question: The question.
+            documents: The documents retrieved for the question.
+            limits: The bounds of the concurrency and rate of the LLM calls.
+        """
+        started_at = time.perf_counter()
+        passages = self.bot.context_packer.pack(documents)
+        inputs = self.bot.build_inputs(
+            ChatMessage(Role.USER, question.question), "", passages
+        )
+        result.prompt_tokens = count_tokens(self.bot.prompt.format(**inputs))
+        result.sources = [
+            Path(passage["metadata"]["source"]).name
+            for passage in passages
+            if "source" in passage.get("metadata", {})
+        ]
+        if question.expected_sources:
+            result.retrieval_hit = bool(
+                {Path(source).name for source in question.expected_sources}
+                & set(result.sources)
+            )
+        result.prompt_s = time.perf_counter() - started_at
+        async with limits.semaphore:
+            if limits.limiter:
+                await limits.limiter.wait()
+            started_at = time.perf_counter()
+            response = await self.bot.chain.ainvoke(inputs)
+            result.llm_s = time.perf_counter() - started_at
+        result.answer = response.content
+        result.answer_tokens = count_tokens(result.answer)
+        if question.expected_answer:
+            result.answer_match = (
+                question.expected_answer.lower() in result.answer.lower()
+            )
+
+
+def main() -> None:
+    """Run an evaluation from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Answer a file of questions against a vector store."
+    )
+    parser.add_argument("store_path", help="Path to the vector store folder.")
+    parser.add_argument("questions", help="Questions file (.jsonl or one per line).")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL results.")
+    parser.add_argument("--embedder", default="openAI", choices=ALLOWED_EMBEDDERS)
+    parser.add_argument("--splitter", default="recursive", choices=ALLOWED_SPLITTER)
+    parser.add_argument("--llm", default="openAI", choices=ALLOWED_CHAT_MODELS)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument(
+        "--mmr-lambda",
+        type=float,
+        default=None,
+        help="Diversity factor of the retrieved documents, from 0 (diverse) to 1.",
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests-per-second", type=float, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    vector_store = FaissVectorStore(
+        LocalLoader(get_text_splitter_instance(args.splitter)),
+        get_client_pool().get_embeddings(args.embedder),
+        args.store_path,
+    )
+    bot = SimpleRAGChatBot(
+        get_client_pool().get_chat_model(args.llm),
+        vector_store,
+        top_k=args.top_k,
+        mmr_lambda=args.mmr_lambda,
+    )
+    runner = BatchRunner(bot, args.concurrency, args.requests_per_second)
+    results = runner.run(load_questions(args.questions))
+    write_results(results, args.output)
+    logger.info(f"Evaluation summary: {json.dumps(summarize(results))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+from typing import TYPE_CHECKING, Self
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+
+from pdf_ask.backend.spliter import count_tokens
+
+if TYPE_CHECKING:
+    from pdf_ask.backend.llm import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+_summary_executor = ThreadPoolExecutor(thread_name_prefix="chat-summary")
+
+
+class ChatHistoryManager:
+    """Keep the chat history sent to the LLM within a token budget.
+
+    The last ``keep_turns`` turns are sent verbatim, as long as they fit in the budget
+    together with the summary. Older messages are folded once into a rolling summary,
+    which is updated incrementally with the LLM, so the size of the prompt stays flat
+    during long conversations. The summary is updated in a background thread, so
+    answers never wait for it; messages leaving the verbatim turns are left out of the
+    prompt until the summary includes them. Without an LLM older messages are dropped.
+    The current question is never part of the history.
+
+    Attributes:
+        llm: The language model used to summarize older messages, if any. Setting it
+            keeps the summary.
+        token_budget: The maximal number of tokens of the formatted history.
+        keep_turns: The number of most recent turns kept verbatim.
+        summary: The summary of the folded messages.
+    """
+
+    summary_prompt = """
+Progressively summarize the conversation between a user and an assistant answering questions about
+documents. Extend the current summary with the new messages and return the new summary only.
+Keep facts, names and numbers that may be referred to later, in at most {max_words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+New summary:
+"""
+
+    def __init__(
+        self: Self,
+        llm: BaseChatModel | None = None,
+        token_budget: int = 1024,
+        keep_turns: int = 3,
+    ) -> None:
+        """Initialize the history manager.
+
+        Args:
+            llm: The language model used to summarize older messages, if any.
+            token_budget: The maximal number of tokens of the formatted history.
+            keep_turns: The number of most recent turns kept verbatim.
+        """
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.summary = ""
+        self._folded = 0
+        self._epoch = 0
+        self._pending: Future | None = None
+        self._lock = threading.Lock()
+        self.llm = llm
+
+    @property
+    def llm(self: Self) -> BaseChatModel | None:
+        """The language model used to summarize older messages, if any."""
+        return self._llm
+
+    @llm.setter
+    def llm(self: Self, llm: BaseChatModel | None) -> None:
+        self._llm = llm
+        self.chain = (
+            ChatPromptTemplate.from_template(self.summary_prompt) | llm if llm else None
+        )
+
+    def build(self: Self, question: "ChatMessage", history: list["ChatMessage"]) -> str:
+        """Build the chat history of the prompt, updating the summary if needed.
+
+        Args:
+            question: The chat message containing the user's question.
+            history: The list of chat messages, which may end with the question.
+
+        Returns:
+            str: The summary of older messages followed by the recent messages.
+        """
+        messages, recent_start = self._plan(question, history)
+        if folded := messages[self._folded : recent_start]:
+            if self.chain:
+                self._fold(folded, recent_start)
+            else:
+                self._folded = recent_start
+        return self._format(messages[recent_start:])
+
+    def wait(self: Self, timeout: float | None = None) -> bool:
+        """Wait until the summary includes all folded messages.
+
+        Args:
+            timeout: The maximal number of seconds to wait, forever if None.
+
+        Returns:
+            bool: True if no summary update is running anymore.
+        """
+        pending = self._pending
+        if pending is None:
+            return True
+        try:
+            pending.exception(timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    def clear(self: Self) -> None:
+        """Forget the summary, e.g. when the conversation is reset."""
+        with self._lock:
+            self.summary = ""
+            self._folded = 0
+            self._epoch += 1
+            self._pending = None
+
+    def _fold(self: Self, messages: list["ChatMessage"], folded: int) -> None:
+        """Fold messages into the summary in the background, unless already folding.
+
+        Args:
+            messages: The messages to fold into the summary.
+            folded: The number of messages folded once the summary is updated.
+        """
+        with self._lock:
+            if self._pending and not self._pending.done():
+                return
+            self._pending = _summary_executor.submit(
+                self._update_summary,
+                self.chain,
+                self._summary_inputs(messages),
+                folded,
+                self._epoch,
+            )
+
+    def _update_summary(
+        self: Self, chain: Runnable, inputs: dict, folded: int, epoch: int
+    ) -> None:
+        """Summarize folded messages with the LLM and record the new summary.
+
+        Args:
+            chain: The summary prompt and language model.
+            inputs: The values of the summary prompt variables.
+            folded: The number of messages folded once the summary is updated.
+            epoch: The number of times the history was cleared when the update started.
+        """
+        try:
+            summary = chain.invoke(inputs).content
+        except Exception:
+            logger.exception("Failed to update the chat summary")
+            return
+        with self._lock:
+            if epoch == self._epoch:
+                self.summary = summary
+                self._folded = folded
+
+    def _plan(
+        self: Self, question: "ChatMessage", history: list["ChatMessage"]
+    ) -> tuple[list["ChatMessage"], int]:
+        """Select the messages of the history and where the verbatim part starts.
+
+        Args:
+            question: The chat message containing the user's question.
+            history: The list of chat messages, which may end with the question.
+
+        Returns:
+            tuple[list[ChatMessage], int]: The previous messages and the index of the
+                first message sent verbatim.
+        """
+        messages = [message for message in history if message is not question]
+        if (
+            messages
+            and messages[-1].role == question.role
+            and messages[-1].text == question.text
+        ):
+            messages.pop()
+        if len(messages) < self._folded:
+            self.clear()
+        recent_start = max(len(messages) - 2 * self.keep_turns, self._folded)
+        summary_tokens = 0
+        if self.chain and (self.summary or recent_start > self._folded):
+            summary_tokens = max(count_tokens(self.summary), self.token_budget // 4)
+        recent_tokens = [count_tokens(message.text) for message in messages]
+        while (
+            recent_start < len(messages)
+            and summary_tokens + sum(recent_tokens[recent_start:]) > self.token_budget
+        ):
+            recent_start += 1
+        return messages, recent_start
+
+    def _summary_inputs(self: Self, messages: list["ChatMessage"]) -> dict:
+        """Build the inputs of the summary prompt.
+
+        Args:
+            messages: The messages to fold into the summary.
+
+        Returns:
+            dict: The values of the summary prompt variables.
+        """
+        logger.info(f"Folding {len(messages)} messages into the chat summary")
+        return {
+            "summary": self.summary or "(empty)",
+            "messages": self._format_messages(messages),
+            "max_words": self.token_budget // 4,
+        }
+
+    def _format(self: Self, messages: list["ChatMessage"]) -> str:
+        """Format the summary and the recent messages.
+
+        Args:
+            messages: The recent messages.
+
+        Returns:
+            str: The formatted chat history.
+        """
+        recent = self._format_messages(messages)
+        if self.summary:
+            return f"Summary of the earlier conversation: {self.summary}\n{recent}"
+        return recent
+
+    @staticmethod
+    def _format_messages(messages: list["ChatMessage"]) -> str:
+        """Format messages one per line.
+
+        Args:
+            messages: The messages to format.
+
+        Returns:
+            str: The role and text of each message.
+        """
+        return "\n".join(
+            f"{message.role.value}: {message.text}" for message in messages
+        )
@@ -0,0 +1,465 @@
+from typing import Self
+
+import functools
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+
+from pdf_ask.backend.store_cache import open_vector_store
+from pdf_ask.backend.vector_store import EmbeddingMismatchError, FaissVectorStore
+
+logger = logging.getLogger(__name__)
+
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    store_path TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    embedder_name TEXT NOT NULL,
+    splitter_name TEXT NOT NULL,
+    force INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+UPDATABLE_COLUMNS = frozenset(
+    ["status", "stage", "done", "total", "error", "updated_at"]
+)
+
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass
+class IngestionJob:
+    id: str
+    store_path: str
+    file_path: str
+    embedder_name: str
+    splitter_name: str
+    force: bool
+    status: JobStatus
+    stage: str
+    done: int = 0
+    total: int = 0
+    error: str | None = None
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    @property
+    def active(self: Self) -> bool:
+        """Whether the job is waiting or running."""
+        return self.status in {JobStatus.QUEUED, JobStatus.RUNNING}
+
+
+StoreFactory = Callable[[IngestionJob], FaissVectorStore]
+
+
+def create_job_store(job: IngestionJob) -> FaissVectorStore:
+    """Open the vector store of a job with its embedder and splitter.
+
+    Args:
+        job (IngestionJob): The ingestion job.
+
+    Returns:
+        FaissVectorStore: The vector store.
+    """
+    return open_vector_store(job.store_path, job.embedder_name, job.splitter_name)
+
+
+class IngestionJobQueue:
+    """Ingest files into vector stores in background worker threads.
+
+    Jobs are persisted in a SQLite table with their status and per-file progress
+    (``parsing``, ``split``, ``embedding``, ``indexed``), so any session can poll them
+    and jobs interrupted by a restart are queued again. Jobs of the same store run one
+    at a time in submission order, while jobs of different stores run concurrently on
+    up to ``max_workers`` threads. A worker opens the store once for the jobs of a store
+    it runs in a row, rather than once per job.
+
+    When several processes share the job table, only one of them should run the jobs:
+    the others are created with ``run_jobs=False`` and only record the jobs, which the
+    running queue picks up with :meth:`watch`.
+
+    Attributes:
+        db_path: The path to the SQLite database of the jobs.
+        store_factory: The function opening the vector store of a job.
+    """
+
+    def __init__(
+        self: Self,
+        db_path: str,
+        max_workers: int = 2,
+        store_factory: StoreFactory = create_job_store,
+        run_jobs: bool = True,
+    ) -> None:
+        """Initialize the queue and queue again the jobs left unfinished.
+
+        Args:
+            db_path: The path to the SQLite database of the jobs.
+            max_workers: The maximal number of jobs running concurrently.
+            store_factory: The function opening the vector store of a job.
+            run_jobs: Whether this queue runs the jobs, or only records them for the
+                queue of another process.
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.store_factory = store_factory
+        self.run_jobs = run_jobs
+        self._executor = (
+            ThreadPoolExecutor(max_workers, thread_name_prefix="ingestion")
+            if run_jobs
+            else None
+        )
+        self._pending: dict[str, deque[str]] = {}
+        self._scheduled: set[str] = set()
+        self._lock = threading.Lock()
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(JOBS_SCHEMA)
+        if run_jobs:
+            self.schedule_queued()
+
+    def submit(
+        self: Self,
+        store_path: str,
+        file_path: str,
+        embedder_name: str,
+        splitter_name: str,
+        force: bool = True,
+    ) -> IngestionJob:
+        """Queue the ingestion of a file already written to disk.
+
+        Args:
+            store_path: The path to the vector store folder.
+            file_path: The path to the file.
+            embedder_name: The name of the embedder of the store.
+            splitter_name: The name of the text splitter.
+            force: Whether to replace the chunks of a file already in the store.
+
+        Returns:
+            IngestionJob: The queued job.
+        """
+        now = time.time()
+        job = IngestionJob(
+            uuid.uuid4().hex,
+            store_path,
+            file_path,
+            embedder_name,
+            splitter_name,
+            force,
+            JobStatus.QUEUED,
+            JobStatus.QUEUED.value,
+            created_at=now,
+            updated_at=now,
+        )
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.store_path,
+                    job.file_path,
+                    job.embedder_name,
+                    job.splitter_name,
+                    int(job.force),
+                    job.status.value,
+                    job.stage,
+                    job.done,
+                    job.total,
+                    job.error,
+                    job.created_at,
+                    job.updated_at,
+                ),
+            )
+        self._schedule(job)
+        return job
+
+    def get_job(self: Self, job_id: str) -> IngestionJob | None:
+        """Get a job by its identifier.
+
+        Args:
+            job_id: The identifier of the job.
+
+        Returns:
+            IngestionJob | None: The job, if it exists.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._to_job(row) if row else None
+
+    def list_jobs(
+        self: Self,
+        store_path: str | None = None,
+        active_only: bool = False,
+        limit: int | None = 100,
+    ) -> list[IngestionJob]:
+        """List the jobs in submission order.
+
+        Args:
+            store_path: Only list the jobs of this store, if given.
+            active_only: Only list the queued and running jobs.
+            limit: The maximal number of most recent jobs to list, all if None.
+
+        Returns:
+            list[IngestionJob]: The jobs.
+        """
+        query, parameters = "SELECT * FROM jobs WHERE 1 = 1", []
+        if store_path is not None:
+            query += " AND store_path = ?"
+            parameters.append(store_path)
+        if active_only:
+            query += " AND status IN (?, ?)"
+            parameters.extend([JobStatus.QUEUED.value, JobStatus.RUNNING.value])
+        query += " ORDER BY created_at DESC, rowid DESC LIMIT ?"
+        parameters.append(-1 if limit is None else limit)
+        with self._connect() as connection:
+            rows = connection.execute(query, parameters).fetchall()
+        return [self._to_job(row) for row in reversed(rows)]
+
+    def schedule_queued(self: Self) -> int:
+        """Schedule the unfinished jobs of the table not scheduled yet.
+
+        Returns:
+            int: The number of newly scheduled jobs.
+        """
+        scheduled = 0
+        for job in self.list_jobs(active_only=True, limit=None):
+            if self._schedule(job):
+                logger.info(f"Scheduled ingestion job {job.id} of {job.file_path}")
+                scheduled += 1
+        return scheduled
+
+    def watch(self: Self, interval: float = 1.0) -> threading.Thread:
+        """Schedule the jobs recorded by other processes from a background thread.
+
+        Args:
+            interval: The number of seconds between two checks of the job table.
+
+        Returns:
+            threading.Thread: The watching thread.
+        """
+
+        def watch_jobs() -> None:
+            while True:
+                try:
+                    self.schedule_queued()
+                except (sqlite3.Error, RuntimeError):
+                    logger.exception("Failed to schedule the queued ingestion jobs")
+                time.sleep(interval)
+
+        thread = threading.Thread(
+            target=watch_jobs, name="ingestion-watch", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def wait(self: Self, timeout: float | None = None) -> bool:
+        """Wait until no job is queued or running.
+
+        Args:
+            timeout: The maximal number of seconds to wait, forever if None.
+
+        Returns:
+            bool: True if all jobs finished before the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+
+    def shutdown(self: Self) -> None:
+        """Stop the workers after the running jobs, leaving the others queued."""
+        with self._lock:
+            self._pending.clear()
+        if self._executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _schedule(self: Self, job: IngestionJob) -> bool:
+        """Queue a job behind the other jobs of its store.
+
+        Args:
+            job: The job to queue.
+
+        Returns:
+            bool: True if the job was queued, False if it already was or if this queue
+                does not run jobs.
+        """
+        if self._executor is None:
+            return False
+        with self._lock:
+            if job.id in self._scheduled:
+                return False
+            self._scheduled.add(job.id)
+            if job.store_path in self._pending:
+                self._pending[job.store_path].append(job.id)
+                return True
+            self._pending[job.store_path] = deque([job.id])
+        self._executor.submit(self._drain, job.store_path)
+        return True
+
+    def _drain(self: Self, store_path: str) -> None:
+        """Run the jobs of a store one after the other until none is left.
+
+        The store is opened once per embedder and splitter and reused by the following
+        jobs, as adding a file catches up with the changes of other writers.
+
+        Args:
+            store_path: The path to the vector store folder.
+        """
+        stores: dict[tuple[str, str], FaissVectorStore] = {}
+        while True:
+            with self._lock:
+                pending = self._pending.get(store_path)
+                if not pending:
+                    self._pending.pop(store_path, None)
+                    return
+                job_id = pending[0]
+            self._run(job_id, stores)
+            with self._lock:
+                self._scheduled.discard(job_id)
+                if pending := self._pending.get(store_path):
+                    pending.popleft()
+
+    def _run(
+        self: Self, job_id: str, stores: dict[tuple[str, str], FaissVectorStore]
+    ) -> None:
+        """Run a job, recording its progress and outcome.
+
+        Args:
+            job_id: The identifier of the job.
+            stores: The stores opened by the previous jobs of the same store, by
+                embedder and splitter names. A store is dropped when its job fails,
+                and reopened when it was migrated to other embeddings meanwhile.
+        """
+        job = self.get_job(job_id)
+        if job is None:
+            return
+        self._update(job_id, status=JobStatus.RUNNING.value, stage="parsing")
+        key = (job.embedder_name, job.splitter_name)
+        progress = functools.partial(self._record_progress, job_id)
+        try:
+            if key not in stores:
+                stores[key] = self.store_factory(job)
+            try:
+                stores[key].add_file(job.file_path, force=job.force, progress=progress)
+            except EmbeddingMismatchError:
+                # the store was migrated to other embeddings since the previous job
+                stores[key] = self.store_factory(job)
+                stores[key].add_file(job.file_path, force=job.force, progress=progress)
+        except Exception as error:
+            logger.exception(f"Ingestion job {job_id} of {job.file_path} failed")
+            stores.pop(key, None)
+            self._update(job_id, status=JobStatus.FAILED.value, error=repr(error))
+            return
+        self._update(job_id, status=JobStatus.COMPLETED.value)
+        logger.info(f"Ingested {job.file_path} into {job.store_path}")
+
+    def _record_progress(
+        self: Self, job_id: str, stage: str, done: int, total: int
+    ) -> None:
+        """Record the progress of a job.
+
+        Args:
+            job_id: The identifier of the job.
+            stage: The current stage of the job.
+            done: The number of processed chunks.
+            total: The number of chunks to process.
+        """
+        self._update(job_id, stage=stage, done=done, total=total)
+
+    def _update(self: Self, job_id: str, **fields: object) -> None:
+        """Update the fields of a job.
+
+        Args:
+            job_id: The identifier of the job.
+            **fields: The new values of the columns, among ``UPDATABLE_COLUMNS``.
+
+        Raises:
+            ValueError: If a column cannot be updated.
+        """
+        fields["updated_at"] = time.time()
+        if unknown := set(fields) - UPDATABLE_COLUMNS:
+            msg = f"Cannot update the job columns {sorted(unknown)}"
+            raise ValueError(msg)
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._connect() as connection:
+            # The column names come from UPDATABLE_COLUMNS, the values are parameters
+            connection.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",  # noqa: S608 # nosec
+                [*fields.values(), job_id],
+            )
+
+    @contextmanager
+    def _connect(self: Self) -> Iterator[sqlite3.Connection]:
+        """Open a connection to the job database for a transaction.
+
+        The transaction is committed, or rolled back on error, and the connection is
+        closed on exit.
+
+        Yields:
+            sqlite3.Connection: The connection.
+        """
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> IngestionJob:
+        """Convert a row of the job table.
+
+        Args:
+            row: The row.
+
+        Returns:
+            IngestionJob: The job.
+        """
+        values = dict(row)
+        values["force"] = bool(values["force"])
+        values["status"] = JobStatus(values["status"])
+        return IngestionJob(**values)
+
+
+@functools.cache
+def get_job_queue() -> IngestionJobQueue:
+    """Get the ingestion job queue of the process.
+
+    The database path and the number of workers are read from the ``PDF_ASK_JOBS_DB``
+    and ``PDF_ASK_INGESTION_WORKERS`` environment variables.
+
+    Returns:
+        IngestionJobQueue: The job queue.
+    """
+    return IngestionJobQueue(
+        os.getenv("PDF_ASK_JOBS_DB", "resources/.jobs.sqlite3"),
+        max_workers=int(os.getenv("PDF_ASK_INGESTION_WORKERS", "2")),
+    )
@@ -0,0 +1,137 @@
+from types import ModuleType
+from typing import Any, Self
+
+import importlib
+import threading
+from collections.abc import Iterator, Mapping, MutableMapping
+
+
+def import_object(reference: str) -> Any:
+    """Import an object from a ``"module:attribute"`` reference.
+
+    Args:
+        reference (str): The module path and the attribute name, separated by a colon.
+
+    Returns:
+        Any: The imported object.
+
+    >>> import_object("collections:OrderedDict").__name__
+    'OrderedDict'
+    """
+    module_name, _, attribute = reference.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class LazyRegistry(MutableMapping[str, type]):
+    """Registry of classes by name, importing each class on its first lookup.
+
+    The registries of embedders, chat models and document parsers list classes from
+    heavy packages such as ``langchain_openai`` which take hundreds of milliseconds to
+    import. Entries given as ``"module:attribute"`` references are only imported when
+    they are looked up, so listing the names, e.g. for a select box or command line
+    choices, stays cheap.
+
+    >>> registry = LazyRegistry({"ordered": "collections:OrderedDict", "int": int})
+    >>> list(registry)
+    ['ordered', 'int']
+    >>> registry["ordered"].__name__
+    'OrderedDict'
+    """
+
+    def __init__(self: Self, entries: Mapping[str, type | str]) -> None:
+        """Initialize the registry.
+
+        Args:
+            entries (Mapping[str, type | str]): The classes, or their
+                ``"module:attribute"`` references, by name.
+        """
+        self._entries = dict(entries)
+        self._lock = threading.Lock()
+
+    def __getitem__(self: Self, name: str) -> type:
+        """Get a class, importing it if needed.
+
+        Args:
+            name (str): The name of the class in the registry.
+
+        Returns:
+            type: The class.
+        """
+        entry = self._entries[name]
+        if isinstance(entry, str):
+            with self._lock:
+                entry = self._entries[name]
+                if isinstance(entry, str):
+                    entry = self._entries[name] = import_object(entry)
+        return entry
+
+    def __setitem__(self: Self, name: str, entry: type | str) -> None:
+        """Register a class, or its ``"module:attribute"`` reference.
+
+        Args:
+            name (str): The name of the class in the registry.
+            entry (type | str): The class or its reference.
+        """
+        with self._lock:
+            self._entries[name] = entry
+
+    def __delitem__(self: Self, name: str) -> None:
+        """Unregister a class.
+
+        Args:
+            name (str): The name of the class in the registry.
+        """
+        with self._lock:
+            del self._entries[name]
+
+    def __iter__(self: Self) -> Iterator[str]:
+        """Iterate over the names, without importing the classes."""
+        return iter(self._entries)
+
+    def __len__(self: Self) -> int:
+        """Get the number of registered classes."""
+        return len(self._entries)
+
+    def __contains__(self: Self, name: object) -> bool:
+        """Check whether a name is registered, without importing its class."""
+        return name in self._entries
+
+    def copy(self: Self) -> dict[str, type | str]:
+        """Copy the entries, without importing the classes.
+
+        Returns:
+            dict[str, type | str]: The classes, or their references, by name.
+        """
+        with self._lock:
+            return dict(self._entries)
+
+    def __repr__(self: Self) -> str:
+        """Represent the registry by its names."""
+        return f"{type(self).__name__}({list(self._entries)!r})"
+
+
+class LazyModule(ModuleType):
+    """Module imported on the first access to one of its attributes.
+
+    Module level code only needs ``faiss`` or ``pymupdf`` inside functions, so the
+    modules are bound to a lazy proxy instead of being imported with the application.
+    The real import goes through :func:`importlib.import_module`, which holds the
+    import lock, so concurrent first accesses from worker threads are safe.
+
+    >>> json = LazyModule("json")
+    >>> json.dumps([1])
+    '[1]'
+    """
+
+    def __getattr__(self: Self, attribute: str) -> Any:
+        """Import the module and get one of its attributes.
+
+        Args:
+            attribute (str): The name of the attribute.
+
+        Returns:
+            Any: The attribute of the imported module.
+        """
+        value = getattr(importlib.import_module(self.__name__), attribute)
+        setattr(self, attribute, value)
+        return value
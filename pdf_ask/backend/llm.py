@@ -1,13 +1,24 @@
 from typing import Self
 
+import asyncio
+import json
 import logging
+import re
+import time
+from collections.abc import Callable, Iterator
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessageChunk
 from langchain_core.prompts import ChatPromptTemplate
 
+from pdf_ask.backend.cache import SemanticAnswerCache
+from pdf_ask.backend.context import ContextPacker
+from pdf_ask.backend.history import ChatHistoryManager
+from pdf_ask.backend.metrics import METRICS, STAGE_SECONDS
+from pdf_ask.backend.profiling import profiled
 from pdf_ask.backend.vector_store import VectorStoreProtocol
 
 logger = logging.getLogger(__name__)
@@ -24,6 +35,7 @@ class ChatMessage:
     text: str
     timestamp: str = field(init=False)
     documents: dict[str, str] | None = None
+    html: str | None = field(default=None, init=False, repr=False, compare=False)
 
     def __post_init__(self):
         self.timestamp = datetime.now().strftime("%H:%M:%S")
@@ -41,6 +53,111 @@ class LlmAnswer:
         return f"{self.text} {self.documents=}"
 
 
+REFERRING_WORDS = frozenset(
+    [
+        "it",
+        "its",
+        "this",
+        "that",
+        "these",
+        "those",
+        "they",
+        "them",
+        "their",
+        "he",
+        "she",
+        "him",
+        "her",
+        "his",
+        "above",
+        "previous",
+        "earlier",
+        "same",
+        "again",
+        "else",
+        "also",
+        "more",
+        "former",
+        "latter",
+    ]
+)
+
+
+def is_standalone_question(question: ChatMessage, history: list[ChatMessage]) -> bool:
+    """Check whether a question can be answered without the conversation.
+
+    The first question of a conversation is always standalone. Later questions are
+    considered standalone unless they contain a word referring to earlier turns.
+
+    Args:
+        question: The chat message containing the user's question.
+        history: The list of previous chat messages.
+
+    Returns:
+        bool: True if the answer to the question does not depend on the conversation.
+
+    Examples:
+        >>> history = [ChatMessage(Role.USER, "What is the max temperature?")]
+        >>> is_standalone_question(ChatMessage(Role.USER, "And what about it?"), history)
+        False
+    """
+    if not any(
+        message.role == Role.USER and message is not question for message in history
+    ):
+        return True
+    words = set(re.findall(r"\w+", question.text.lower()))
+    return not words & REFERRING_WORDS
+
+
+@dataclass
+class StreamingLlmAnswer:
+    """An answer streamed token by token, with its documents known upfront.
+
+    Iterating over the answer yields the text chunks of the LLM while accumulating the
+    full text, so it can be passed to ``st.write_stream`` directly.
+    """
+
+    chunks: Iterator[BaseMessageChunk] = field(repr=False)
+    documents: dict[str, str] | None = None
+    started_at: float = field(default_factory=time.perf_counter, repr=False)
+    on_complete: Callable[[LlmAnswer], None] | None = field(default=None, repr=False)
+    text: str = ""
+    time_to_first_token: float | None = None
+
+    @profiled("stream_answer")
+    def __iter__(self) -> Iterator[str]:
+        """Yield the text chunks of the answer.
+
+        The LLM is called when the iteration starts, so its stream is profiled as the
+        ``stream_answer`` stage, ``stream_response`` only covering the retrieval.
+
+        Yields:
+            str: The next chunk of text.
+        """
+        for chunk in self.chunks:
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - self.started_at
+                METRICS.observe(
+                    STAGE_SECONDS, self.time_to_first_token, stage="first_token"
+                )
+                logger.info(f"Time to first token: {self.time_to_first_token:.3f}s")
+            self.text += chunk.content
+            yield chunk.content
+        duration = time.perf_counter() - self.started_at
+        METRICS.observe(STAGE_SECONDS, duration, stage="streamed_answer")
+        logger.info(f"Streamed answer in {duration:.3f}s")
+        if self.on_complete:
+            self.on_complete(self.to_answer())
+
+    def to_answer(self) -> LlmAnswer:
+        """Convert the streamed answer to a complete answer.
+
+        Returns:
+            LlmAnswer: The text streamed so far and the documents.
+        """
+        return LlmAnswer(self.text, documents=self.documents)
+
+
 class SimpleRAGChatBot:
     """A simple Retrieval-Augmented Generation (RAG) chatbot.
 
@@ -50,6 +167,11 @@ class SimpleRAGChatBot:
         top_k: The number of top similar documents to retrieve.
         prompt: The chat prompt template.
         chain: The combined prompt and language model chain.
+        answer_cache: The cache of answers to similar standalone questions, if any.
+        history_manager: The manager keeping the chat history within a token budget.
+        context_packer: The packer assembling the retrieved documents into the context.
+        mmr_lambda: The diversity factor of the retrieved documents, see
+            ``FaissVectorStore.similarity_search``, or None to rank them by relevance.
     """
 
     rag_prompt = """
@@ -70,11 +192,16 @@ Chat history:
 Answer:
 """
 
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self: Self,
         llm: BaseChatModel,
         vector_store: VectorStoreProtocol,
         top_k: int = 3,
+        *,
+        answer_cache: SemanticAnswerCache | None = None,
+        history_manager: ChatHistoryManager | None = None,
+        context_packer: ContextPacker | None = None,
+        mmr_lambda: float | None = None,
     ) -> None:
         """Initializes the SimpleRAGChatBot.
 
@@ -82,13 +209,27 @@ Answer:
             llm: The language model used for generating responses.
             vector_store: The vector store used for similarity search.
             top_k: The number of top similar documents to retrieve.
+            answer_cache: An optional cache of answers to similar standalone questions.
+            history_manager: The manager keeping the chat history within a token
+                budget, defaults to one summarizing older turns with ``llm``. Keep the
+                same manager for the whole conversation to reuse its summary.
+            context_packer: The packer merging and deduplicating the retrieved
+                documents within a token budget, defaults to a ``ContextPacker``.
+            mmr_lambda: The diversity factor of a maximal marginal relevance
+                re-ranking of the retrieved documents, from 0 for the most diverse
+                documents to 1 for a ranking by relevance only. No re-ranking if None.
         """
         self.top_k = top_k
         self.llm = llm
         self.vector_store = vector_store
+        self.answer_cache = answer_cache
+        self.history_manager = history_manager or ChatHistoryManager(llm)
+        self.context_packer = context_packer or ContextPacker()
+        self.mmr_lambda = mmr_lambda
         self.prompt = ChatPromptTemplate.from_template(self.rag_prompt)
         self.chain = self.prompt | self.llm
 
+    @profiled("get_response")
     def get_response(
         self: Self, question: ChatMessage, history: list[ChatMessage]
     ) -> LlmAnswer:
@@ -101,26 +242,300 @@ Answer:
         Returns:
             An LlmAnswer object containing the generated response and related documents.
         """
-        logger.info(f"Searched for similar documents to '{question.text}'")
-        similar_documents = self.vector_store.similarity_search(
-            question.text, top_k=self.top_k
+        embedding = self._cacheable_embedding(question, history)
+        if embedding and (answer := self._cached_answer(embedding)):
+            return answer
+        similar_documents = self._pack(self._retrieve(question, embedding))
+        chat_history = self._build_history(question, history)
+        with METRICS.span("llm"):
+            response = self.chain.invoke(
+                self.build_inputs(question, chat_history, similar_documents)
+            )
+
+        logger.debug(f"Response: {response.content}")
+        answer = LlmAnswer(
+            response.content, documents=self._documents_map(similar_documents)
         )
-        logger.debug(f"Found {len(similar_documents)} similar documents")
+        self._cache_answer(embedding, answer)
+        return answer
+
+    @profiled("get_response")
+    async def aget_response(
+        self: Self, question: ChatMessage, history: list[ChatMessage]
+    ) -> LlmAnswer:
+        """Asynchronously generates a response to a given question.
+
+        The question is embedded with the async API of the embeddings model, the FAISS
+        search runs in the default executor and the LLM is called with ``ainvoke``, so
+        concurrent questions share the event loop instead of blocking a thread each on
+        network I/O. The chat history, which does not depend on the retrieved
+        documents, is built in a thread while the answer cache is looked up and the
+        documents are retrieved.
+
+        Args:
+            question: The chat message containing the user's question.
+            history: The list of previous chat messages.
 
-        response = self.chain.invoke(
-            {
-                "question": question.text,
-                "context": "\n".join(
-                    [f"[{doc['id']}] - {doc['content']}" for doc in similar_documents]
-                ),
-                "chat_history": [
-                    {"role": msg.role.value, "text": msg.text} for msg in history
-                ],
-            }
+        Returns:
+            An LlmAnswer object containing the generated response and related documents.
+        """
+        (embedding, answer, documents), chat_history = await asyncio.gather(
+            self._aretrieve_unless_cached(question, history),
+            asyncio.to_thread(self._build_history, question, history),
         )
+        if answer:
+            return answer
+        similar_documents = self._pack(documents)
+        with METRICS.span("llm"):
+            response = await self.chain.ainvoke(
+                self.build_inputs(question, chat_history, similar_documents)
+            )
 
         logger.debug(f"Response: {response.content}")
-        return LlmAnswer(
-            response.content,
-            documents={f"[{doc['id']}]": doc["content"] for doc in similar_documents},
+        answer = LlmAnswer(
+            response.content, documents=self._documents_map(similar_documents)
+        )
+        self._cache_answer(embedding, answer)
+        return answer
+
+    @profiled("get_response")
+    def stream_response(
+        self: Self, question: ChatMessage, history: list[ChatMessage]
+    ) -> StreamingLlmAnswer:
+        """Generates a response streamed token by token.
+
+        Retrieval happens before this method returns; the LLM is called lazily when the
+        returned answer is iterated, which is profiled separately as ``stream_answer``.
+
+        Args:
+            question: The chat message containing the user's question.
+            history: The list of previous chat messages.
+
+        Returns:
+            A StreamingLlmAnswer yielding the generated text and holding the related documents.
+        """
+        started_at = time.perf_counter()
+        embedding = self._cacheable_embedding(question, history)
+        if embedding and (answer := self._cached_answer(embedding)):
+            return StreamingLlmAnswer(
+                iter([AIMessageChunk(content=answer.text)]),
+                documents=answer.documents,
+                started_at=started_at,
+            )
+        similar_documents = self._pack(self._retrieve(question, embedding))
+        chat_history = self._build_history(question, history)
+        return StreamingLlmAnswer(
+            self.chain.stream(
+                self.build_inputs(question, chat_history, similar_documents)
+            ),
+            documents=self._documents_map(similar_documents),
+            started_at=started_at,
+            on_complete=lambda answer: self._cache_answer(embedding, answer),
+        )
+
+    def _build_history(
+        self: Self, question: ChatMessage, history: list[ChatMessage]
+    ) -> str:
+        """Build the chat history of the prompt.
+
+        Args:
+            question: The chat message containing the user's question.
+            history: The list of previous chat messages.
+
+        Returns:
+            The formatted chat history.
+        """
+        with METRICS.span("history"):
+            return self.history_manager.build(question, history)
+
+    def _cacheable_embedding(
+        self: Self, question: ChatMessage, history: list[ChatMessage]
+    ) -> list[float] | None:
+        """Embed the question if its answer can be cached.
+
+        Args:
+            question: The chat message containing the user's question.
+            history: The list of previous chat messages.
+
+        Returns:
+            The embedding of the question, or None if there is no cache or the question
+            depends on the conversation.
+        """
+        if self.answer_cache is None or not is_standalone_question(question, history):
+            return None
+        return self.vector_store.embed_query(question.text)
+
+    def _cached_answer(self: Self, embedding: list[float]) -> LlmAnswer | None:
+        """Look up a cached answer for the embedded question.
+
+        Args:
+            embedding: The embedding of the question.
+
+        Returns:
+            The cached answer, if any.
+        """
+        return self.answer_cache.get(
+            self.vector_store.store_path.as_posix(),
+            self.vector_store.generation,
+            embedding,
+            self.cache_options(),
+        )
+
+    def _cache_answer(
+        self: Self, embedding: list[float] | None, answer: LlmAnswer
+    ) -> None:
+        """Cache the answer to an embedded question.
+
+        Args:
+            embedding: The embedding of the question, None if it must not be cached.
+            answer: The answer to cache.
+        """
+        if embedding:
+            self.answer_cache.put(
+                self.vector_store.store_path.as_posix(),
+                self.vector_store.generation,
+                embedding,
+                answer,
+                self.cache_options(),
+            )
+
+    def cache_options(self: Self) -> dict:
+        """Get the options a cached answer depends on besides its question and store.
+
+        Sessions share the answer cache while each picks its chat model, so the answers
+        are keyed by the model and its generation parameters as well as the searches.
+
+        Returns:
+            dict: The search options and the identity of the chat model.
+        """
+        model = json.dumps(
+            [type(self.llm).__qualname__, self.llm._identifying_params],
+            sort_keys=True,
+            default=repr,
         )
+        return {**self.search_options(), "model": model}
+
+    def search_options(self: Self) -> dict:
+        """Get the keyword arguments of the similarity searches of the bot.
+
+        Returns:
+            dict: The number of documents and, if set, the diversity factor.
+        """
+        if self.mmr_lambda is None:
+            return {"top_k": self.top_k}
+        return {"top_k": self.top_k, "mmr_lambda": self.mmr_lambda}
+
+    def _retrieve(
+        self: Self, question: ChatMessage, embedding: list[float] | None = None
+    ) -> list[dict]:
+        """Retrieve the documents most similar to the question.
+
+        Args:
+            question: The chat message containing the user's question.
+            embedding: The embedding of the question, if it is already known.
+
+        Returns:
+            The similar documents.
+        """
+        logger.info(f"Searched for similar documents to '{question.text}'")
+        with METRICS.span("retrieve"):
+            if embedding:
+                similar_documents = self.vector_store.similarity_search_by_vector(
+                    embedding, **self.search_options()
+                )
+            else:
+                similar_documents = self.vector_store.similarity_search(
+                    question.text, **self.search_options()
+                )
+        logger.debug(f"Found {len(similar_documents)} similar documents")
+        return similar_documents
+
+    async def _aretrieve(
+        self: Self, question: ChatMessage, embedding: list[float] | None = None
+    ) -> list[dict]:
+        """Asynchronously retrieve the documents most similar to the question.
+
+        Args:
+            question: The chat message containing the user's question.
+            embedding: The embedding of the question, if it is already known.
+
+        Returns:
+            The similar documents.
+        """
+        if embedding:
+            return await asyncio.to_thread(self._retrieve, question, embedding)
+        logger.info(f"Searched for similar documents to '{question.text}'")
+        with METRICS.span("retrieve"):
+            similar_documents = await self.vector_store.asimilarity_search(
+                question.text, **self.search_options()
+            )
+        logger.debug(f"Found {len(similar_documents)} similar documents")
+        return similar_documents
+
+    async def _aretrieve_unless_cached(
+        self: Self, question: ChatMessage, history: list[ChatMessage]
+    ) -> tuple[list[float] | None, LlmAnswer | None, list[dict]]:
+        """Look up the answer cache, then retrieve the documents if the answer is not cached.
+
+        Args:
+            question: The chat message containing the user's question.
+            history: The list of previous chat messages.
+
+        Returns:
+            The embedding of the question if its answer can be cached, the cached
+            answer if any, and the similar documents, empty if the answer is cached.
+        """
+        embedding = None
+        if self.answer_cache is not None:
+            embedding = await asyncio.to_thread(
+                self._cacheable_embedding, question, history
+            )
+        if embedding and (answer := self._cached_answer(embedding)):
+            return embedding, answer, []
+        return embedding, None, await self._aretrieve(question, embedding)
+
+    def _pack(self: Self, documents: list[dict]) -> list[dict]:
+        """Pack the retrieved documents into the context of the prompt.
+
+        Args:
+            documents: The similar documents.
+
+        Returns:
+            The packed passages.
+        """
+        with METRICS.span("pack_context"):
+            return self.context_packer.pack(documents)
+
+    @staticmethod
+    def build_inputs(
+        question: ChatMessage, chat_history: str, documents: list[dict]
+    ) -> dict:
+        """Build the values of the prompt variables, e.g. to call ``chain`` directly.
+
+        Args:
+            question: The chat message containing the user's question.
+            chat_history: The formatted chat history.
+            documents: The similar documents.
+
+        Returns:
+            The values of the prompt variables.
+        """
+        return {
+            "question": question.text,
+            "context": "\n".join(
+                [f"[{doc['id']}] - {doc['content']}" for doc in documents]
+            ),
+            "chat_history": chat_history,
+        }
+
+    @staticmethod
+    def _documents_map(documents: list[dict]) -> dict[str, str]:
+        """Map citation markers to the content of the documents.
+
+        Args:
+            documents: The similar documents.
+
+        Returns:
+            The content of each document keyed by its citation marker.
+        """
+        return {f"[{doc['id']}]": doc["content"] for doc in documents}
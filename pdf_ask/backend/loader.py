@@ -1,14 +1,21 @@
 from typing import Protocol, Self
 
+import codecs
+import mmap
 import re
+import time
+from collections import Counter
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 
-from langchain_community.document_loaders import PyMuPDFLoader, TextLoader
 from langchain_core.document_loaders.base import BaseLoader
 from langchain_core.documents import Document
 from langchain_text_splitters import TextSplitter
 
-DOC_PARSER: dict[str, type[BaseLoader]] = {".pdf": PyMuPDFLoader, ".txt": TextLoader}
+from pdf_ask.backend.lazy import LazyModule, LazyRegistry
+from pdf_ask.backend.metrics import METRICS, STAGE_SECONDS
+
+pymupdf = LazyModule("pymupdf")
 
 
 class ParseDocumentError(Exception):
@@ -30,32 +37,367 @@ def clean_text(input_string: str) -> str:
     return cleaned_string.replace("\n", " ")
 
 
-def load_and_parse_document(
+class CleanedDocumentLoader(BaseLoader):
+    """Base class for loaders whose lazily yielded documents are already cleaned."""
+
+
+class MmapTextLoader(CleanedDocumentLoader):
+    """Stream a text file through a memory map in cleaned, boundary-aligned windows.
+
+    Each yielded document covers a window of at most ``window_size`` bytes, cut at the
+    last paragraph (or line) break inside the window, and carries ``start_byte`` and
+    ``end_byte`` metadata. Decoding is incremental, so multibyte characters split
+    across windows are decoded correctly and resident memory stays bounded by the
+    window size regardless of the file size.
+
+    Like ``TextLoader``, bytes that are not valid in the encoding fail the load unless
+    another ``errors`` handler of ``codecs``, such as ``"replace"``, is given.
+    """
+
+    def __init__(
+        self: Self,
+        file_path: str,
+        encoding: str = "utf-8",
+        window_size: int = 1 << 20,
+        errors: str = "strict",
+    ) -> None:
+        """Initialize the loader.
+
+        Args:
+            file_path (str): The path to the text file.
+            encoding (str): The text encoding of the file.
+            window_size (int): The maximum number of bytes per yielded window.
+            errors (str): The ``codecs`` error handler used to decode the file.
+        """
+        self.file_path = file_path
+        self.encoding = encoding
+        self.window_size = window_size
+        self.errors = errors
+
+    def lazy_load(self: Self) -> Iterator[Document]:
+        """Lazily load the file as cleaned windows.
+
+        Yields:
+            Document: A cleaned window with its source and byte offsets as metadata.
+
+        Raises:
+            ParseDocumentError: If the file is not valid in its encoding.
+        """
+        path = Path(self.file_path)
+        size = path.stat().st_size
+        if size == 0:
+            return
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors=self.errors)
+        with (
+            path.open("rb") as file,
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped,
+        ):
+            start = 0
+            while start < size:
+                end = self._window_end(mapped, start, size)
+                try:
+                    text = decoder.decode(mapped[start:end], final=end == size)
+                except UnicodeDecodeError as error:
+                    msg = (
+                        f"Error loading {self.file_path}: not valid {self.encoding} "
+                        f"after byte {start + error.start}"
+                    )
+                    raise ParseDocumentError(msg) from error
+                if text.strip():
+                    yield Document(
+                        page_content=clean_text(text),
+                        metadata={
+                            "source": self.file_path,
+                            "start_byte": start,
+                            "end_byte": end,
+                        },
+                    )
+                self._release(mapped, start, end)
+                start = end
+
+    def _window_end(self: Self, mapped: mmap.mmap, start: int, size: int) -> int:
+        """Find the end of the window starting at the given offset.
+
+        Args:
+            mapped (mmap.mmap): The memory mapped file.
+            start (int): The byte offset where the window starts.
+            size (int): The size of the file in bytes.
+
+        Returns:
+            int: The byte offset right after the last paragraph or line break of the
+                window, or the hard window limit if the window has no line break.
+        """
+        limit = start + self.window_size
+        if limit >= size:
+            return size
+        for separator in (b"\n\n", b"\n"):
+            position = mapped.rfind(separator, start, limit)
+            if position > start:
+                return position + len(separator)
+        return limit
+
+    @staticmethod
+    def _release(mapped: mmap.mmap, start: int, end: int) -> None:
+        """Drop the pages of an already consumed range from the resident set.
+
+        Args:
+            mapped (mmap.mmap): The memory mapped file.
+            start (int): The byte offset where the consumed range starts.
+            end (int): The byte offset where the consumed range ends.
+        """
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        page_start = start - start % mmap.PAGESIZE
+        page_end = end - end % mmap.PAGESIZE
+        if page_end > page_start:
+            mapped.madvise(mmap.MADV_DONTNEED, page_start, page_end - page_start)
+
+
+class PyMuPDFLayoutLoader(CleanedDocumentLoader):
+    """Load a PDF as layout-aware sections using PyMuPDF text blocks.
+
+    Lines set in a font noticeably larger than the body font start a new section, and
+    the stack of enclosing headings is kept as ``section_path`` metadata. Each yielded
+    document holds the paragraphs of one section on one page, separated by blank lines,
+    with punctuation preserved. Tables detected by PyMuPDF are yielded as separate
+    documents with ``block_type`` set to ``"table"``.
+    """
+
+    heading_ratio = 1.15
+    max_heading_length = 200
+    sample_pages = 5
+
+    def __init__(self: Self, file_path: str) -> None:
+        """Initialize the loader.
+
+        Args:
+            file_path (str): The path to the PDF file.
+        """
+        self.file_path = file_path
+
+    def lazy_load(self: Self) -> Iterator[Document]:
+        """Lazily load the PDF section by section.
+
+        Yields:
+            Document: A section of a page or a table with its layout metadata.
+        """
+        with pymupdf.open(self.file_path) as pdf:
+            body_size = self._body_font_size(pdf)
+            headings: list[tuple[float, str]] = []
+            for page in pdf:
+                table_boxes = []
+                for table in self._find_tables(page):
+                    table_boxes.append(pymupdf.Rect(table.bbox))
+                    yield self._document(
+                        table.to_markdown(), page.number, headings, "table"
+                    )
+                paragraphs: list[str] = []
+                for block in page.get_text("dict")["blocks"]:
+                    if block["type"] != 0 or any(
+                        pymupdf.Rect(block["bbox"]).intersects(box)
+                        for box in table_boxes
+                    ):
+                        continue
+                    text, size = self._block_text(block)
+                    if not text:
+                        continue
+                    if self._is_heading(text, size, body_size):
+                        if paragraphs:
+                            yield self._document(
+                                "\n\n".join(paragraphs), page.number, headings
+                            )
+                            paragraphs = []
+                        while headings and headings[-1][0] <= size:
+                            headings.pop()
+                        headings.append((size, text))
+                    else:
+                        paragraphs.append(text)
+                if paragraphs:
+                    yield self._document("\n\n".join(paragraphs), page.number, headings)
+
+    def _document(
+        self: Self,
+        text: str,
+        page: int,
+        headings: list[tuple[float, str]],
+        block_type: str = "text",
+    ) -> Document:
+        """Create a document with layout metadata.
+
+        Args:
+            text (str): The content of the document.
+            page (int): The zero based page number.
+            headings (list[tuple[float, str]]): The stack of enclosing headings.
+            block_type (str): The kind of content, ``"text"`` or ``"table"``.
+
+        Returns:
+            Document: The document.
+        """
+        return Document(
+            page_content=text,
+            metadata={
+                "source": self.file_path,
+                "page": page,
+                "section_path": " > ".join(heading for _, heading in headings),
+                "block_type": block_type,
+            },
+        )
+
+    def _body_font_size(self: Self, pdf: "pymupdf.Document") -> float:
+        """Estimate the body font size as the size covering most characters.
+
+        Args:
+            pdf (pymupdf.Document): The opened PDF.
+
+        Returns:
+            float: The most common font size of the first pages.
+        """
+        sizes: Counter[float] = Counter()
+        for page in pdf.pages(0, min(self.sample_pages, pdf.page_count)):
+            for block in page.get_text("dict")["blocks"]:
+                for line in block.get("lines", []):
+                    for span in line["spans"]:
+                        sizes[round(span["size"], 1)] += len(span["text"].strip())
+        return sizes.most_common(1)[0][0] if sizes else 0.0
+
+    def _is_heading(self: Self, text: str, size: float, body_size: float) -> bool:
+        """Check whether a block is a heading.
+
+        Args:
+            text (str): The text of the block.
+            size (float): The largest font size in the block.
+            body_size (float): The body font size of the document.
+
+        Returns:
+            bool: True if the block looks like a heading.
+        """
+        return (
+            body_size > 0
+            and size >= body_size * self.heading_ratio
+            and len(text) <= self.max_heading_length
+        )
+
+    @staticmethod
+    def _block_text(block: dict) -> tuple[str, float]:
+        """Join the lines of a text block with normalized whitespace.
+
+        Args:
+            block (dict): A PyMuPDF text block.
+
+        Returns:
+            tuple[str, float]: The text of the block and its largest font size.
+        """
+        spans = [span for line in block["lines"] for span in line["spans"]]
+        text = " ".join(" ".join(span["text"] for span in spans).split())
+        size = max((round(span["size"], 1) for span in spans), default=0.0)
+        return text, size
+
+    @staticmethod
+    def _find_tables(page: "pymupdf.Page") -> list:
+        """Find the tables of a page, if the PyMuPDF version supports it.
+
+        Args:
+            page (pymupdf.Page): The page to search.
+
+        Returns:
+            list: The tables found on the page.
+        """
+        if not hasattr(page, "find_tables"):
+            return []
+        return list(page.find_tables().tables)
+
+
+DOC_PARSER = LazyRegistry(
+    {
+        ".pdf": "langchain_community.document_loaders:PyMuPDFLoader",
+        ".txt": MmapTextLoader,
+    }
+)
+
+
+def _iter_cleaned_documents(document_loader: BaseLoader) -> Iterator[Document]:
+    """Iterate over the cleaned documents of a loader.
+
+    Args:
+        document_loader (BaseLoader): The loader to read documents from.
+
+    Yields:
+        Document: A document with cleaned page content.
+    """
+    if isinstance(document_loader, CleanedDocumentLoader):
+        yield from document_loader.lazy_load()
+        return
+    for document in document_loader.lazy_load():
+        document.page_content = clean_text(document.page_content)
+        yield document
+
+
+def iter_parsed_documents(
     file_path_str: str, splitter: TextSplitter | None = None
-) -> list[Document]:
-    """Load and parse a document from the given file path.
+) -> Iterator[Document]:
+    """Lazily load and parse a document from the given file path.
+
+    Documents are read from the loader and split one at a time, so only the chunks of
+    the current document are held in memory, whatever the size of the file.
 
     Args:
         file_path_str (str): The path to the document file.
-        splitter (TextSplitter, optional): An optional text splitter.
+        splitter (TextSplitter, optional): An optional text splitter. Splitters may
+            override the loader of some file types with a ``document_parsers`` mapping.
 
-    Returns:
-        list[Document]: A list of parsed documents.
+    Yields:
+        Document: A parsed document, or a chunk of one with a splitter.
 
     Raises:
-        ParseDocumentException: If the file type is not supported.
+        ParseDocumentError: If the file type is not supported.
     """
     file_path = Path(file_path_str)
-    if loader := DOC_PARSER.get(file_path.suffix):
-        raw_documents = loader(file_path.as_posix()).load()
-        for document in raw_documents:
-            document.page_content = clean_text(document.page_content)
+    document_parsers = getattr(splitter, "document_parsers", {})
+    loader = document_parsers.get(file_path.suffix, DOC_PARSER.get(file_path.suffix))
+    if not loader:
+        msg = f"File type {file_path.suffix} not allowed"
+        raise ParseDocumentError(msg)
+    documents = _iter_cleaned_documents(loader(file_path.as_posix()))
+    parse_seconds = split_seconds = 0.0
+    raw_count = chunk_count = 0
+    try:
+        while True:
+            started_at = time.perf_counter()
+            document = next(documents, None)
+            parse_seconds += time.perf_counter() - started_at
+            if document is None:
+                break
+            raw_count += 1
+            if splitter:
+                started_at = time.perf_counter()
+                chunks = splitter.split_documents([document])
+                split_seconds += time.perf_counter() - started_at
+            else:
+                chunks = [document]
+            chunk_count += len(chunks)
+            yield from chunks
+    finally:
+        METRICS.observe(STAGE_SECONDS, parse_seconds, stage="parse")
+        METRICS.increment("documents_total", raw_count)
         if splitter:
-            return splitter.split_documents(raw_documents)
-        return raw_documents
+            METRICS.observe(STAGE_SECONDS, split_seconds, stage="split")
+            METRICS.increment("chunks_total", chunk_count)
+
 
-    msg = f"File type {file_path.suffix} not allowed"
-    raise ParseDocumentError(msg)
+def load_and_parse_document(
+    file_path_str: str, splitter: TextSplitter | None = None
+) -> list[Document]:
+    """Load and parse a document from the given file path.
+
+    Args:
+        file_path_str (str): The path to the document file.
+        splitter (TextSplitter, optional): An optional text splitter. Splitters may
+            override the loader of some file types with a ``document_parsers`` mapping.
+
+    Returns:
+        list[Document]: A list of parsed documents.
+    """
+    return list(iter_parsed_documents(file_path_str, splitter))
 
 
 class LoaderProtocol(Protocol):
@@ -63,14 +405,14 @@ class LoaderProtocol(Protocol):
         """Initialize the loader with an optional text splitter."""
         ...
 
-    def load_document(self: Self, file_path: str) -> list[Document]:
+    def load_document(self: Self, file_path: str) -> Iterable[Document]:
         """Load a document from the given file path.
 
         Args:
             file_path (str): The path to the document file.
 
         Returns:
-            list[Document]: A list of loaded documents.
+            Iterable[Document]: The loaded documents, possibly produced lazily.
         """
         ...
 
@@ -80,13 +422,13 @@ class LocalLoader:
         """Initialize the local loader with an optional text splitter."""
         self.splitter = splitter
 
-    def load_document(self: Self, file_path: str) -> list[Document]:
-        """Load and parse a document from the given file path.
+    def load_document(self: Self, file_path: str) -> Iterator[Document]:
+        """Lazily load and parse a document from the given file path.
 
         Args:
             file_path (str): The path to the document file.
 
         Returns:
-            list[Document]: A list of parsed documents.
+            Iterator[Document]: The parsed documents, read and split as iterated.
         """
-        return load_and_parse_document(file_path_str=file_path, splitter=self.splitter)
+        return iter_parsed_documents(file_path_str=file_path, splitter=self.splitter)
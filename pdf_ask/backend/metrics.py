@@ -0,0 +1,249 @@
+from typing import Self
+
+import bisect
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "pdf_ask_"
+STAGE_SECONDS = "stage_seconds"
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+METRIC_HELP = {
+    STAGE_SECONDS: "Duration of the ingestion and query stages in seconds.",
+    "documents_total": "Number of parsed documents or pages.",
+    "chunks_total": "Number of chunks produced by the splitters.",
+    "embedded_chunks_total": "Number of chunks embedded and indexed.",
+    "embedded_queries_total": "Number of embedded queries.",
+    "context_tokens_total": "Number of tokens of the contexts sent to the LLM.",
+    "answer_cache_lookups_total": "Number of answer cache lookups by result.",
+}
+
+_stage_timings: ContextVar[dict[str, float] | None] = ContextVar(
+    "stage_timings", default=None
+)
+
+
+@contextmanager
+def collect_stage_timings() -> Iterator[dict[str, float]]:
+    """Collect the total duration of each stage recorded in the current context.
+
+    Unlike the process-wide histograms, the collected timings only include the stages
+    run by the current thread or task, e.g. to report the timings of one request.
+
+    Yields:
+        dict[str, float]: The total duration in seconds of each stage, filled as the
+            stages are recorded.
+    """
+    timings: dict[str, float] = {}
+    token = _stage_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _stage_timings.reset(token)
+
+
+class _Histogram:
+    def __init__(self: Self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self: Self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms exported in the Prometheus text format.
+
+    Recording a value costs a lock and a dictionary lookup, so the instrumentation of
+    the pipeline stages can stay on in production. Stage durations are recorded with
+    :meth:`span` in the ``pdf_ask_stage_seconds`` histogram, labelled by stage.
+
+    Attributes:
+        buckets: The upper bounds of the histogram buckets.
+    """
+
+    def __init__(self: Self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """Initialize an empty registry.
+
+        Args:
+            buckets: The upper bounds of the histogram buckets.
+        """
+        self.buckets = buckets
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._histograms: dict[tuple[str, tuple], _Histogram] = {}
+        self._lock = threading.Lock()
+
+    def increment(self: Self, name: str, value: float = 1, **labels: str) -> None:
+        """Increment a counter.
+
+        Args:
+            name: The name of the counter, without the ``pdf_ask_`` prefix.
+            value: The increment.
+            **labels: The labels of the counter.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self: Self, name: str, value: float, **labels: str) -> None:
+        """Record a value in a histogram.
+
+        Args:
+            name: The name of the histogram, without the ``pdf_ask_`` prefix.
+            value: The value.
+            **labels: The labels of the histogram.
+        """
+        if name == STAGE_SECONDS and (timings := _stage_timings.get()) is not None:
+            timings[labels["stage"]] = timings.get(labels["stage"], 0.0) + value
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if (histogram := self._histograms.get(key)) is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self: Self, stage: str) -> Iterator[None]:
+        """Record the duration of a stage, including when it raises.
+
+        Args:
+            stage: The name of the stage.
+
+        Yields:
+            None: Nothing, the duration is recorded when the block exits.
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(STAGE_SECONDS, time.perf_counter() - started_at, stage=stage)
+
+    def stage_seconds(self: Self, stage: str) -> tuple[int, float]:
+        """Get the number of recorded spans of a stage and their total duration.
+
+        Args:
+            stage: The name of the stage.
+
+        Returns:
+            tuple[int, float]: The number of spans and their total duration in seconds.
+        """
+        with self._lock:
+            histogram = self._histograms.get((STAGE_SECONDS, (("stage", stage),)))
+            return (histogram.count, histogram.sum) if histogram else (0, 0.0)
+
+    def reset(self: Self) -> None:
+        """Drop all recorded values."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self: Self) -> str:
+        """Render the metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics.
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, list(h.counts), h.sum, h.count)
+                for key, h in self._histograms.items()
+            )
+        lines: list[str] = []
+        described: set[str] = set()
+        for (name, labels), value in counters:
+            self._describe(lines, described, name, "counter")
+            lines.append(f"{PREFIX}{name}{self._labels(labels)} {value}")
+        for (name, labels), counts, total, count in histograms:
+            self._describe(lines, described, name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(
+                [*self.buckets, "+Inf"], counts, strict=True
+            ):
+                cumulative += bucket_count
+                bucket_labels = self._labels((*labels, ("le", str(bound))))
+                lines.append(f"{PREFIX}{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{self._labels(labels)} {total}")
+            lines.append(f"{PREFIX}{name}_count{self._labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self: Self, file_path: str) -> None:
+        """Write the metrics to a file atomically, e.g. for the node exporter.
+
+        Args:
+            file_path: The path to the file.
+        """
+        path = Path(file_path)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_text(self.render())
+        tmp_path.replace(path)
+
+    def serve(self: Self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve the metrics over HTTP from a background thread.
+
+        Args:
+            port: The port to listen on, 0 for any free port.
+            host: The address to listen on.
+
+        Returns:
+            ThreadingHTTPServer: The running server.
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self: Self) -> None:
+                content = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self: Self, *_args: object) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}")
+        return server
+
+    @staticmethod
+    def _describe(lines: list[str], described: set[str], name: str, kind: str) -> None:
+        """Add the HELP and TYPE lines of a metric the first time it is rendered."""
+        if name not in described:
+            described.add(name)
+            if help_text := METRIC_HELP.get(name):
+                lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+    @staticmethod
+    def _labels(labels: tuple) -> str:
+        """Format labels, e.g. ``{stage="embed"}``."""
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+METRICS = MetricsRegistry()
+
+
+def serve_metrics_from_env() -> ThreadingHTTPServer | None:
+    """Serve the metrics of the process if ``PDF_ASK_METRICS_PORT`` is set.
+
+    Returns:
+        ThreadingHTTPServer | None: The running server, if any.
+    """
+    if port := os.getenv("PDF_ASK_METRICS_PORT"):
+        return METRICS.serve(int(port), os.getenv("PDF_ASK_METRICS_HOST", "127.0.0.1"))
+    return None
@@ -0,0 +1,259 @@
+from typing import Self
+
+import functools
+import json
+import logging
+import shutil
+import threading
+from collections.abc import Iterator
+from enum import Enum
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from pdf_ask.backend.vector_store import (
+    FaissVectorStore,
+    embedding_signature,
+    store_writer_lock,
+)
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_FOLDER = ".migration"
+
+
+class MigrationStatus(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+    FAILED = "failed"
+
+
+class EmbeddingMigration:
+    """Re-embed the chunks of a vector store with new embeddings in the background.
+
+    The stored chunk text is embedded in batches into a shadow store kept in the
+    ``.migration`` folder of the store, so the source files are never re-parsed. The
+    shadow store is saved every ``checkpoint_size`` chunks, which makes an interrupted
+    migration resume from its last checkpoint. Searches keep using the current index
+    until the shadow store is complete. The writer lock of the store is then taken, the
+    chunks saved meanwhile by any instance or process are caught up, and the shadow
+    store is swapped in atomically, keeping the previous version for :meth:`rollback`.
+
+    Other instances of the store cannot use the new index with their embeddings model
+    and raise ``EmbeddingMismatchError`` once they reload it. With ``embedder_name``,
+    the name and arguments of the new embedder are recorded in the manifest, and the
+    stores opened by the store cache and the ingestion queue switch to it.
+
+    Attributes:
+        store: The vector store to migrate.
+        embeddings: The new embeddings model.
+        embedder_name: The name of the new embedder in ``ALLOWED_EMBEDDERS``, if any.
+        embedder_kwargs: The keyword arguments of the new embedder.
+        batch_size: The number of chunks read from the store per batch.
+        checkpoint_size: The number of chunks embedded between two saves of the shadow
+            store.
+        status: The status of the migration.
+        error: The exception that made the migration fail, if any.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: Self,
+        store: FaissVectorStore,
+        embeddings: Embeddings,
+        batch_size: int = 256,
+        checkpoint_size: int = 8192,
+        *,
+        embedder_name: str | None = None,
+        embedder_kwargs: dict | None = None,
+    ) -> None:
+        """Initialize the migration.
+
+        Args:
+            store: The vector store to migrate.
+            embeddings: The new embeddings model.
+            batch_size: The number of chunks read from the store per batch.
+            checkpoint_size: The number of chunks embedded between two saves of the
+                shadow store.
+            embedder_name: The name of the new embedder in ``ALLOWED_EMBEDDERS``,
+                recorded in the manifest so other processes can switch to it.
+            embedder_kwargs: The keyword arguments creating the new embedder.
+        """
+        self.store = store
+        self.embeddings = embeddings
+        self.embedder_name = embedder_name
+        self.embedder_kwargs = embedder_kwargs or {}
+        self.batch_size = batch_size
+        self.checkpoint_size = checkpoint_size
+        self.status = MigrationStatus.PENDING
+        self.error: Exception | None = None
+        self.path = store.store_path / MIGRATION_FOLDER
+        self.shadow_path = self.path / "shadow"
+        self.previous_path = self.path / "previous"
+        self.state_path = self.path / "state.json"
+        self._previous_embeddings = store.embeddings
+        self._cancelled = threading.Event()
+        self._done = 0
+        self._total = 0
+
+    @property
+    def progress(self: Self) -> tuple[int, int]:
+        """The number of migrated chunks and the total number of chunks."""
+        return self._done, self._total
+
+    def start(self: Self) -> threading.Thread:
+        """Run the migration in a background thread.
+
+        Returns:
+            threading.Thread: The started thread.
+        """
+        thread = threading.Thread(target=self._run_safely, daemon=True)
+        thread.start()
+        return thread
+
+    def cancel(self: Self) -> None:
+        """Stop the migration after the current batch, keeping its progress."""
+        self._cancelled.set()
+
+    def run(self: Self) -> None:
+        """Run the migration until the new index is swapped in or it is cancelled."""
+        self.status = MigrationStatus.RUNNING
+        signature = embedding_signature(self.embeddings)
+        if self._read_state().get("embedder") != signature:
+            shutil.rmtree(self.shadow_path, ignore_errors=True)
+        self._write_state({"embedder": signature})
+        shadow = FaissVectorStore(
+            self.store.loader, self.embeddings, self.shadow_path.as_posix()
+        )
+        if not self._copy_pending(shadow):
+            self._cancel_run()
+            return
+        with store_writer_lock(self.store.store_path), self.store._lock:
+            self.store.refresh()
+            if not self._copy_pending(shadow):
+                self._cancel_run()
+                return
+            if stale := set(shadow.list_documents()) - set(self.store.list_documents()):
+                shadow.remove_documents(list(stale), save=False)
+            shadow.manifest["files"] = dict(self.store.file_hashes)
+            if self.embedder_name:
+                shadow.manifest["embedder_name"] = self.embedder_name
+                shadow.manifest["embedder_kwargs"] = self.embedder_kwargs
+            shadow._save()
+            shutil.rmtree(self.previous_path, ignore_errors=True)
+            self.store.replace_index(
+                self.shadow_path, self.embeddings, self.previous_path
+            )
+        shutil.rmtree(self.shadow_path, ignore_errors=True)
+        self.state_path.unlink()
+        self.status = MigrationStatus.COMPLETED
+        logger.info(f"Migrated {self.store.store_path} to {signature}")
+
+    def _cancel_run(self: Self) -> None:
+        """Record that the migration was cancelled."""
+        self.status = MigrationStatus.CANCELLED
+        logger.info(
+            f"Migration of {self.store.store_path} cancelled at {self._done}/{self._total}"
+        )
+
+    def rollback(self: Self, embeddings: Embeddings | None = None) -> None:
+        """Swap the index that was replaced by the migration back in.
+
+        Args:
+            embeddings: The embeddings model of the previous index, defaults to the one
+                the store used when the migration was created.
+
+        Raises:
+            FileNotFoundError: If there is no previous index to roll back to.
+        """
+        if not self.previous_path.exists():
+            msg = f"No previous index to roll back to in {self.previous_path}"
+            raise FileNotFoundError(msg)
+        self.store.replace_index(
+            self.previous_path, embeddings or self._previous_embeddings
+        )
+        shutil.rmtree(self.previous_path)
+        logger.info(f"Rolled back migration of {self.store.store_path}")
+
+    def _run_safely(self: Self) -> None:
+        """Run the migration and record the error instead of raising it."""
+        try:
+            self.run()
+        except Exception as error:
+            logger.exception(f"Migration of {self.store.store_path} failed")
+            self.error = error
+            self.status = MigrationStatus.FAILED
+
+    def _copy_pending(self: Self, shadow: FaissVectorStore) -> bool:
+        """Embed the chunks of the store missing from the shadow store.
+
+        Args:
+            shadow: The shadow store.
+
+        Returns:
+            bool: False if the migration was cancelled before all chunks were copied.
+        """
+        migrated = set(shadow.list_documents())
+        ids = self.store.list_documents()
+        pending = [_id for _id in ids if _id not in migrated]
+        self._total = len(ids)
+        self._done = self._total - len(pending)
+        for start in range(0, len(pending), self.checkpoint_size):
+            if self._cancelled.is_set():
+                return False
+            checkpoint = pending[start : start + self.checkpoint_size]
+            shadow._add_documents(
+                self._read_documents(checkpoint),
+                ids=checkpoint,
+                progress=functools.partial(self._record_progress, self._done),
+            )
+        return not self._cancelled.is_set()
+
+    def _read_documents(self: Self, ids: list[str]) -> Iterator[Document]:
+        """Read chunks of the store in batches until the migration is cancelled.
+
+        Args:
+            ids: The IDs of the chunks.
+
+        Yields:
+            Document: A chunk of the store.
+        """
+        for start in range(0, len(ids), self.batch_size):
+            if self._cancelled.is_set():
+                return
+            yield from self.store.get_documents(ids[start : start + self.batch_size])
+
+    def _record_progress(self: Self, done: int, stage: str, count: int, _: int) -> None:
+        """Record the number of migrated chunks as a checkpoint is embedded.
+
+        Args:
+            done: The number of chunks migrated before the checkpoint.
+            stage: The ingestion stage of the checkpoint.
+            count: The number of chunks of the checkpoint processed in the stage.
+        """
+        if stage != "embedding":
+            return
+        self._done = done + count
+        logger.debug(
+            f"Migrated {self._done}/{self._total} chunks of {self.store.store_path}"
+        )
+
+    def _read_state(self: Self) -> dict:
+        """Read the persisted state of the migration.
+
+        Returns:
+            dict: The state, empty if no migration was started.
+        """
+        if self.state_path.exists():
+            return json.loads(self.state_path.read_text())
+        return {}
+
+    def _write_state(self: Self, state: dict) -> None:
+        """Persist the state of the migration.
+
+        Args:
+            state: The state to persist.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.state_path.write_text(json.dumps(state))
@@ -0,0 +1,245 @@
+from typing import Any, ParamSpec, TypeVar
+
+import cProfile
+import functools
+import inspect
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+from pdf_ask.backend.metrics import collect_stage_timings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV = "PDF_ASK_PROFILE"
+PROFILE_DIR_ENV = "PDF_ASK_PROFILE_DIR"
+TOP_ENTRIES = 25
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+_request_id: ContextVar[str | None] = ContextVar("profiling_request_id", default=None)
+_profiling: ContextVar[bool] = ContextVar("profiling_active", default=False)
+# cProfile and tracemalloc are process-wide, so one call is profiled at a time
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def profiling(request_id: str | None = None) -> Iterator[str]:
+    """Profile the profiled stages called in the block, e.g. for one slow request.
+
+    Args:
+        request_id: The identifier saved with the profiles, generated if not given.
+
+    Yields:
+        str: The request identifier.
+    """
+    request_id = request_id or uuid.uuid4().hex[:12]
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+def is_profiling_enabled(stage: str) -> bool:
+    """Check whether a stage must be profiled.
+
+    A stage is profiled inside a :func:`profiling` block, or when the ``PDF_ASK_PROFILE``
+    environment variable is ``1``, ``all`` or a comma separated list including it.
+
+    Args:
+        stage: The name of the stage.
+
+    Returns:
+        bool: True if the stage must be profiled.
+    """
+    if _request_id.get() is not None:
+        return True
+    stages = os.getenv(PROFILE_ENV, "").replace(" ", "").split(",")
+    return bool({"1", "all", stage} & set(stages))
+
+
+def profiled(stage: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """Profile a function when profiling is enabled for its stage.
+
+    The call is run under cProfile and tracemalloc, and the profile is saved with the
+    request identifier and the stage timings to the ``PDF_ASK_PROFILE_DIR`` folder
+    (``profiles`` by default): a ``.prof`` file readable with ``pstats`` or snakeviz,
+    and a ``.json`` summary with the slowest functions and largest allocations. Calls
+    made from an already profiled function are not profiled separately, and calls
+    made while another thread or task is profiled run without profiling. Coroutine
+    functions are profiled until they return, including the other tasks run meanwhile,
+    and generator functions until they are exhausted or closed, including the code
+    consuming their items.
+
+    Args:
+        stage: The name of the profiled stage.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(function: Callable[P, R]) -> Callable[P, R]:
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args: P.args, **kwargs: P.kwargs) -> Any:
+                if _profiling.get() or not is_profiling_enabled(stage):
+                    return await function(*args, **kwargs)
+                with _profile(stage):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        if inspect.isgeneratorfunction(function):
+
+            @functools.wraps(function)
+            def generator_wrapper(*args: P.args, **kwargs: P.kwargs) -> Any:
+                if _profiling.get() or not is_profiling_enabled(stage):
+                    return (yield from function(*args, **kwargs))
+                with _profile(stage):
+                    return (yield from function(*args, **kwargs))
+
+            return generator_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            if _profiling.get() or not is_profiling_enabled(stage):
+                return function(*args, **kwargs)
+            with _profile(stage):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def _profile(stage: str) -> Iterator[None]:
+    """Profile the block unless another call is being profiled.
+
+    Args:
+        stage: The name of the profiled stage.
+
+    Yields:
+        None: When the block may run.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        logger.debug(f"Not profiling {stage}: another call is being profiled")
+        yield
+        return
+    try:
+        with _record_profile(stage):
+            yield
+    finally:
+        _profile_lock.release()
+
+
+@contextmanager
+def _record_profile(stage: str) -> Iterator[None]:
+    """Run the block under cProfile and tracemalloc and save the profile.
+
+    Args:
+        stage: The name of the profiled stage.
+
+    Yields:
+        None: When the block may run.
+    """
+    request_id = _request_id.get() or uuid.uuid4().hex[:12]
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    token = _profiling.set(True)
+    started_at = time.perf_counter()
+    try:
+        with collect_stage_timings() as timings:
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+    finally:
+        duration = time.perf_counter() - started_at
+        _profiling.reset(token)
+        after = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        if not was_tracing:
+            tracemalloc.stop()
+        _save_profile_safely(
+            stage,
+            request_id,
+            profiler,
+            {
+                "request_id": request_id,
+                "stage": stage,
+                "duration_s": duration,
+                "stage_timings_s": timings,
+                "peak_memory_bytes": peak,
+                "allocations": [
+                    {
+                        "location": str(stat.traceback),
+                        "size_bytes": stat.size_diff,
+                        "count": stat.count_diff,
+                    }
+                    for stat in after.compare_to(before, "lineno")[:TOP_ENTRIES]
+                ],
+            },
+        )
+
+
+def _save_profile_safely(*args: Any) -> None:
+    """Save a profile, logging instead of failing the profiled request.
+
+    Args:
+        *args: The arguments of :func:`_save_profile`.
+    """
+    try:
+        _save_profile(*args)
+    except OSError:
+        logger.exception("Failed to save the profile")
+
+
+def _save_profile(
+    stage: str, request_id: str, profiler: cProfile.Profile, summary: dict
+) -> None:
+    """Save a profile and its summary.
+
+    Args:
+        stage: The name of the profiled stage.
+        request_id: The request identifier.
+        profiler: The profiler.
+        summary: The summary of the profile, completed with the slowest functions.
+    """
+    folder = Path(os.getenv(PROFILE_DIR_ENV, "profiles"))
+    folder.mkdir(parents=True, exist_ok=True)
+    name = f"{datetime.now():%Y%m%d-%H%M%S}-{stage}-{request_id}"
+    stats = pstats.Stats(profiler)
+    stats.dump_stats(folder / f"{name}.prof")
+    slowest = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+    summary["functions"] = [
+        {
+            "function": f"{file}:{line}({function})",
+            "calls": calls,
+            "total_s": total,
+            "cumulative_s": cumulative,
+        }
+        for (file, line, function), (_, calls, total, cumulative, _) in slowest[
+            :TOP_ENTRIES
+        ]
+    ]
+    (folder / f"{name}.json").write_text(json.dumps(summary, indent=2))
+    logger.info(f"Saved the profile of {stage} {request_id} to {folder / name}")
@@ -0,0 +1,192 @@
+from typing import Any
+
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from pdf_ask.backend.embedding import get_embedding_instance
+from pdf_ask.backend.lazy import LazyModule
+from pdf_ask.backend.loader import DOC_PARSER, LocalLoader
+from pdf_ask.backend.spliter import get_text_splitter_instance
+from pdf_ask.backend.uploads import hash_file
+from pdf_ask.backend.vector_store import (
+    FaissVectorStore,
+    store_writer_lock,
+    swap_store_files,
+)
+
+logger = logging.getLogger(__name__)
+
+faiss = LazyModule("faiss")
+
+
+def list_store_files(store_path: str) -> list[str]:
+    """List the source files kept in a vector store folder.
+
+    Args:
+        store_path (str): Path to the vector store folder.
+
+    Returns:
+        list[str]: Sorted paths of the files with a supported extension.
+    """
+    return sorted(
+        path.as_posix()
+        for path in Path(store_path).iterdir()
+        if path.is_file() and path.suffix in DOC_PARSER
+    )
+
+
+def partition_files(file_paths: list[str], shards: int) -> list[list[str]]:
+    """Partition files into shards of similar total size.
+
+    Files are assigned largest first to the currently smallest shard.
+
+    Args:
+        file_paths (list[str]): Paths of the files to partition.
+        shards (int): The maximum number of shards.
+
+    Returns:
+        list[list[str]]: The non-empty shards.
+    """
+    buckets: list[list[str]] = [[] for _ in range(shards)]
+    sizes = [0] * shards
+    for file_path in sorted(file_paths, key=lambda path: -Path(path).stat().st_size):
+        smallest = sizes.index(min(sizes))
+        buckets[smallest].append(file_path)
+        sizes[smallest] += Path(file_path).stat().st_size
+    return [bucket for bucket in buckets if bucket]
+
+
+def _deduplicate(documents: list[Document]) -> list[Document]:
+    """Drop chunks repeating the content of an earlier chunk of the same source.
+
+    Args:
+        documents (list[Document]): The chunks to deduplicate.
+
+    Returns:
+        list[Document]: The chunks in order, without duplicates.
+    """
+    seen = set()
+    unique = []
+    for document in documents:
+        key = (document.metadata.get("source"), document.page_content)
+        if key not in seen:
+            seen.add(key)
+            unique.append(document)
+    return unique
+
+
+def _create_store(
+    store_path: str, embedder_name: str, splitter_name: str, **kwargs: Any
+) -> FaissVectorStore:
+    """Create a vector store from registry names.
+
+    Args:
+        store_path (str): Path to the vector store folder.
+        embedder_name (str): Name of the embedder.
+        splitter_name (str): Name of the text splitter.
+        **kwargs (Any): Keyword arguments passed to the embedder.
+
+    Returns:
+        FaissVectorStore: The vector store.
+    """
+    loader = LocalLoader(get_text_splitter_instance(splitter_name))
+    embeddings = get_embedding_instance(embedder_name, **kwargs)
+    return FaissVectorStore(loader, embeddings, store_path)
+
+
+def _build_shard(
+    file_paths: list[str],
+    shard_path: str,
+    embedder_name: str,
+    splitter_name: str,
+    embedder_kwargs: dict[str, Any],
+) -> str:
+    """Build a partial vector store from a shard of files in a worker process.
+
+    Args:
+        file_paths (list[str]): Paths of the files of the shard.
+        shard_path (str): Path where the partial vector store is saved.
+        embedder_name (str): Name of the embedder.
+        splitter_name (str): Name of the text splitter.
+        embedder_kwargs (dict[str, Any]): Keyword arguments passed to the embedder.
+
+    Returns:
+        str: The path of the saved partial vector store.
+    """
+    faiss.omp_set_num_threads(1)
+    store = _create_store(shard_path, embedder_name, splitter_name, **embedder_kwargs)
+    documents = []
+    for file_path in file_paths:
+        documents.extend(store.loader.load_document(file_path=file_path))
+        store.file_hashes[file_path] = hash_file(file_path)
+    store._add_documents(_deduplicate(documents))
+    logger.info(f"Built shard {shard_path} from {len(file_paths)} files")
+    return shard_path
+
+
+def rebuild_vector_store(
+    store_path: str,
+    embedder_name: str,
+    splitter_name: str,
+    workers: int | None = None,
+    **embedder_kwargs: Any,
+) -> FaissVectorStore:
+    """Rebuild a vector store from its source files using several processes.
+
+    The source files are partitioned across worker processes, each of which parses,
+    splits, deduplicates and embeds its files into a partial index. The partial indexes
+    are merged into a new store, whose index files then replace the existing ones.
+
+    Args:
+        store_path (str): Path to the vector store folder.
+        embedder_name (str): Name of the embedder.
+        splitter_name (str): Name of the text splitter.
+        workers (int, optional): Number of worker processes, defaults to the CPU count.
+        **embedder_kwargs (Any): Keyword arguments passed to the embedder.
+
+    Returns:
+        FaissVectorStore: The rebuilt vector store.
+    """
+    path = Path(store_path)
+    path.mkdir(parents=True, exist_ok=True)
+    file_paths = list_store_files(store_path)
+    shards = partition_files(file_paths, workers or os.cpu_count() or 1)
+    logger.info(
+        f"Rebuilding {store_path} from {len(file_paths)} files in {len(shards)} shards"
+    )
+    with tempfile.TemporaryDirectory(
+        dir=path.parent, prefix=f".{path.name}-rebuild-"
+    ) as tmp:
+        merged = _create_store(
+            f"{tmp}/merged", embedder_name, splitter_name, **embedder_kwargs
+        )
+        with ProcessPoolExecutor(
+            max_workers=len(shards) or 1,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _build_shard,
+                    shard,
+                    f"{tmp}/shard-{index}",
+                    embedder_name,
+                    splitter_name,
+                    embedder_kwargs,
+                )
+                for index, shard in enumerate(shards)
+            ]
+            for future in futures:
+                shard = _create_store(
+                    future.result(), embedder_name, splitter_name, **embedder_kwargs
+                )
+                # the merged store is saved once, after its last shard
+                merged.merge(shard, save=future is futures[-1])
+        with store_writer_lock(path):
+            swap_store_files(Path(tmp, "merged"), path)
+    return _create_store(store_path, embedder_name, splitter_name, **embedder_kwargs)
@@ -0,0 +1,477 @@
+from typing import BinaryIO, Self
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import struct
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from pdf_ask.backend.lazy import LazyModule
+from pdf_ask.backend.metrics import METRICS
+from pdf_ask.backend.uploads import CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+compressed_docstore = LazyModule("pdf_ask.backend.docstore")
+
+SNAPSHOT_MAGIC = b"PDFASKSN"
+SNAPSHOT_VERSION = 2
+# version 1 snapshots held the pickle file of the docstore
+MIN_SNAPSHOT_VERSION = 2
+SNAPSHOT_SUFFIX = ".snapshot"
+SNAPSHOT_ALIGNMENT = 4096
+SNAPSHOT_FOOTER = struct.Struct("<8sIQQ32s")
+SNAPSHOT_SECTIONS = {"index": ".faiss", "docstore": ".pkl"}
+MANIFEST_FILE = "store.json"
+LEGACY_INDEX_NAME = "index"
+EXPORT_ATTEMPTS = 3
+
+
+class SnapshotError(Exception):
+    """Exception raised when a snapshot file is invalid or corrupted."""
+
+    pass
+
+
+@dataclass(frozen=True)
+class SnapshotSection:
+    offset: int
+    length: int
+    sha256: str
+
+
+@dataclass(frozen=True)
+class SnapshotHeader:
+    """The description of a snapshot, stored at the end of its file.
+
+    Attributes:
+        version: The format version of the snapshot.
+        manifest: The manifest of the exported store.
+        sections: The position and checksum of the store files in the snapshot.
+        created_at: The time the snapshot was exported.
+    """
+
+    version: int
+    manifest: dict
+    sections: dict[str, SnapshotSection]
+    created_at: float
+
+    @property
+    def generation(self: Self) -> str | None:
+        """The generation of the exported store."""
+        return self.manifest.get("generation")
+
+    @classmethod
+    def from_json(cls: type[Self], data: dict) -> Self:
+        """Build a header from its JSON representation.
+
+        Args:
+            data (dict): The decoded header.
+
+        Returns:
+            SnapshotHeader: The header.
+        """
+        return cls(
+            version=data["version"],
+            manifest=data["manifest"],
+            sections={
+                name: SnapshotSection(**section)
+                for name, section in data["sections"].items()
+            },
+            created_at=data["created_at"],
+        )
+
+
+def store_files(store_path: str | Path, manifest: dict) -> dict[str, Path]:
+    """Get the index and docstore files of the version of a store folder in a manifest.
+
+    Every save of a store writes its files under a new name, recorded in the ``index``
+    field of the manifest, so replacing the manifest switches to the new version at
+    once. Stores saved before have their files named ``index.faiss`` and ``index.pkl``.
+
+    Args:
+        store_path (str | Path): The path of the store folder.
+        manifest (dict): The manifest of the store.
+
+    Returns:
+        dict[str, Path]: The path of each snapshot section.
+    """
+    name = manifest.get("index", LEGACY_INDEX_NAME)
+    return {
+        section: Path(store_path, f"{name}{suffix}")
+        for section, suffix in SNAPSHOT_SECTIONS.items()
+    }
+
+
+def is_snapshot(path: str | Path) -> bool:
+    """Check whether a path is a snapshot file rather than a store folder.
+
+    Args:
+        path (str | Path): The path of a store.
+
+    Returns:
+        bool: Whether the path is a file.
+    """
+    return Path(path).is_file()
+
+
+def read_snapshot_header(snapshot_path: str | Path) -> SnapshotHeader:
+    """Read the header of a snapshot without reading its sections.
+
+    Args:
+        snapshot_path (str | Path): The path of the snapshot file.
+
+    Returns:
+        SnapshotHeader: The header.
+
+    Raises:
+        SnapshotError: If the file is not a snapshot, has an unsupported format version
+            or a corrupted header.
+    """
+    with Path(snapshot_path).open("rb") as file:
+        return _read_header(file, snapshot_path)
+
+
+def verify_snapshot(snapshot_path: str | Path) -> SnapshotHeader:
+    """Check the checksums of all sections of a snapshot.
+
+    Args:
+        snapshot_path (str | Path): The path of the snapshot file.
+
+    Returns:
+        SnapshotHeader: The header.
+
+    Raises:
+        SnapshotError: If the snapshot is invalid or a section is corrupted.
+    """
+    with METRICS.span("verify_snapshot"), Path(snapshot_path).open("rb") as file:
+        header = _read_header(file, snapshot_path)
+        for name, section in header.sections.items():
+            file.seek(section.offset)
+            digest = hashlib.sha256()
+            remaining = section.length
+            while remaining and (chunk := file.read(min(CHUNK_SIZE, remaining))):
+                digest.update(chunk)
+                remaining -= len(chunk)
+            if remaining or digest.hexdigest() != section.sha256:
+                msg = f"Section {name} of snapshot {snapshot_path} is corrupted"
+                raise SnapshotError(msg)
+    return header
+
+
+def read_snapshot_section(
+    snapshot_path: str | Path, header: SnapshotHeader, name: str
+) -> bytes:
+    """Read a section of a snapshot.
+
+    Args:
+        snapshot_path (str | Path): The path of the snapshot file.
+        header (SnapshotHeader): The header of the snapshot.
+        name (str): The name of the section.
+
+    Returns:
+        bytes: The content of the section.
+    """
+    section = header.sections[name]
+    with Path(snapshot_path).open("rb") as file:
+        file.seek(section.offset)
+        return file.read(section.length)
+
+
+def export_snapshot(
+    store_path: str | Path, snapshot_path: str | Path
+) -> SnapshotHeader:
+    """Pack the files of a store folder into a snapshot file.
+
+    The index is written first, at offset 0, so that faiss can memory-map it straight
+    from the snapshot, followed by the docstore on a page boundary and a JSON header
+    with the manifest and the SHA-256 of every section. The docstore is serialized
+    with ``dump_docstore`` rather than copied from its pickle file, so opening a
+    snapshot from a shared volume never unpickles it. The snapshot is written next
+    to its destination and renamed over it, so readers of the destination see either
+    the previous snapshot or the new one. A store saved during the export is exported
+    again; ``FaissVectorStore.export_snapshot`` also holds the store lock so that the
+    store is not saved while being exported.
+
+    Args:
+        store_path (str | Path): The path of the store folder.
+        snapshot_path (str | Path): The path of the snapshot file.
+
+    Returns:
+        SnapshotHeader: The header of the snapshot.
+
+    Raises:
+        SnapshotError: If the store kept changing during the export.
+    """
+    store_path, snapshot_path = Path(store_path), Path(snapshot_path)
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    for _ in range(EXPORT_ATTEMPTS):
+        manifest = json.loads((store_path / MANIFEST_FILE).read_text())
+        tmp_path = _tmp_path(snapshot_path)
+        try:
+            with METRICS.span("export_snapshot"), tmp_path.open("wb") as file:
+                files = store_files(store_path, manifest)
+                sections = {
+                    "index": _write_section(file, _read_chunks(files["index"])),
+                    "docstore": _write_section(
+                        file, [_serialize_docstore(files["docstore"])]
+                    ),
+                }
+                header = SnapshotHeader(
+                    SNAPSHOT_VERSION, manifest, sections, time.time()
+                )
+                _write_header(file, header)
+            tmp_path.replace(snapshot_path)
+        except FileNotFoundError:
+            logger.info(f"Store {store_path} changed during its export, retrying")
+            continue
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        logger.info(
+            f"Exported store {store_path} generation {header.generation} "
+            f"to {snapshot_path}"
+        )
+        return header
+    msg = f"Store {store_path} kept changing during its export"
+    raise SnapshotError(msg)
+
+
+def install_snapshot(
+    source_path: str | Path, snapshot_path: str | Path
+) -> SnapshotHeader:
+    """Verify a snapshot and atomically replace a served snapshot with it.
+
+    The snapshot is copied next to its destination, e.g. from a shared volume, then
+    renamed over it. Processes serving the destination keep their memory map of the
+    previous file until they reopen the store, which the store cache does when it
+    notices the new generation.
+
+    Args:
+        source_path (str | Path): The path of the new snapshot.
+        snapshot_path (str | Path): The path of the served snapshot.
+
+    Returns:
+        SnapshotHeader: The header of the installed snapshot.
+    """
+    snapshot_path = Path(snapshot_path)
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = _tmp_path(snapshot_path)
+    try:
+        with Path(source_path).open("rb") as source, tmp_path.open("wb") as file:
+            shutil.copyfileobj(source, file, CHUNK_SIZE)
+            file.flush()
+            os.fsync(file.fileno())
+        header = verify_snapshot(tmp_path)
+        tmp_path.replace(snapshot_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    logger.info(f"Installed snapshot generation {header.generation} at {snapshot_path}")
+    return header
+
+
+def import_snapshot(
+    snapshot_path: str | Path, store_path: str | Path
+) -> SnapshotHeader:
+    """Unpack a verified snapshot into a store folder.
+
+    The files are unpacked into the store folder under a new name, then the manifest
+    pointing to them replaces the previous one, so processes opening the store see
+    either the previous version or the new one. The docstore is written back as the
+    pickle file of a store folder.
+
+    Args:
+        snapshot_path (str | Path): The path of the snapshot file.
+        store_path (str | Path): The path of the store folder.
+
+    Returns:
+        SnapshotHeader: The header of the snapshot.
+    """
+    store_path = Path(store_path)
+    header = verify_snapshot(snapshot_path)
+    store_path.mkdir(parents=True, exist_ok=True)
+    manifest_path = store_path / MANIFEST_FILE
+    previous = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    manifest = {**header.manifest, "index": f"index-{uuid.uuid4().hex}"}
+    files = store_files(store_path, manifest)
+    files["index"].write_bytes(read_snapshot_section(snapshot_path, header, "index"))
+    docstore, index_to_docstore_id = compressed_docstore.load_docstore(
+        read_snapshot_section(snapshot_path, header, "docstore")
+    )
+    files["docstore"].write_bytes(pickle.dumps((docstore, index_to_docstore_id)))
+    tmp_path = _tmp_path(manifest_path)
+    tmp_path.write_text(json.dumps(manifest, indent=2))
+    tmp_path.replace(manifest_path)
+    if previous:
+        for path in store_files(store_path, previous).values():
+            path.unlink(missing_ok=True)
+    logger.info(f"Imported snapshot generation {header.generation} into {store_path}")
+    return header
+
+
+def _tmp_path(path: Path) -> Path:
+    """Get a unique temporary path next to a path, on the same file system.
+
+    Args:
+        path (Path): The final path.
+
+    Returns:
+        Path: The temporary path.
+    """
+    return path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+
+def _read_chunks(source_path: Path) -> Iterator[bytes]:
+    """Read a store file chunk by chunk.
+
+    Args:
+        source_path (Path): The store file.
+
+    Yields:
+        bytes: The next chunk of the file.
+    """
+    with source_path.open("rb") as source:
+        while chunk := source.read(CHUNK_SIZE):
+            yield chunk
+
+
+def _serialize_docstore(source_path: Path) -> bytes:
+    """Convert the pickle file of a store docstore to its snapshot section.
+
+    Args:
+        source_path (Path): The docstore file of the store folder.
+
+    Returns:
+        bytes: The docstore serialized by ``dump_docstore``.
+    """
+    # the docstore file is written by the exported store itself in its own folder,
+    # the file FAISS.load_local unpickles with allow_dangerous_deserialization
+    with source_path.open("rb") as source:
+        docstore, index_to_docstore_id = pickle.load(source)  # noqa: S301 # nosec
+    return compressed_docstore.dump_docstore(docstore, index_to_docstore_id)
+
+
+def _write_section(file: BinaryIO, chunks: Iterable[bytes]) -> SnapshotSection:
+    """Write a section into a snapshot, starting on a page boundary.
+
+    Args:
+        file (BinaryIO): The snapshot file opened for writing.
+        chunks (Iterable[bytes]): The content of the section.
+
+    Returns:
+        SnapshotSection: The position and checksum of the section.
+    """
+    offset = -file.tell() % SNAPSHOT_ALIGNMENT + file.tell()
+    file.write(b"\0" * (offset - file.tell()))
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+        file.write(chunk)
+    return SnapshotSection(offset, file.tell() - offset, digest.hexdigest())
+
+
+def _write_header(file: BinaryIO, header: SnapshotHeader) -> None:
+    """Write the header and the footer pointing to it, then flush the snapshot.
+
+    Args:
+        file (BinaryIO): The snapshot file opened for writing.
+        header (SnapshotHeader): The header.
+    """
+    content = json.dumps(asdict(header)).encode()
+    offset = file.tell()
+    file.write(content)
+    file.write(
+        SNAPSHOT_FOOTER.pack(
+            SNAPSHOT_MAGIC,
+            SNAPSHOT_VERSION,
+            offset,
+            len(content),
+            hashlib.sha256(content).digest(),
+        )
+    )
+    file.flush()
+    os.fsync(file.fileno())
+
+
+def _read_header(file: BinaryIO, snapshot_path: str | Path) -> SnapshotHeader:
+    """Read the footer and the header of a snapshot.
+
+    Args:
+        file (BinaryIO): The snapshot file opened for reading.
+        snapshot_path (str | Path): The path of the snapshot, for error messages.
+
+    Returns:
+        SnapshotHeader: The header.
+
+    Raises:
+        SnapshotError: If the file is not a snapshot, has an unsupported format version
+            or a corrupted header.
+    """
+    size = file.seek(0, os.SEEK_END)
+    if size < SNAPSHOT_FOOTER.size:
+        msg = f"{snapshot_path} is not a snapshot"
+        raise SnapshotError(msg)
+    file.seek(size - SNAPSHOT_FOOTER.size)
+    magic, version, offset, length, checksum = SNAPSHOT_FOOTER.unpack(
+        file.read(SNAPSHOT_FOOTER.size)
+    )
+    if magic != SNAPSHOT_MAGIC:
+        msg = f"{snapshot_path} is not a snapshot"
+        raise SnapshotError(msg)
+    if version > SNAPSHOT_VERSION:
+        msg = f"Snapshot {snapshot_path} has format version {version}, newer than {SNAPSHOT_VERSION}"
+        raise SnapshotError(msg)
+    if version < MIN_SNAPSHOT_VERSION:
+        msg = f"Snapshot {snapshot_path} has format version {version}, export it again"
+        raise SnapshotError(msg)
+    file.seek(offset)
+    content = file.read(length)
+    if hashlib.sha256(content).digest() != checksum:
+        msg = f"Header of snapshot {snapshot_path} is corrupted"
+        raise SnapshotError(msg)
+    return SnapshotHeader.from_json(json.loads(content))
+
+
+def main() -> None:
+    """Export, verify, install or import snapshots from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Pack vector stores into portable read-only snapshot files."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Pack a store folder into a snapshot.")
+    export.add_argument("store_path", help="Path to the vector store folder.")
+    export.add_argument("snapshot_path", help="Path to the snapshot file.")
+    verify = commands.add_parser("verify", help="Check the checksums of a snapshot.")
+    verify.add_argument("snapshot_path", help="Path to the snapshot file.")
+    install = commands.add_parser(
+        "install", help="Verify a snapshot and atomically replace a served one."
+    )
+    install.add_argument("source_path", help="Path to the new snapshot file.")
+    install.add_argument("snapshot_path", help="Path to the served snapshot file.")
+    unpack = commands.add_parser("import", help="Unpack a snapshot into a store.")
+    unpack.add_argument("snapshot_path", help="Path to the snapshot file.")
+    unpack.add_argument("store_path", help="Path to the vector store folder.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "export":
+        header = export_snapshot(args.store_path, args.snapshot_path)
+    elif args.command == "verify":
+        header = verify_snapshot(args.snapshot_path)
+    elif args.command == "install":
+        header = install_snapshot(args.source_path, args.snapshot_path)
+    else:
+        header = import_snapshot(args.snapshot_path, args.store_path)
+    sections = {name: asdict(section) for name, section in header.sections.items()}
+    logger.info(f"Snapshot of generation {header.generation}: {json.dumps(sections)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
-from typing import Any
+from typing import Any, ClassVar
 
+import re
+
+from langchain_core.document_loaders.base import BaseLoader
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_text_splitters.base import TextSplitter
 
+from pdf_ask.backend.loader import PyMuPDFLayoutLoader
+
 
 class SimpleRecursiveCharacterTextSplitter(RecursiveCharacterTextSplitter):
     """A simple recursive character text splitter with predefined settings."""
@@ -19,8 +25,175 @@ class SimpleRecursiveCharacterTextSplitter(RecursiveCharacterTextSplitter):
         )
 
 
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """Count the word-level tokens of a text.
+
+    Words and punctuation marks are counted as one token each, which is a cheap,
+    dependency-free approximation of the tokens seen by the LLM and the embedder.
+
+    Args:
+        text (str): The text to count tokens in.
+
+    Returns:
+        int: The number of tokens.
+
+    Examples:
+        >>> count_tokens("What is the max operating temperature?")
+        7
+    """
+    return sum(1 for _ in TOKEN_PATTERN.finditer(text))
+
+
+class LinearTokenTextSplitter(TextSplitter):
+    """Split text into token-sized chunks in a single linear pass.
+
+    The text is tokenized once, and every chunk is a slice of the original text spanning
+    ``chunk_size`` tokens, with ``chunk_overlap`` tokens shared with the previous chunk.
+    The position of each chunk in its document is kept as ``chunk_index`` metadata, so
+    consecutive chunks of a text file can be told apart from distant chunks.
+    """
+
+    def __init__(
+        self, chunk_size: int = 256, chunk_overlap: int = 32, **kwargs: Any
+    ) -> None:
+        """Init function.
+
+        Args:
+            chunk_size (int): The maximum number of tokens per chunk.
+            chunk_overlap (int): The number of tokens shared by consecutive chunks.
+            **kwargs (Any): Additional keyword arguments to pass to the text splitter.
+
+        Raises:
+            ValueError: If the overlap is not smaller than the chunk size.
+        """
+        if chunk_overlap >= chunk_size:
+            msg = f"Chunk overlap ({chunk_overlap}) must be smaller than chunk size ({chunk_size})"
+            raise ValueError(msg)
+        super().__init__(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=count_tokens,
+            **kwargs,
+        )
+
+    def create_documents(
+        self, texts: list[str], metadatas: list[dict] | None = None
+    ) -> list[Document]:
+        """Split texts into documents carrying their chunk index.
+
+        Args:
+            texts (list[str]): The texts to split.
+            metadatas (list[dict] | None): The metadata of each text.
+
+        Returns:
+            list[Document]: The chunks, with the metadata of their text and their
+                ``chunk_index`` in it.
+        """
+        documents = []
+        for text, metadata in zip(texts, metadatas or [{}] * len(texts), strict=True):
+            chunks = super().create_documents([text], [metadata])
+            for index, chunk in enumerate(chunks):
+                chunk.metadata["chunk_index"] = index
+            documents.extend(chunks)
+        return documents
+
+    def split_text(self, text: str) -> list[str]:
+        """Split a text into chunks of at most ``chunk_size`` tokens.
+
+        Args:
+            text (str): The text to split.
+
+        Returns:
+            list[str]: The chunks of the text.
+
+        Examples:
+            >>> LinearTokenTextSplitter(chunk_size=3, chunk_overlap=1).split_text(
+            ...     "one two three four five six"
+            ... )
+            ['one two three', 'three four five', 'five six']
+        """
+        starts, ends = [], []
+        for match in TOKEN_PATTERN.finditer(text):
+            starts.append(match.start())
+            ends.append(match.end())
+        step = self._chunk_size - self._chunk_overlap
+        chunks = []
+        for first in range(0, len(starts), step):
+            last = min(first + self._chunk_size, len(starts)) - 1
+            chunks.append(text[starts[first] : ends[last]])
+            if last == len(starts) - 1:
+                break
+        return chunks
+
+
+class LayoutAwareTextSplitter(LinearTokenTextSplitter):
+    """Pack whole paragraphs of a section into token-sized chunks.
+
+    Meant to be combined with :class:`PyMuPDFLayoutLoader`, which yields one document per
+    section and page, so chunks never cross headings, tables or pages and keep their
+    ``section_path`` metadata. Only paragraphs longer than ``chunk_size`` are cut, using
+    the linear token split with ``chunk_overlap``.
+    """
+
+    document_parsers: ClassVar[dict[str, type[BaseLoader]]] = {
+        ".pdf": PyMuPDFLayoutLoader
+    }
+
+    def __init__(
+        self, chunk_size: int = 384, chunk_overlap: int = 32, **kwargs: Any
+    ) -> None:
+        """Init function.
+
+        Args:
+            chunk_size (int): The maximum number of tokens per chunk.
+            chunk_overlap (int): The number of tokens shared by the pieces of a
+                paragraph longer than ``chunk_size``.
+            **kwargs (Any): Additional keyword arguments to pass to the text splitter.
+        """
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, **kwargs)
+
+    def split_text(self, text: str) -> list[str]:
+        r"""Split a text into chunks of whole paragraphs.
+
+        Args:
+            text (str): The text to split, with paragraphs separated by blank lines.
+
+        Returns:
+            list[str]: The chunks of the text.
+
+        Examples:
+            >>> LayoutAwareTextSplitter(chunk_size=4, chunk_overlap=1).split_text(
+            ...     "one two\n\nthree four\n\nfive"
+            ... )
+            ['one two\n\nthree four', 'five']
+        """
+        chunks: list[str] = []
+        current: list[str] = []
+        current_tokens = 0
+        for paragraph in text.split("\n\n"):
+            tokens = count_tokens(paragraph)
+            if tokens == 0:
+                continue
+            if current and current_tokens + tokens > self._chunk_size:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            if tokens > self._chunk_size:
+                chunks.extend(super().split_text(paragraph))
+                continue
+            current.append(paragraph)
+            current_tokens += tokens
+        if current:
+            chunks.append("\n\n".join(current))
+        return chunks
+
+
 ALLOWED_SPLITTER: dict[str, type[TextSplitter]] = {
-    "recursive": SimpleRecursiveCharacterTextSplitter
+    "recursive": SimpleRecursiveCharacterTextSplitter,
+    "token": LinearTokenTextSplitter,
+    "layout": LayoutAwareTextSplitter,
 }
 
 
@@ -0,0 +1,144 @@
+from typing import Self
+
+import functools
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from pdf_ask.backend.clients import get_client_pool
+from pdf_ask.backend.loader import LocalLoader
+from pdf_ask.backend.spliter import get_text_splitter_instance
+from pdf_ask.backend.vector_store import (
+    EmbeddingMismatchError,
+    FaissVectorStore,
+    read_manifest,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def open_vector_store(
+    store_path: str, embedder_name: str, splitter_name: str, read_only: bool = False
+) -> FaissVectorStore:
+    """Open a vector store with the shared embedder and a new text splitter.
+
+    A store migrated to another embedder with ``EmbeddingMigration`` records the name
+    and arguments of the new embedder in its manifest, and is opened with it when the
+    requested embedder does not match the store anymore.
+
+    Args:
+        store_path: The path to the vector store folder.
+        embedder_name: The name of the embedder of the store.
+        splitter_name: The name of the text splitter.
+        read_only: Whether to open the store read-only with a memory-mapped index.
+
+    Returns:
+        FaissVectorStore: The vector store.
+
+    Raises:
+        EmbeddingMismatchError: If the store was built with other embeddings, not
+            recorded in its manifest.
+    """
+    loader = LocalLoader(get_text_splitter_instance(splitter_name))
+    pool = get_client_pool()
+    try:
+        return FaissVectorStore(
+            loader, pool.get_embeddings(embedder_name), store_path, read_only=read_only
+        )
+    except EmbeddingMismatchError:
+        manifest = read_manifest(store_path)
+        if not manifest.get("embedder_name"):
+            raise
+    logger.info(
+        f"Opening vector store {store_path} migrated to {manifest['embedder_name']}"
+    )
+    embeddings = pool.get_embeddings(
+        manifest["embedder_name"], **manifest.get("embedder_kwargs", {})
+    )
+    return FaissVectorStore(loader, embeddings, store_path, read_only=read_only)
+
+
+@dataclass
+class _CachedStore:
+    store: FaissVectorStore
+    checked_at: float
+
+
+class StoreCache:
+    """Vector stores kept open across requests and reopened when they change on disk.
+
+    Opening a store reads its index and unpickles its docstore, so a process serving
+    queries keeps one instance per store. The generation of the manifest on disk is
+    checked at most every ``check_interval`` seconds, and a store written by another
+    process, e.g. an ingestion worker, is reopened and swapped in. A store migrated to
+    another embedder is reopened with it, see :func:`open_vector_store`.
+
+    Attributes:
+        read_only: Whether the stores are opened read-only with memory-mapped indexes.
+        check_interval: The minimal number of seconds between two checks of a store.
+    """
+
+    def __init__(
+        self: Self, read_only: bool = False, check_interval: float = 1.0
+    ) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            read_only: Whether the stores are opened read-only with memory-mapped
+                indexes.
+            check_interval: The minimal number of seconds between two checks of a
+                store.
+        """
+        self.read_only = read_only
+        self.check_interval = check_interval
+        self._stores: dict[tuple[str, str, str], _CachedStore] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self: Self, store_path: str, embedder_name: str, splitter_name: str
+    ) -> FaissVectorStore:
+        """Get an open vector store, opening or reopening it if needed.
+
+        Args:
+            store_path: The path to the vector store folder.
+            embedder_name: The name of the embedder of the store.
+            splitter_name: The name of the text splitter.
+
+        Returns:
+            FaissVectorStore: The vector store.
+        """
+        key = (Path(store_path).as_posix(), embedder_name, splitter_name)
+        with self._lock:
+            cached = self._stores.get(key)
+            now = time.monotonic()
+            if cached and now - cached.checked_at < self.check_interval:
+                return cached.store
+            if cached and read_manifest(store_path).get("generation") in {
+                None,
+                cached.store.generation,
+            }:
+                cached.checked_at = now
+                return cached.store
+            logger.info(f"Opening vector store {store_path}")
+            store = open_vector_store(
+                store_path, embedder_name, splitter_name, read_only=self.read_only
+            )
+            self._stores[key] = _CachedStore(store, now)
+            return store
+
+    def clear(self: Self) -> None:
+        """Close all stores."""
+        with self._lock:
+            self._stores.clear()
+
+
+@functools.cache
+def get_store_cache() -> StoreCache:
+    """Get the store cache shared by all sessions of the process.
+
+    Returns:
+        StoreCache: The store cache.
+    """
+    return StoreCache()
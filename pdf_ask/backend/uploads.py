@@ -0,0 +1,77 @@
+from typing import BinaryIO
+
+import hashlib
+import logging
+import uuid
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path: str | Path, chunk_size: int = CHUNK_SIZE) -> str:
+    """Compute the SHA-256 of a file, reading it in chunks.
+
+    Args:
+        file_path (str | Path): The path to the file.
+        chunk_size (int): The number of bytes read at once.
+
+    Returns:
+        str: The hexadecimal digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with Path(file_path).open("rb") as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_upload(
+    upload: BinaryIO,
+    destination: str | Path,
+    chunk_size: int = CHUNK_SIZE,
+    size: int | None = None,
+) -> str:
+    """Copy an uploaded file to disk in chunks while computing its SHA-256.
+
+    The content is written to a temporary file next to the destination, which is then
+    renamed, so readers never see a partially written file and at most one chunk of
+    the upload is copied in memory at a time.
+
+    Args:
+        upload (BinaryIO): The uploaded file, read from its start if seekable.
+        destination (str | Path): The path to write the file to.
+        chunk_size (int): The number of bytes copied at once.
+        size (int, optional): The number of bytes to copy, e.g. the content length of
+            a request body, until the end of the upload if not given.
+
+    Returns:
+        str: The hexadecimal digest of the file content.
+
+    Raises:
+        EOFError: If the upload is shorter than ``size``.
+    """
+    destination = Path(destination)
+    tmp_path = destination.with_name(f".{destination.name}.{uuid.uuid4().hex}.tmp")
+    digest = hashlib.sha256()
+    if upload.seekable():
+        upload.seek(0)
+    remaining = size
+    try:
+        with tmp_path.open("wb") as file:
+            while chunk := upload.read(
+                chunk_size if remaining is None else min(chunk_size, remaining)
+            ):
+                digest.update(chunk)
+                file.write(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+        if remaining:
+            msg = f"The upload ended {remaining} bytes before its announced size"
+            raise EOFError(msg)
+        tmp_path.replace(destination)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    logger.info(f"Saved the upload to {destination}")
+    return digest.hexdigest()
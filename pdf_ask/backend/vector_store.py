@@ -1,20 +1,295 @@
 # Python code
 
-from typing import Protocol, Self
+from typing import TYPE_CHECKING, Protocol, Self
 
+import asyncio
+import fcntl
+import itertools
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+import uuid
 from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
 from pathlib import Path
 
-import faiss
-from langchain_community.docstore.in_memory import InMemoryDocstore
-from langchain_community.vectorstores import FAISS
+import numpy as np
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 
+from pdf_ask.backend.lazy import LazyModule
 from pdf_ask.backend.loader import LoaderProtocol
+from pdf_ask.backend.metrics import METRICS
+from pdf_ask.backend.profiling import profiled
+from pdf_ask.backend.snapshot import (
+    SnapshotHeader,
+    export_snapshot,
+    install_snapshot,
+    is_snapshot,
+    read_snapshot_header,
+    store_files,
+)
+from pdf_ask.backend.uploads import hash_file
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger(__name__)
+
+# langchain_community and faiss are only imported when a store is opened
+faiss = LazyModule("faiss")
+langchain_faiss = LazyModule("langchain_community.vectorstores.faiss")
+in_memory = LazyModule("langchain_community.docstore.in_memory")
+compressed_docstore = LazyModule("pdf_ask.backend.docstore")
+
+STORE_MANIFEST = "store.json"
+WRITER_LOCK = ".writer.lock"
+EMBED_BATCH_SIZE = 256
+MMR_FETCH_FACTOR = 4
+COMPRESS_DOCSTORE_ENV = "PDF_ASK_COMPRESS_DOCSTORE"
+
+ProgressCallback = Callable[[str, int, int], None]
+
+_held_writer_locks = threading.local()
+
+
+class ReadOnlyVectorStoreError(Exception):
+    """Exception raised when a vector store opened read-only is modified."""
+
+    pass
+
+
+class StaleVectorStoreError(Exception):
+    """Exception raised when a store is saved over changes written by another instance."""
+
+    pass
+
+
+class EmbeddingMismatchError(Exception):
+    """Exception raised when a store is opened with other embeddings than it was built with."""
+
+    pass
+
+
+def embedding_signature(embeddings: Embeddings) -> str:
+    """Describe the embeddings model used to build a vector store.
+
+    Args:
+        embeddings (Embeddings): The embeddings model.
+
+    Returns:
+        str: The class of the embeddings model with its model name and size, if any.
+    """
+    embeddings_class = type(embeddings)
+    settings = ", ".join(
+        f"{attribute}={value}"
+        for attribute in ("model", "dimensions", "size")
+        if (value := getattr(embeddings, attribute, None))
+    )
+    return f"{embeddings_class.__module__}.{embeddings_class.__qualname__}({settings})"
+
+
+def read_manifest(store_path: str | Path) -> dict:
+    """Read the manifest of a store without loading the store.
+
+    Args:
+        store_path (str | Path): Path to the vector store folder or snapshot file.
+
+    Returns:
+        dict: The manifest, empty if the store has none.
+    """
+    if is_snapshot(store_path):
+        return read_snapshot_header(store_path).manifest
+    manifest_path = Path(store_path) / STORE_MANIFEST
+    if not manifest_path.exists():
+        return {}
+    return json.loads(manifest_path.read_text())
+
+
+def has_index(store_path: str | Path) -> bool:
+    """Check whether a store folder holds a saved index.
+
+    Args:
+        store_path (str | Path): Path to the vector store folder.
+
+    Returns:
+        bool: Whether the index of the current version of the store exists.
+    """
+    return store_files(store_path, read_manifest(store_path))["index"].exists()
+
+
+@contextmanager
+def store_writer_lock(store_path: str | Path) -> Iterator[None]:
+    """Hold the lock serializing the writers of a store folder, across processes.
+
+    The lock is reentrant within a thread.
+
+    Args:
+        store_path (str | Path): Path to the vector store folder.
+
+    Yields:
+        None: Once the lock is held.
+    """
+    path = Path(store_path).resolve()
+    held = _held_writer_locks.__dict__.setdefault("paths", set())
+    if path in held:
+        yield
+        return
+    path.mkdir(parents=True, exist_ok=True)
+    with (path / WRITER_LOCK).open("a") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        held.add(path)
+        try:
+            yield
+        finally:
+            held.discard(path)
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def swap_store_files(source_path: str | Path, store_path: str | Path) -> dict:
+    """Move the current version of a store folder into another store folder.
+
+    The index and docstore files are moved under a new name, then the manifest of the
+    source, pointing to them, replaces the manifest of the store, so processes opening
+    the store see either the previous version or the new one. The files of the
+    previous version are then removed, which does not affect the processes that
+    already opened or memory-mapped them. The caller holds the writer lock of the
+    store.
+
+    Args:
+        source_path (str | Path): The store folder holding the new version.
+        store_path (str | Path): The store folder to update.
+
+    Returns:
+        dict: The new manifest of the store.
+    """
+    previous = read_manifest(store_path)
+    source = read_manifest(source_path)
+    generation = uuid.uuid4().hex
+    manifest = {**source, "generation": generation, "index": f"index-{generation}"}
+    targets = store_files(store_path, manifest)
+    for section, path in store_files(source_path, source).items():
+        path.replace(targets[section])
+    _write_manifest(Path(store_path), manifest)
+    if previous:
+        _remove_files(store_path, previous, keep=manifest)
+    return manifest
+
+
+def _write_manifest(store_path: Path, manifest: dict) -> None:
+    """Atomically write the manifest of a store.
+
+    Args:
+        store_path (Path): Path to the vector store folder.
+        manifest (dict): The manifest to write.
+    """
+    store_path.mkdir(parents=True, exist_ok=True)
+    tmp_path = store_path / f".{STORE_MANIFEST}.{uuid.uuid4().hex}.tmp"
+    tmp_path.write_text(json.dumps(manifest, indent=2))
+    tmp_path.replace(store_path / STORE_MANIFEST)
+
+
+def _remove_files(store_path: str | Path, manifest: dict, keep: dict) -> None:
+    """Remove the files of a version of a store, unless the kept version uses them.
+
+    Args:
+        store_path (str | Path): Path to the vector store folder.
+        manifest (dict): The manifest of the version to remove.
+        keep (dict): The manifest of the current version.
+    """
+    kept = set(store_files(store_path, keep).values())
+    for path in store_files(store_path, manifest).values():
+        if path not in kept:
+            path.unlink(missing_ok=True)
+
+
+def stored_file_hash(store_path: str | Path, file_path: str) -> str | None:
+    """Get the content hash of a file as ingested in a store, without loading the store.
+
+    Args:
+        store_path (str | Path): Path to the vector store folder.
+        file_path (str): Path to the file, as given when it was added.
+
+    Returns:
+        str | None: The SHA-256 of the ingested file, None if the store has no such file.
+    """
+    return read_manifest(store_path).get("files", {}).get(file_path)
+
+
+def _unit_vectors(vectors: np.ndarray) -> np.ndarray:
+    """Scale vectors to unit length along their last axis, leaving null vectors as is.
+
+    Args:
+        vectors (np.ndarray): The vectors.
+
+    Returns:
+        np.ndarray: The unit vectors.
+    """
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, np.finfo(np.float32).tiny)
+
+
+def maximal_marginal_relevance(
+    queries: np.ndarray,
+    candidates: np.ndarray,
+    valid: np.ndarray,
+    top_k: int,
+    mmr_lambda: float,
+) -> np.ndarray:
+    """Select diverse candidates by maximal marginal relevance, for a batch of queries.
+
+    Each step selects, for every query at once, the candidate maximizing
+    ``mmr_lambda * relevance - (1 - mmr_lambda) * redundancy``, where the relevance is
+    the cosine similarity to the query and the redundancy the highest cosine similarity
+    to the candidates already selected.
+
+    Args:
+        queries (np.ndarray): The query vectors, of shape ``(queries, dimension)``.
+        candidates (np.ndarray): The candidate vectors of each query, of shape
+            ``(queries, candidates, dimension)``.
+        valid (np.ndarray): Whether each candidate exists, of shape
+            ``(queries, candidates)``.
+        top_k (int): The number of candidates to select per query.
+        mmr_lambda (float): The weight of the relevance against the diversity, from 0
+            for the most diverse selection to 1 for a ranking by relevance only.
+
+    Returns:
+        np.ndarray: The positions of the selected candidates in selection order, of
+            shape ``(queries, top_k)``, padded with -1 when fewer candidates exist.
+
+    >>> queries = np.array([[1.0, 0.0]])
+    >>> candidates = np.array([[[1.0, 0.0], [1.0, 0.01], [0.6, 0.8]]])
+    >>> valid = np.ones((1, 3), dtype=bool)
+    >>> maximal_marginal_relevance(queries, candidates, valid, 2, 1.0).tolist()
+    [[0, 1]]
+    >>> maximal_marginal_relevance(queries, candidates, valid, 2, 0.3).tolist()
+    [[0, 2]]
+    """
+    queries = _unit_vectors(queries)
+    candidates = _unit_vectors(candidates)
+    rows = np.arange(len(queries))
+    relevance = np.einsum("qnd,qd->qn", candidates, queries)
+    redundancy = np.zeros_like(relevance)
+    available = valid.copy()
+    selected = np.full((len(queries), top_k), -1)
+    for step in range(min(top_k, candidates.shape[1])):
+        scores = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+        best = np.where(available, scores, -np.inf).argmax(axis=1)
+        selected[:, step] = np.where(available[rows, best], best, -1)
+        available[rows, best] = False
+        similarity = np.einsum("qnd,qd->qn", candidates, candidates[rows, best])
+        redundancy = np.maximum(redundancy, similarity)
+    return selected
 
 
 class VectorStoreProtocol(Protocol):
+    store_path: Path
+    generation: str
+
     def list_documents(self):
         """List all documents in the vector store.
 
@@ -23,29 +298,109 @@ class VectorStoreProtocol(Protocol):
         """
         ...
 
-    def add_file(self: Self, file_path: str, force: bool = False) -> None:
+    def add_file(
+        self: Self,
+        file_path: str,
+        force: bool = False,
+        progress: ProgressCallback | None = None,
+        content_hash: str | None = None,
+    ) -> None:
         """Add a file to the vector store.
 
         Args:
             file_path (str): Path to the file.
             force (bool): Force overwrite if file exists.
+            progress (ProgressCallback, optional): Called with the stage, the number of
+                processed chunks and the total number of chunks as ingestion progresses.
+            content_hash (str, optional): The SHA-256 of the file, computed if not given.
         """
 
-    def similarity_search(self: Self, query: str, top_k: int = 10) -> list[dict]:
+    def similarity_search(
+        self: Self, query: str, top_k: int = 10, mmr_lambda: float | None = None
+    ) -> list[dict]:
         """Perform a similarity search on the vector store.
 
         Args:
             query (str): The search query.
             top_k (int): Number of top results to return.
+            mmr_lambda (float, optional): The diversity factor of a maximal marginal
+                relevance re-ranking, from 0 for the most diverse results to 1 for a
+                ranking by relevance only. No re-ranking if None.
 
         Returns:
             list[dict]: List of search results.
         """
 
+    async def asimilarity_search(
+        self: Self, query: str, top_k: int = 10, mmr_lambda: float | None = None
+    ) -> list[dict]:
+        """Perform a similarity search on the vector store asynchronously.
+
+        Args:
+            query (str): The search query.
+            top_k (int): Number of top results to return.
+            mmr_lambda (float, optional): The diversity factor of a maximal marginal
+                relevance re-ranking, from 0 for the most diverse results to 1 for a
+                ranking by relevance only. No re-ranking if None.
+
+        Returns:
+            list[dict]: List of search results.
+        """
+
+    def embed_query(self: Self, query: str) -> list[float]:
+        """Embed a query with the embeddings model of the vector store.
+
+        Args:
+            query (str): The query to embed.
+
+        Returns:
+            list[float]: The embedding of the query.
+        """
+
+    def similarity_search_by_vector(
+        self: Self,
+        embedding: list[float],
+        top_k: int = 10,
+        mmr_lambda: float | None = None,
+    ) -> list[dict]:
+        """Perform a similarity search with an already embedded query.
+
+        Args:
+            embedding (list[float]): The embedding of the query.
+            top_k (int): Number of top results to return.
+            mmr_lambda (float, optional): The diversity factor of a maximal marginal
+                relevance re-ranking, from 0 for the most diverse results to 1 for a
+                ranking by relevance only. No re-ranking if None.
+
+        Returns:
+            list[dict]: List of search results.
+        """
+
+    def batch_similarity_search(
+        self: Self, queries: list[str], top_k: int = 10, mmr_lambda: float | None = None
+    ) -> list[list[dict]]:
+        """Perform a similarity search for several queries at once.
+
+        Args:
+            queries (list[str]): The search queries.
+            top_k (int): Number of top results to return per query.
+            mmr_lambda (float, optional): The diversity factor of a maximal marginal
+                relevance re-ranking, from 0 for the most diverse results to 1 for a
+                ranking by relevance only. No re-ranking if None.
+
+        Returns:
+            list[list[dict]]: List of search results of each query.
+        """
+
 
 class FaissVectorStore:
     def __init__(
-        self, loader: LoaderProtocol, embeddings: Embeddings, store_path: str
+        self,
+        loader: LoaderProtocol,
+        embeddings: Embeddings,
+        store_path: str,
+        read_only: bool = False,
+        compress: bool | None = None,
     ) -> None:
         """Initialize the FaissVectorStore.
 
@@ -53,12 +408,30 @@ class FaissVectorStore:
             loader (LoaderProtocol): The document loader.
             embeddings (Embeddings): The embeddings model.
             store_path (str): Path to store the vector data.
+            read_only (bool): Whether to memory-map the index of an existing store
+                instead of reading it, so that processes serving the same store share
+                its pages. The store then cannot be modified. Snapshot files are
+                always opened read-only.
+            compress (bool, optional): Whether to keep the chunks in a
+                ``CompressedDocstore``, converting the docstore of an existing store
+                when it is opened. Defaults to the ``PDF_ASK_COMPRESS_DOCSTORE``
+                environment variable.
         """
         self.store_path = Path(store_path)
         self.embeddings = embeddings
+        self.read_only = read_only or is_snapshot(self.store_path)
+        self.snapshot: SnapshotHeader | None = None
+        if compress is None:
+            compress = os.getenv(COMPRESS_DOCSTORE_ENV, "") not in {"", "0", "false"}
+        self.compress = compress
+        self._lock = threading.RLock()
+        self._disk_manifest: dict = {}
         self._vector_store = self._load_vector_store()
+        self.manifest = self._load_manifest()
         self.documents_source = self._get_documents_source()
         self.loader = loader
+        if not self.read_only and not self._disk_manifest.get("generation"):
+            self._save()
 
     def _get_documents_source(self):
         """Get the source of documents.
@@ -67,39 +440,329 @@ class FaissVectorStore:
             dict: A dictionary mapping sources to document IDs.
         """
         documents_source = defaultdict(list)
-        for document_id, document in self._vector_store.docstore._dict.items():
+        docstore = self._vector_store.docstore
+        if isinstance(docstore, compressed_docstore.CompressedDocstore):
+            for document_id in docstore:
+                source = docstore.metadata(document_id)["source"]
+                documents_source[source].append(document_id)
+            return documents_source
+        for document_id, document in docstore._dict.items():
             documents_source[document.metadata["source"]].append(document_id)
         return documents_source
 
     def _load_vector_store(self):
         """Load the vector store from the local path.
 
+        With ``compress``, the chunks of a store saved with another docstore are moved
+        to a ``CompressedDocstore``, which is written on the next save.
+
+        Returns:
+            FAISS: The loaded FAISS vector store.
+        """
+        vector_store = self._read_vector_store()
+        if self.compress and not isinstance(
+            vector_store.docstore, compressed_docstore.CompressedDocstore
+        ):
+            with METRICS.span("compress_docstore"):
+                vector_store.docstore = compressed_docstore.CompressedDocstore(
+                    vector_store.docstore._dict
+                )
+        return vector_store
+
+    def _read_vector_store(self):
+        """Read the vector store from the local path, or build an empty one.
+
+        The store is read again if it was saved by another instance while being read,
+        so the index, the docstore and the manifest match.
+
         Returns:
             FAISS: The loaded FAISS vector store.
         """
-        if self.store_path.exists():
-            return FAISS.load_local(
+        if is_snapshot(self.store_path):
+            with METRICS.span("load_index"):
+                return self._map_snapshot()
+        while True:
+            manifest = read_manifest(self.store_path)
+            try:
+                vector_store = self._read_store_files(
+                    store_files(self.store_path, manifest)
+                )
+            except (FileNotFoundError, RuntimeError):
+                if read_manifest(self.store_path) == manifest:
+                    raise
+                logger.info(f"Vector store {self.store_path} was saved while opened")
+                continue
+            self._disk_manifest = manifest
+            return vector_store
+
+    def _read_store_files(self: Self, files: dict[str, Path]) -> "FAISS":
+        """Read the vector store from the files of a version, or build an empty one.
+
+        Args:
+            files (dict[str, Path]): The index and docstore files of the version.
+
+        Returns:
+            FAISS: The loaded FAISS vector store.
+
+        Raises:
+            FileNotFoundError: If a store opened read-only has no index.
+        """
+        if not files["index"].exists():
+            if self.read_only:
+                msg = f"Vector store {self.store_path} has no index to open read-only"
+                raise FileNotFoundError(msg)
+            return self._build_vector_store()
+        with METRICS.span("load_index"):
+            if self.read_only:
+                return self._map_vector_store(files)
+            return langchain_faiss.FAISS.load_local(
                 self.store_path.as_posix(),
                 self.embeddings,
+                index_name=files["index"].stem,
                 allow_dangerous_deserialization=True,
             )
-        return self._build_vector_store()
+
+    def _map_vector_store(self: Self, files: dict[str, Path]) -> "FAISS":
+        """Load the vector store with a memory-mapped, read-only index.
+
+        Saves never rewrite the files of a store, so the mapped index stays valid
+        while other instances save new versions of the store.
+
+        Args:
+            files (dict[str, Path]): The index and docstore files of the store.
+
+        Returns:
+            FAISS: The loaded FAISS vector store.
+        """
+        # IO_FLAG_MMAP_IFC maps the vectors of flat indexes, older faiss versions only
+        # map the inverted lists of IVF indexes
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        index = faiss.read_index(
+            files["index"].as_posix(), flags | faiss.IO_FLAG_READ_ONLY
+        )
+        # The docstore is written by the stores themselves in their own folder, the
+        # files FAISS.load_local unpickles with allow_dangerous_deserialization
+        with files["docstore"].open("rb") as file:
+            docstore, index_to_docstore_id = pickle.load(file)  # noqa: S301 # nosec
+        return langchain_faiss.FAISS(
+            self.embeddings, index, docstore, index_to_docstore_id
+        )
+
+    def _map_snapshot(self: Self) -> "FAISS":
+        """Load the vector store from a snapshot file, memory-mapping its index.
+
+        The index is the first section of the snapshot, so faiss maps it from the
+        snapshot file itself. The docstore is stored without pickle, so snapshots copied
+        from shared volumes are safe to open. The snapshot is read again if it was
+        replaced by a newer one while being read, so the index, the docstore and the
+        manifest match.
+
+        Returns:
+            FAISS: The loaded FAISS vector store.
+        """
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        while True:
+            with self.store_path.open("rb") as file:
+                header = read_snapshot_header(file.name)
+                index = faiss.read_index(
+                    self.store_path.as_posix(), flags | faiss.IO_FLAG_READ_ONLY
+                )
+                section = header.sections["docstore"]
+                file.seek(section.offset)
+                docstore, index_to_docstore_id = compressed_docstore.load_docstore(
+                    file.read(section.length)
+                )
+                if os.fstat(file.fileno()).st_ino == self.store_path.stat().st_ino:
+                    break
+            logger.info(f"Snapshot {self.store_path} was replaced while opened")
+        self.snapshot = header
+        return langchain_faiss.FAISS(
+            self.embeddings, index, docstore, index_to_docstore_id
+        )
+
+    def _check_writable(self: Self) -> None:
+        """Check the store may be modified.
+
+        Raises:
+            ReadOnlyVectorStoreError: If the store was opened read-only.
+        """
+        if self.read_only:
+            msg = f"Vector store {self.store_path} is opened read-only"
+            raise ReadOnlyVectorStoreError(msg)
 
     def _build_vector_store(self):
-        """Build a new vector store.
+        """Build a new vector store, saved once its manifest is created.
 
         Returns:
             FAISS: The newly built FAISS vector store.
         """
         index = faiss.IndexFlatL2(len(self.embeddings.embed_query("hello world")))
-        vector_store = FAISS(
+        return langchain_faiss.FAISS(
             embedding_function=self.embeddings,
             index=index,
-            docstore=InMemoryDocstore(),
+            docstore=compressed_docstore.CompressedDocstore()
+            if self.compress
+            else in_memory.InMemoryDocstore(),
             index_to_docstore_id={},
         )
-        vector_store.save_local(self.store_path.as_posix())
-        return vector_store
+
+    def _load_manifest(self: Self) -> dict:
+        """Load the manifest of the store and check it matches the embeddings model.
+
+        Stores created before manifests existed get one describing the current model.
+
+        Returns:
+            dict: The manifest of the store.
+
+        Raises:
+            EmbeddingMismatchError: If the store was built with other embeddings.
+        """
+        signature = embedding_signature(self.embeddings)
+        dimension = self._vector_store.index.d
+        if self.snapshot:
+            manifest = self.snapshot.manifest
+        elif self._disk_manifest:
+            manifest = dict(self._disk_manifest)
+        else:
+            manifest = {"embedder": signature, "dimension": dimension}
+            if not self.read_only and has_index(self.store_path):
+                manifest["generation"] = uuid.uuid4().hex
+                _write_manifest(self.store_path, manifest)
+                self._disk_manifest = dict(manifest)
+            return manifest
+        if manifest["embedder"] != signature or manifest["dimension"] != dimension:
+            msg = (
+                f"Vector store {self.store_path} was built with {manifest['embedder']} "
+                f"({manifest['dimension']} dimensions), not with {signature}"
+            )
+            raise EmbeddingMismatchError(msg)
+        return manifest
+
+    def _save(self: Self) -> None:
+        """Save the store as a new version and switch the manifest to it.
+
+        Every save gets a new generation, which identifies the content of the store,
+        and writes the index and the docstore under a new name. The files are only
+        used once the manifest pointing to them replaces the previous one, so a crash
+        or another process opening the store sees either the previous version or the
+        new one, and files memory-mapped by readers are never rewritten.
+
+        Raises:
+            StaleVectorStoreError: If another instance saved the store since this one
+                loaded it.
+        """
+        with self._lock, store_writer_lock(self.store_path):
+            previous = read_manifest(self.store_path)
+            if previous.get("generation") not in {
+                None,
+                self._disk_manifest.get("generation"),
+            }:
+                msg = (
+                    f"Vector store {self.store_path} was saved by another instance, "
+                    "refresh it before modifying it"
+                )
+                raise StaleVectorStoreError(msg)
+            generation = uuid.uuid4().hex
+            self.manifest["generation"] = generation
+            self.manifest["index"] = f"index-{generation}"
+            with METRICS.span("save"):
+                self._vector_store.save_local(
+                    self.store_path.as_posix(), index_name=self.manifest["index"]
+                )
+                _write_manifest(self.store_path, self.manifest)
+            self._disk_manifest = dict(self.manifest)
+            _remove_files(self.store_path, previous, keep=self.manifest)
+        if isinstance(
+            docstore := self._vector_store.docstore,
+            compressed_docstore.CompressedDocstore,
+        ):
+            stats = docstore.stats()
+            logger.info(
+                f"Saved {stats['documents']} chunks of {self.store_path} compressed "
+                f"{stats['compression_ratio']:.1f}x in {stats['blocks']} blocks"
+            )
+
+    def refresh(self: Self) -> bool:
+        """Reload the store if another instance saved it since it was loaded.
+
+        Returns:
+            bool: Whether the store was reloaded.
+        """
+        if self.snapshot:
+            return False
+        with self._lock:
+            if read_manifest(self.store_path).get("generation") in {
+                None,
+                self._disk_manifest.get("generation"),
+            }:
+                return False
+            logger.info(f"Reloading vector store {self.store_path} saved elsewhere")
+            self._reload()
+        return True
+
+    def _reload(self: Self) -> None:
+        """Read the index, the docstore and the manifest of the store again."""
+        self._vector_store = self._load_vector_store()
+        self.manifest = self._load_manifest()
+        self.documents_source = self._get_documents_source()
+
+    @property
+    def file_hashes(self: Self) -> dict[str, str]:
+        """The SHA-256 of the ingested files, by source."""
+        return self.manifest.setdefault("files", {})
+
+    @property
+    def generation(self: Self) -> str:
+        """A token changing whenever the content of the store changes."""
+        return self.manifest.setdefault("generation", uuid.uuid4().hex)
+
+    def replace_index(
+        self: Self,
+        source_path: Path,
+        embeddings: Embeddings,
+        backup_path: Path | None = None,
+    ) -> None:
+        """Switch the store to the version saved in another store folder.
+
+        The files are moved into the store folder and the manifest pointing to them
+        replaces the previous one in a single rename, so a crash or another process
+        opening the store sees either the previous version or the new one. The
+        in-memory index is then swapped in a single assignment, so concurrent searches
+        use either the old or the new index.
+
+        Args:
+            source_path (Path): The store folder holding the new version.
+            embeddings (Embeddings): The embeddings model of the new index.
+            backup_path (Path, optional): A store folder to copy the current version to.
+        """
+        with self._lock, store_writer_lock(self.store_path):
+            if backup_path:
+                manifest = read_manifest(self.store_path)
+                backup_path.mkdir(parents=True, exist_ok=True)
+                backup_files = store_files(backup_path, manifest)
+                for section, path in store_files(self.store_path, manifest).items():
+                    shutil.copy2(path, backup_files[section])
+                _write_manifest(backup_path, manifest)
+            swap_store_files(source_path, self.store_path)
+            self.embeddings = embeddings
+            self._reload()
+
+    def export_snapshot(self: Self, snapshot_path: str | Path) -> SnapshotHeader:
+        """Export the store to a portable, read-only snapshot file.
+
+        The store is not saved during the export. A store opened from a snapshot is
+        copied to the new path.
+
+        Args:
+            snapshot_path (str | Path): The path of the snapshot file.
+
+        Returns:
+            SnapshotHeader: The header of the snapshot.
+        """
+        with self._lock:
+            if self.snapshot:
+                return install_snapshot(self.store_path, snapshot_path)
+            return export_snapshot(self.store_path, snapshot_path)
 
     def list_documents(self):
         """List all documents in the vector store.
@@ -107,7 +770,21 @@ class FaissVectorStore:
         Returns:
             list: A list of document IDs.
         """
-        return list(self._vector_store.docstore._dict)
+        docstore = self._vector_store.docstore
+        if isinstance(docstore, compressed_docstore.CompressedDocstore):
+            return list(docstore)
+        return list(docstore._dict)
+
+    def get_documents(self: Self, ids: list[str]) -> list[Document]:
+        """Get documents by their IDs.
+
+        Args:
+            ids (list[str]): The document IDs.
+
+        Returns:
+            list[Document]: The documents, in the order of the IDs.
+        """
+        return [self._vector_store.docstore.search(_id) for _id in ids]
 
     def list_sources(self):
         """List all sources in the vector store.
@@ -117,23 +794,97 @@ class FaissVectorStore:
         """
         return list(self.documents_source)
 
-    def add_file(self: Self, file_path: str, force: bool = False) -> None:
+    @profiled("add_file")
+    def add_file(
+        self: Self,
+        file_path: str,
+        force: bool = False,
+        progress: ProgressCallback | None = None,
+        content_hash: str | None = None,
+    ) -> None:
         """Add a file to the vector store.
 
+        The chunks of the file are embedded and indexed batch by batch as the file is
+        parsed, so memory does not grow with the size of the file. The previous version
+        of its chunks is only removed once all new chunks are indexed, and a file that
+        fails to parse leaves the store unchanged. The content hash of each file is kept
+        in the manifest so callers can skip uploads already in the store with
+        :func:`stored_file_hash`; ``force`` always ingests the file again, e.g. with
+        another splitter.
+
         Args:
             file_path (str): Path to the file.
             force (bool): Force overwrite if file exists.
+            progress (ProgressCallback, optional): Called with the stage (``split``,
+                ``embedding`` after each batch, then ``indexed``), the number of
+                processed chunks and the number of chunks split so far.
+            content_hash (str, optional): The SHA-256 of the file, computed if not given
+                and the file is on disk.
         """
+        self._check_writable()
+        self.refresh()
         document_exists = file_path in self.list_sources()
-        if document_exists:
-            if force:
+        if document_exists and not force:
+            msg = f"File {file_path} already exists in the vector store. Use force=True to overwrite it."
+            raise FileExistsError(msg)
+        if content_hash is None and Path(file_path).is_file():
+            content_hash = hash_file(file_path)
+        self._add_documents(
+            documents=self.loader.load_document(file_path=file_path),
+            progress=progress,
+            source=file_path,
+            content_hash=content_hash,
+        )
+
+    def add_files(self: Self, file_paths: list[str], force: bool = False) -> None:
+        """Add several files to the vector store and save it once.
+
+        Args:
+            file_paths (list[str]): Paths to the files.
+            force (bool): Force overwrite if a file exists.
+        """
+        self._check_writable()
+        self.refresh()
+        documents = []
+        for file_path in file_paths:
+            if file_path in self.list_sources():
+                if not force:
+                    msg = f"File {file_path} already exists in the vector store. Use force=True to overwrite it."
+                    raise FileExistsError(msg)
                 self._remove_document(file_path)
-            else:
-                msg = f"File {file_path} already exists in the vector store. Use force=True to overwrite it."
-                raise FileExistsError(msg)
-        documents = self.loader.load_document(file_path=file_path)
+            documents.extend(self.loader.load_document(file_path=file_path))
+            if Path(file_path).is_file():
+                self.file_hashes[file_path] = hash_file(file_path)
         self._add_documents(documents=documents)
 
+    def merge(self: Self, other: "FaissVectorStore", save: bool = True) -> None:
+        """Merge the index and documents of another vector store into this one.
+
+        Both stores must use embeddings of the same dimension.
+
+        Args:
+            other (FaissVectorStore): The vector store to merge.
+            save (bool): Whether to save the store afterwards.
+
+        Raises:
+            ValueError: If the dimensions of the two indexes differ.
+            ReadOnlyVectorStoreError: If the store was opened read-only.
+        """
+        if other._vector_store.index.d != self._vector_store.index.d:
+            msg = (
+                f"Cannot merge an index of dimension {other._vector_store.index.d} "
+                f"into an index of dimension {self._vector_store.index.d}"
+            )
+            raise ValueError(msg)
+        self._check_writable()
+        with self._lock:
+            self._vector_store.merge_from(other._vector_store)
+            for source, ids in other.documents_source.items():
+                self.documents_source[source].extend(ids)
+            self.file_hashes.update(other.file_hashes)
+            if save:
+                self._save()
+
     def _remove_document(self, file_path):
         """Remove a document from the vector store.
 
@@ -141,19 +892,99 @@ class FaissVectorStore:
             file_path (str): Path to the file.
         """
         ids = self.documents_source.pop(file_path)
+        self.file_hashes.pop(file_path, None)
         self._vector_store.delete(ids=ids)
 
-    def _add_documents(self: Self, documents: list[Document]) -> None:
-        """Add documents to the vector store.
+    def _add_documents(
+        self: Self,
+        documents: Iterable[Document],
+        ids: list[str] | None = None,
+        progress: ProgressCallback | None = None,
+        source: str | None = None,
+        content_hash: str | None = None,
+    ) -> None:
+        """Add documents to the vector store and save it.
+
+        The documents are consumed, embedded and indexed ``EMBED_BATCH_SIZE`` at a
+        time. If reading or embedding them fails, the chunks already indexed are removed
+        again and the store is left unchanged.
 
         Args:
-            documents (list[Document]): List of documents to add.
+            documents (Iterable[Document]): The documents to add, possibly lazily read.
+            ids (list[str], optional): IDs of the documents, generated if not given.
+            progress (ProgressCallback, optional): Called after each split and embedded
+                batch and once the documents are indexed.
+            source (str, optional): The file the documents are read from, whose
+                previous chunks are removed once the documents are indexed.
+            content_hash (str, optional): The SHA-256 of the file, recorded in the
+                manifest.
         """
-        ids = self._vector_store.add_documents(
-            documents=documents, embeddings=self.embeddings
-        )
-        self._update_documents_source(ids, documents)
-        self._vector_store.save_local(self.store_path.as_posix())
+        documents = iter(documents)
+        added_ids: list[str] = []
+        split = 0
+        try:
+            while batch := list(itertools.islice(documents, EMBED_BATCH_SIZE)):
+                split += len(batch)
+                if progress:
+                    progress("split", split, split)
+                texts = [document.page_content for document in batch]
+                with METRICS.span("embed"):
+                    embeddings = self.embeddings.embed_documents(texts)
+                batch_ids = ids[len(added_ids) : split] if ids else None
+                with self._lock, METRICS.span("index"):
+                    batch_ids = self._vector_store.add_embeddings(
+                        zip(texts, embeddings, strict=True),
+                        metadatas=[document.metadata for document in batch],
+                        ids=batch_ids,
+                    )
+                    added_ids.extend(batch_ids)
+                    self._update_documents_source(batch_ids, batch)
+                if progress:
+                    progress("embedding", len(added_ids), split)
+        except BaseException:
+            if added_ids:
+                self.remove_documents(added_ids, save=False)
+            raise
+        with self._lock:
+            if source is not None:
+                new_ids = set(added_ids)
+                self.remove_documents(
+                    [
+                        _id
+                        for _id in self.documents_source.get(source, [])
+                        if _id not in new_ids
+                    ],
+                    save=False,
+                )
+                self.file_hashes.pop(source, None)
+                if content_hash:
+                    self.file_hashes[source] = content_hash
+            self._save()
+        METRICS.increment("embedded_chunks_total", len(added_ids))
+        if progress:
+            progress("indexed", len(added_ids), len(added_ids))
+
+    def remove_documents(self: Self, ids: list[str], save: bool = True) -> None:
+        """Remove documents from the vector store by their IDs.
+
+        Args:
+            ids (list[str]): IDs of the documents to remove.
+            save (bool): Whether to save the store afterwards.
+        """
+        with self._lock:
+            removed = set(ids)
+            if ids:
+                self._vector_store.delete(ids=ids)
+            for source in list(self.documents_source):
+                kept = [
+                    _id for _id in self.documents_source[source] if _id not in removed
+                ]
+                if kept:
+                    self.documents_source[source] = kept
+                else:
+                    del self.documents_source[source]
+            if save:
+                self._save()
 
     def _update_documents_source(
         self: Self, ids: list[str], documents: list[Document]
@@ -169,25 +1000,211 @@ class FaissVectorStore:
             if _id not in self.documents_source[source]:
                 self.documents_source[source].append(_id)
 
-    def similarity_search(self: Self, query: str, top_k: int = 10) -> list[dict]:
+    def similarity_search(
+        self: Self, query: str, top_k: int = 10, mmr_lambda: float | None = None
+    ) -> list[dict]:
         """Perform a similarity search on the vector store.
 
         Args:
             query (str): The search query.
             top_k (int): Number of top results to return.
+            mmr_lambda (float, optional): The diversity factor of a maximal marginal
+                relevance re-ranking, from 0 for the most diverse results to 1 for a
+                ranking by relevance only. No re-ranking if None.
 
         Returns:
             list[dict]: List of search results.
         """
-        if len(self.documents_source) == 0:
-            msg = "No documents in the vector store."
+        self._check_not_empty()
+        return self.similarity_search_by_vector(
+            self.embed_query(query), top_k, mmr_lambda
+        )
+
+    def embed_query(self: Self, query: str) -> list[float]:
+        """Embed a query with the embeddings model of the vector store.
+
+        Args:
+            query (str): The query to embed.
+
+        Returns:
+            list[float]: The embedding of the query.
+        """
+        with METRICS.span("embed_query"):
+            embedding = self._vector_store.embedding_function.embed_query(query)
+        METRICS.increment("embedded_queries_total")
+        return embedding
+
+    def similarity_search_by_vector(
+        self: Self,
+        embedding: list[float],
+        top_k: int = 10,
+        mmr_lambda: float | None = None,
+    ) -> list[dict]:
+        """Perform a similarity search with an already embedded query.
+
+        Args:
+            embedding (list[float]): The embedding of the query.
+            top_k (int): Number of top results to return.
+            mmr_lambda (float, optional): The diversity factor of a maximal marginal
+                relevance re-ranking, from 0 for the most diverse results to 1 for a
+                ranking by relevance only. No re-ranking if None.
+
+        Returns:
+            list[dict]: List of search results.
+        """
+        self._check_not_empty()
+        return self._search_vectors([embedding], top_k, mmr_lambda)[0]
+
+    def batch_similarity_search(
+        self: Self, queries: list[str], top_k: int = 10, mmr_lambda: float | None = None
+    ) -> list[list[dict]]:
+        """Perform a similarity search for several queries at once.
+
+        The queries are embedded with a single ``embed_documents`` call and searched
+        with a single FAISS search over the matrix of their embeddings.
+
+        Args:
+            queries (list[str]): The search queries.
+            top_k (int): Number of top results to return per query.
+            mmr_lambda (float, optional): The diversity factor of a maximal marginal
+                relevance re-ranking, from 0 for the most diverse results to 1 for a
+                ranking by relevance only. No re-ranking if None.
+
+        Returns:
+            list[list[dict]]: List of search results of each query.
+        """
+        self._check_not_empty()
+        with METRICS.span("embed_query"):
+            embeddings = self._vector_store.embedding_function.embed_documents(queries)
+        METRICS.increment("embedded_queries_total", len(queries))
+        return self._search_vectors(embeddings, top_k, mmr_lambda)
+
+    async def asimilarity_search(
+        self: Self, query: str, top_k: int = 10, mmr_lambda: float | None = None
+    ) -> list[dict]:
+        """Perform a similarity search on the vector store asynchronously.
+
+        The query is embedded with the async API of the embeddings model and the FAISS
+        search runs in the default executor, so the event loop is never blocked.
+
+        Args:
+            query (str): The search query.
+            top_k (int): Number of top results to return.
+            mmr_lambda (float, optional): The diversity factor of a maximal marginal
+                relevance re-ranking, from 0 for the most diverse results to 1 for a
+                ranking by relevance only. No re-ranking if None.
+
+        Returns:
+            list[dict]: List of search results.
+        """
+        self._check_not_empty()
+        with METRICS.span("embed_query"):
+            embedding = await self._vector_store.embedding_function.aembed_query(query)
+        METRICS.increment("embedded_queries_total")
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.similarity_search_by_vector, embedding, top_k, mmr_lambda
+        )
+
+    def _search_vectors(
+        self: Self,
+        embeddings: list[list[float]],
+        top_k: int,
+        mmr_lambda: float | None = None,
+    ) -> list[list[dict]]:
+        """Search the index with a matrix of embeddings and look up the documents.
+
+        With a diversity factor, ``MMR_FETCH_FACTOR`` times more candidates are
+        searched and their vectors reconstructed from the index in the same call, so
+        they are not embedded again, before the maximal marginal relevance selection.
+
+        Args:
+            embeddings (list[list[float]]): The embeddings of the queries.
+            top_k (int): Number of top results to return per query.
+            mmr_lambda (float, optional): The diversity factor of a maximal marginal
+                relevance re-ranking, no re-ranking if None.
+
+        Returns:
+            list[list[dict]]: List of search results of each query.
+
+        Raises:
+            ValueError: If the diversity factor is not between 0 and 1.
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if mmr_lambda is not None and not 0 <= mmr_lambda <= 1:
+            msg = f"The diversity factor must be between 0 and 1, not {mmr_lambda}"
             raise ValueError(msg)
-        documents = self._vector_store.similarity_search(query, top_k)
+        # the lock is held from the search to the lookup: removals compact the index,
+        # so the positions found by a search only match the index they were found in
+        with self._lock:
+            vector_store = self._vector_store
+            if vector_store._normalize_L2:
+                faiss.normalize_L2(vectors)
+            if mmr_lambda is None:
+                with METRICS.span("faiss_search"):
+                    _, indices = vector_store.index.search(vectors, top_k)
+            else:
+                with METRICS.span("faiss_search"):
+                    _, candidates, candidate_vectors = (
+                        vector_store.index.search_and_reconstruct(
+                            vectors, top_k * MMR_FETCH_FACTOR
+                        )
+                    )
+                with METRICS.span("mmr"):
+                    selected = maximal_marginal_relevance(
+                        vectors, candidate_vectors, candidates != -1, top_k, mmr_lambda
+                    )
+                    indices = np.where(
+                        selected != -1,
+                        np.take_along_axis(candidates, np.maximum(selected, 0), axis=1),
+                        -1,
+                    )
+            with METRICS.span("docstore_lookup"):
+                documents = [
+                    self._look_up_documents(vector_store, row) for row in indices
+                ]
         return [
-            self._create_document_result(idx, document)
-            for idx, document in enumerate(documents)
+            [
+                self._create_document_result(idx, document)
+                for idx, document in enumerate(row)
+            ]
+            for row in documents
         ]
 
+    @staticmethod
+    def _look_up_documents(
+        vector_store: "FAISS", positions: np.ndarray
+    ) -> list[Document]:
+        """Look up the documents at positions of the index.
+
+        The caller holds the lock of the store since the search, so the positions
+        still match the index. Positions without a stored document are skipped.
+
+        Args:
+            vector_store (FAISS): The vector store that was searched.
+            positions (np.ndarray): The positions found by the search, -1 for none.
+
+        Returns:
+            list[Document]: The documents, in the order of the positions.
+        """
+        documents = (
+            vector_store.docstore.search(docstore_id)
+            for docstore_id in map(
+                vector_store.index_to_docstore_id.get, positions[positions != -1]
+            )
+            if docstore_id is not None
+        )
+        return [document for document in documents if isinstance(document, Document)]
+
+    def _check_not_empty(self: Self) -> None:
+        """Check the vector store holds documents.
+
+        Raises:
+            ValueError: If the vector store is empty.
+        """
+        if len(self.documents_source) == 0:
+            msg = "No documents in the vector store."
+            raise ValueError(msg)
+
     @staticmethod
     def _create_document_result(idx: int, document: Document) -> dict:
         """Create a result dictionary for a document.
@@ -197,9 +1214,13 @@ class FaissVectorStore:
             document (Document): The document object.
 
         Returns:
-            dict: A dictionary containing document content and ID.
+            dict: A dictionary containing document content, metadata and ID.
         """
-        return {"content": {document.page_content}, "id": idx}
+        return {
+            "content": document.page_content,
+            "metadata": document.metadata,
+            "id": idx,
+        }
 
 
 class VectorStoreNotAllowedError(Exception):
@@ -0,0 +1,420 @@
+from typing import Self
+
+import functools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from pdf_ask.backend.metrics import METRICS
+from pdf_ask.backend.snapshot import store_files
+from pdf_ask.backend.store_cache import StoreCache
+from pdf_ask.backend.uploads import CHUNK_SIZE
+from pdf_ask.backend.vector_store import read_manifest
+
+logger = logging.getLogger(__name__)
+
+USAGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS store_usage (
+    store_path TEXT NOT NULL,
+    embedder_name TEXT NOT NULL,
+    splitter_name TEXT NOT NULL,
+    uses INTEGER NOT NULL DEFAULT 0,
+    last_used_at REAL NOT NULL,
+    PRIMARY KEY (store_path, embedder_name, splitter_name)
+);
+CREATE TABLE IF NOT EXISTS recent_queries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    store_path TEXT NOT NULL,
+    query TEXT NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recent_queries_store ON recent_queries (store_path, id);
+"""
+
+
+@dataclass(frozen=True)
+class StoreUsage:
+    store_path: str
+    embedder_name: str
+    splitter_name: str
+    last_used_at: float = 0.0
+
+
+@dataclass(frozen=True)
+class WarmupPlan:
+    """The stores opened before serving the first request.
+
+    Attributes:
+        stores: The paths of the stores always warmed up.
+        recent: The number of most recently used stores of the usage log warmed up.
+        queries: The number of recent queries of each store replayed.
+    """
+
+    stores: tuple[str, ...] = ()
+    recent: int = 0
+    queries: int = 0
+
+    @classmethod
+    def from_env(cls: type[Self]) -> Self:
+        """Read the plan from the ``PDF_ASK_WARMUP_*`` environment variables.
+
+        ``PDF_ASK_WARMUP_STORES`` is a comma-separated list of store paths,
+        ``PDF_ASK_WARMUP_RECENT`` and ``PDF_ASK_WARMUP_QUERIES`` are numbers.
+
+        Returns:
+            WarmupPlan: The plan, empty if none of the variables is set.
+        """
+        stores = os.getenv("PDF_ASK_WARMUP_STORES", "")
+        return cls(
+            stores=tuple(store for store in stores.split(",") if store),
+            recent=int(os.getenv("PDF_ASK_WARMUP_RECENT", "0")),
+            queries=int(os.getenv("PDF_ASK_WARMUP_QUERIES", "0")),
+        )
+
+
+class StoreUsageLog:
+    """Small SQLite log of the stores used recently and of their last queries.
+
+    The log outlives the process, so the stores used before a deploy or a restart are
+    known when warming up the next process. Only the last ``max_queries`` queries of
+    each store are kept.
+
+    Uses are buffered in memory and written by a background thread every
+    ``flush_interval`` seconds, in one transaction, so serving a request does not wait
+    for a SQLite write. Reading the log writes the buffered uses first. The uses of
+    the last interval are lost if the process is killed.
+
+    Attributes:
+        db_path: The path to the SQLite database of the log.
+        max_queries: The number of queries kept per store.
+        flush_interval: The number of seconds between two writes of the buffered uses.
+    """
+
+    def __init__(
+        self: Self, db_path: str, max_queries: int = 20, flush_interval: float = 1.0
+    ) -> None:
+        """Initialize the log, creating its tables if needed.
+
+        Args:
+            db_path: The path to the SQLite database of the log.
+            max_queries: The number of queries kept per store.
+            flush_interval: The number of seconds between two writes of the buffered
+                uses.
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_queries = max_queries
+        self.flush_interval = flush_interval
+        self._pending: list[tuple[str, str, str, list[str], float]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._writer: threading.Thread | None = None
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(USAGE_SCHEMA)
+
+    def record(
+        self: Self,
+        store_path: str,
+        embedder_name: str,
+        splitter_name: str,
+        queries: Iterable[str] = (),
+    ) -> None:
+        """Record a use of a store, written to the log in the background.
+
+        Args:
+            store_path: The path to the vector store folder.
+            embedder_name: The name of the embedder of the store.
+            splitter_name: The name of the text splitter.
+            queries: The queries searched in the store.
+        """
+        use = (
+            Path(store_path).as_posix(),
+            embedder_name,
+            splitter_name,
+            list(queries),
+            time.time(),
+        )
+        with self._lock:
+            self._pending.append(use)
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_pending, name="usage-log", daemon=True
+                )
+                self._writer.start()
+
+    def flush(self: Self) -> None:
+        """Write the buffered uses to the log in one transaction."""
+        with self._flush_lock:
+            with self._lock:
+                uses, self._pending = self._pending, []
+            if not uses:
+                return
+            stores: dict[tuple[str, str, str], list[float]] = {}
+            for store_path, embedder_name, splitter_name, _, used_at in uses:
+                stores.setdefault(
+                    (store_path, embedder_name, splitter_name), []
+                ).append(used_at)
+            with self._connect() as connection:
+                connection.executemany(
+                    "INSERT INTO store_usage VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (store_path, embedder_name, splitter_name) "
+                    "DO UPDATE SET uses = uses + ?, last_used_at = ?",
+                    [
+                        (*store, len(times), max(times), len(times), max(times))
+                        for store, times in stores.items()
+                    ],
+                )
+                connection.executemany(
+                    "INSERT INTO recent_queries (store_path, query, used_at) "
+                    "VALUES (?, ?, ?)",
+                    [
+                        (store_path, query, used_at)
+                        for store_path, _, _, queries, used_at in uses
+                        for query in queries
+                    ],
+                )
+                connection.executemany(
+                    "DELETE FROM recent_queries WHERE store_path = ? AND id NOT IN "
+                    "(SELECT id FROM recent_queries WHERE store_path = ? "
+                    "ORDER BY id DESC LIMIT ?)",
+                    [
+                        (store_path, store_path, self.max_queries)
+                        for store_path in {store_path for store_path, *_ in uses}
+                    ],
+                )
+
+    def recent_stores(
+        self: Self, limit: int, embedder_name: str | None = None
+    ) -> list[StoreUsage]:
+        """Get the most recently used stores.
+
+        Args:
+            limit: The maximal number of stores.
+            embedder_name: Only the stores used with this embedder, if given.
+
+        Returns:
+            list[StoreUsage]: The stores, most recently used first.
+        """
+        self.flush()
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT store_path, embedder_name, splitter_name, last_used_at "
+                "FROM store_usage WHERE ? IS NULL OR embedder_name = ? "
+                "ORDER BY last_used_at DESC LIMIT ?",
+                (embedder_name, embedder_name, limit),
+            ).fetchall()
+        return [StoreUsage(*row) for row in rows]
+
+    def recent_queries(self: Self, store_path: str, limit: int) -> list[str]:
+        """Get the last distinct queries of a store.
+
+        Args:
+            store_path: The path to the vector store folder.
+            limit: The maximal number of queries.
+
+        Returns:
+            list[str]: The queries, most recent first.
+        """
+        self.flush()
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT query FROM recent_queries WHERE store_path = ? "
+                "GROUP BY query ORDER BY MAX(id) DESC LIMIT ?",
+                (Path(store_path).as_posix(), limit),
+            ).fetchall()
+        return [query for (query,) in rows]
+
+    def _write_pending(self: Self) -> None:
+        """Write the buffered uses every ``flush_interval`` seconds."""
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error:
+                logger.exception("Failed to write the store usage log")
+
+    @contextmanager
+    def _connect(self: Self) -> Iterator[sqlite3.Connection]:
+        """Open a connection to the log database for a transaction.
+
+        The transaction is committed, or rolled back on error, and the connection is
+        closed on exit.
+
+        Yields:
+            sqlite3.Connection: The connection.
+        """
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+
+class StoreWarmer:
+    """Open vector stores in a store cache before the first request needs them.
+
+    Warming a store opens it in the cache, which reads its index, unpickles its
+    docstore and creates its embedder, then reads its index file through the OS page
+    cache and replays its recent queries, which also opens the connections of the
+    embedder client. :attr:`ready` is set once every store was warmed up, or failed
+    to, and serves as the readiness signal of the process.
+
+    Attributes:
+        store_cache: The cache the stores are opened in.
+        usage_log: The log of the recently used stores and queries, if any.
+        ready: Set when the warm-up finished.
+    """
+
+    def __init__(
+        self: Self, store_cache: StoreCache, usage_log: StoreUsageLog | None = None
+    ) -> None:
+        """Initialize the warmer, ready until a warm-up starts.
+
+        Args:
+            store_cache: The cache the stores are opened in.
+            usage_log: The log of the recently used stores and queries, if any.
+        """
+        self.store_cache = store_cache
+        self.usage_log = usage_log
+        self.ready = threading.Event()
+        self.ready.set()
+        self.total = 0
+        self.warmed = 0
+        self.failed: list[str] = []
+
+    def targets(
+        self: Self, plan: WarmupPlan, embedder_name: str, splitter_name: str
+    ) -> list[StoreUsage]:
+        """List the stores of a plan.
+
+        Args:
+            plan: The warm-up plan.
+            embedder_name: The name of the embedder of the listed stores, and the
+                only embedder of the recently used stores warmed up.
+            splitter_name: The name of the text splitter of the listed stores.
+
+        Returns:
+            list[StoreUsage]: The stores, without duplicates.
+        """
+        stores = [
+            StoreUsage(Path(store).as_posix(), embedder_name, splitter_name)
+            for store in plan.stores
+        ]
+        if plan.recent and self.usage_log:
+            stores += self.usage_log.recent_stores(plan.recent, embedder_name)
+        unique: dict[str, StoreUsage] = {}
+        for store in stores:
+            unique.setdefault(store.store_path, store)
+        return list(unique.values())
+
+    def warm_up(self: Self, stores: list[StoreUsage], queries: int = 0) -> None:
+        """Open stores in the cache and replay their recent queries.
+
+        A store failing to open is logged and skipped.
+
+        Args:
+            stores: The stores to warm up.
+            queries: The number of recent queries of each store replayed.
+        """
+        self.ready.clear()
+        self.total, self.warmed, self.failed = len(stores), 0, []
+        started_at = time.perf_counter()
+        try:
+            for usage in stores:
+                try:
+                    self._warm_up_store(usage, queries)
+                    self.warmed += 1
+                except Exception:
+                    logger.exception(f"Could not warm up store {usage.store_path}")
+                    self.failed.append(usage.store_path)
+        finally:
+            seconds = time.perf_counter() - started_at
+            METRICS.observe("warmup_seconds", seconds)
+            logger.info(
+                f"Warmed up {self.warmed} of {self.total} stores in {seconds:.2f}s"
+            )
+            self.ready.set()
+
+    def start(
+        self: Self, plan: WarmupPlan, embedder_name: str, splitter_name: str
+    ) -> threading.Thread:
+        """Warm up the stores of a plan in a background thread.
+
+        Args:
+            plan: The warm-up plan.
+            embedder_name: The name of the embedder of the listed stores.
+            splitter_name: The name of the text splitter of the listed stores.
+
+        Returns:
+            threading.Thread: The started thread.
+        """
+        self.ready.clear()
+        thread = threading.Thread(
+            target=lambda: self.warm_up(
+                self.targets(plan, embedder_name, splitter_name), plan.queries
+            ),
+            name="warmup",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
+    def status(self: Self) -> dict:
+        """Get the progress of the warm-up.
+
+        Returns:
+            dict: Whether the process is ready, and the warmed and failed stores.
+        """
+        return {
+            "ready": self.ready.is_set(),
+            "warmed": self.warmed,
+            "total": self.total,
+            "failed": list(self.failed),
+        }
+
+    def _warm_up_store(self: Self, usage: StoreUsage, queries: int) -> None:
+        """Open a store, read its index and replay its recent queries.
+
+        The index of a snapshot is the snapshot file itself.
+
+        Args:
+            usage: The store.
+            queries: The number of recent queries replayed.
+        """
+        index_path = Path(usage.store_path)
+        if not index_path.is_file():
+            index_path = store_files(index_path, read_manifest(index_path))["index"]
+        if not index_path.is_file():
+            msg = f"No index in {usage.store_path}"
+            raise FileNotFoundError(msg)
+        store = self.store_cache.get(
+            usage.store_path, usage.embedder_name, usage.splitter_name
+        )
+        with index_path.open("rb") as file:
+            while file.read(CHUNK_SIZE):
+                pass
+        if queries and self.usage_log:
+            for query in self.usage_log.recent_queries(usage.store_path, queries):
+                store.similarity_search(query)
+        METRICS.increment("warmed_stores_total")
+
+
+@functools.cache
+def get_usage_log() -> StoreUsageLog:
+    """Get the store usage log of the process.
+
+    The database path is read from the ``PDF_ASK_USAGE_DB`` environment variable.
+
+    Returns:
+        StoreUsageLog: The usage log.
+    """
+    return StoreUsageLog(os.getenv("PDF_ASK_USAGE_DB", "resources/.usage.sqlite3"))
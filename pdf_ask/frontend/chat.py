@@ -1,15 +1,33 @@
 import logging
+import sqlite3
+from pathlib import Path
 
 import streamlit as st
 from langchain_core.language_models.chat_models import BaseChatModel
 
+from pdf_ask.backend.cache import SemanticAnswerCache
+from pdf_ask.backend.history import ChatHistoryManager
 from pdf_ask.backend.llm import ChatMessage, Role, SimpleRAGChatBot
+from pdf_ask.backend.vector_store import EmbeddingMismatchError
+from pdf_ask.backend.warmup import get_usage_log
 from pdf_ask.frontend.documents import create_vector_store
-from pdf_ask.frontend.session_state import ChatEnum, VectorStorEnum
-from pdf_ask.frontend.tooltip import replace_text_with_tooltips
+from pdf_ask.frontend.session_state import ChatEnum, DocumentsEnum, VectorStorEnum
+from pdf_ask.frontend.tooltip import TOOLTIP_CSS, replace_text_with_tooltips
 
 logger = logging.getLogger(__name__)
 
+MAX_DISPLAYED_MESSAGES = 20
+
+
+@st.cache_resource
+def get_answer_cache() -> SemanticAnswerCache:
+    """Get the answer cache shared by all sessions.
+
+    Returns:
+        SemanticAnswerCache: The process-wide answer cache.
+    """
+    return SemanticAnswerCache()
+
 
 def init_chat_session_state():
     """Initialize the chat session state by setting up the chat history."""
@@ -25,9 +43,28 @@ def clear_chat_history():
     st.session_state[ChatEnum.CHAT_HISTORY.value] = [
         ChatMessage(Role.BOT, "How can I help you? 🤖")
     ]
+    st.session_state.pop(ChatEnum.HISTORY_MANAGER.value, None)
     logger.info("Chat history cleared.")
 
 
+def get_history_manager(llm: BaseChatModel) -> ChatHistoryManager:
+    """Get the chat history manager of the session, keeping its summary across reruns.
+
+    Args:
+        llm (BaseChatModel): The language model used to summarize older messages, which
+            replaces the one of the manager when another model is selected.
+
+    Returns:
+        ChatHistoryManager: The history manager of the session.
+    """
+    if ChatEnum.HISTORY_MANAGER.value not in st.session_state:
+        st.session_state[ChatEnum.HISTORY_MANAGER.value] = ChatHistoryManager(llm)
+    manager = st.session_state[ChatEnum.HISTORY_MANAGER.value]
+    if manager.llm is not llm:
+        manager.llm = llm
+    return manager
+
+
 def add_message(role: Role, message: str, documents: list | None = None) -> ChatMessage:
     """Add a message to the chat history and return the ChatMessage object.
 
@@ -46,11 +83,40 @@ def add_message(role: Role, message: str, documents: list | None = None) -> Chat
 
 
 def display_chat_history():
-    """Display the chat history from the session state."""
-    for message in st.session_state[ChatEnum.CHAT_HISTORY.value]:
+    """Display the chat history from the session state.
+
+    Only the last ``MAX_DISPLAYED_MESSAGES`` messages are displayed unless the user
+    expands the earlier ones, so the cost of a rerun does not grow with the chat.
+    """
+    st.markdown(TOOLTIP_CSS, unsafe_allow_html=True)
+    messages = st.session_state[ChatEnum.CHAT_HISTORY.value]
+    hidden = len(messages) - MAX_DISPLAYED_MESSAGES
+    if hidden > 0 and not st.toggle(
+        f"Show {hidden} earlier messages", key=ChatEnum.SHOW_EARLIER_MESSAGES.value
+    ):
+        messages = messages[hidden:]
+    for message in messages:
         _display_message(message)
 
 
+def _message_html(message: ChatMessage) -> str:
+    """Render a chat message once, with tooltips on its citations.
+
+    Args:
+        message (ChatMessage): The chat message to render.
+
+    Returns:
+        str: The rendered message, cached on the message.
+    """
+    if message.html is None:
+        message.html = (
+            replace_text_with_tooltips(message.text, message.documents)
+            if message.documents
+            else message.text
+        )
+    return message.html
+
+
 def _display_message(message: ChatMessage) -> None:
     """Display a single chat message.
 
@@ -58,27 +124,51 @@ def _display_message(message: ChatMessage) -> None:
         message (ChatMessage): The chat message to display.
     """
     with st.chat_message(message.role.value):
-        text = message.text
-        if documents := message.documents:
-            text = replace_text_with_tooltips(text, documents)
-        st.markdown(text, unsafe_allow_html=True)
+        st.markdown(_message_html(message), unsafe_allow_html=True)
+
+
+def record_store_usage(question: str) -> None:
+    """Record the question in the usage log, used to warm up the stores on startup.
+
+    Args:
+        question (str): The question asked to the current vector store.
+    """
+    try:
+        get_usage_log().record(
+            (
+                Path(st.session_state[DocumentsEnum.RESOURCE_PATH.value])
+                / st.session_state[VectorStorEnum.CURRENT_VECTOR_STORE.value]
+            ).as_posix(),
+            st.session_state[DocumentsEnum.DOCUMENT_EMBEDDINGS_NAME.value],
+            st.session_state[DocumentsEnum.TEXT_SPLITER_NAME.value],
+            [question],
+        )
+    except sqlite3.Error as error:
+        logger.warning(f"Could not record the store usage: {error}")
 
 
 def handle_user_question(bot):
-    """Handle the user's question input, get a response from the bot, and display both.
+    """Handle the user's question input, stream a response from the bot, and display both.
 
     Args:
         bot (SimpleRAGChatBot): The chatbot instance to get responses from.
     """
     if question := st.chat_input("Ask a question"):
+        record_store_usage(question)
         user_message = add_message(Role.USER, question)
         _display_message(user_message)
 
-        bot_response = bot.get_response(
-            user_message, st.session_state[ChatEnum.CHAT_HISTORY.value]
-        )
-        bot_message = add_message(Role.BOT, bot_response.text, bot_response.documents)
-        _display_message(bot_message)
+        with st.chat_message(Role.BOT.value):
+            placeholder = st.empty()
+            bot_response = bot.stream_response(
+                user_message, st.session_state[ChatEnum.CHAT_HISTORY.value]
+            )
+            placeholder.write_stream(bot_response)
+            bot_message = add_message(
+                Role.BOT, bot_response.text, bot_response.documents
+            )
+            if bot_message.documents:
+                placeholder.markdown(_message_html(bot_message), unsafe_allow_html=True)
 
 
 def chat_interface(llm: BaseChatModel) -> None:
@@ -89,10 +179,22 @@ def chat_interface(llm: BaseChatModel) -> None:
     """
     logger.debug(f"Use {llm=}")
     if st.session_state[VectorStorEnum.CURRENT_VECTOR_STORE.value]:
-        vector_store = create_vector_store(
-            st.session_state[VectorStorEnum.CURRENT_VECTOR_STORE.value]
+        try:
+            vector_store = create_vector_store(
+                st.session_state[VectorStorEnum.CURRENT_VECTOR_STORE.value]
+            )
+        except EmbeddingMismatchError as error:
+            st.error(f"{error}. Select the matching embeddings model.", icon="⚠️")
+            logger.warning(error)
+            return
+        diversity = st.session_state.get("retrieval_diversity", 0.0)
+        rag_bot = SimpleRAGChatBot(
+            llm,
+            vector_store,
+            answer_cache=get_answer_cache(),
+            history_manager=get_history_manager(llm),
+            mmr_lambda=1 - diversity if diversity else None,
         )
-        rag_bot = SimpleRAGChatBot(llm, vector_store)
         display_chat_history()
         handle_user_question(rag_bot)
     else:
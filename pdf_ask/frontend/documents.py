@@ -3,10 +3,13 @@ from pathlib import Path
 
 import streamlit as st
 
-from pdf_ask.backend.embedding import ALLOWED_EMBEDDERS, get_embedding_instance
-from pdf_ask.backend.loader import LocalLoader
-from pdf_ask.backend.spliter import ALLOWED_SPLITTER, get_text_splitter_instance
-from pdf_ask.backend.vector_store import FaissVectorStore
+from pdf_ask.backend.catalog import get_resource_catalog
+from pdf_ask.backend.embedding import ALLOWED_EMBEDDERS
+from pdf_ask.backend.jobs import JobStatus, get_job_queue
+from pdf_ask.backend.spliter import ALLOWED_SPLITTER
+from pdf_ask.backend.store_cache import get_store_cache
+from pdf_ask.backend.uploads import save_upload
+from pdf_ask.backend.vector_store import stored_file_hash
 from pdf_ask.frontend.session_state import DocumentsEnum, VectorStorEnum
 
 logger = logging.getLogger(__name__)
@@ -25,7 +28,11 @@ def init_documents_session_state():
 def load_vector_store(
     vector_store_name: str, file_paths: list, force: bool = True
 ) -> None:
-    """Load files into the vector store.
+    """Write the uploaded files and queue their ingestion into the vector store.
+
+    Uploads are streamed to disk while hashed, and a file whose content is already in
+    the store is not queued again. The other files are embedded by the background
+    ingestion workers, whose progress is shown by :func:`show_ingestion_jobs`.
 
     Args:
         vector_store_name (str): Name of the vector store.
@@ -35,19 +42,30 @@ def load_vector_store(
     logger.info(f"Loading vector store: {vector_store_name}")
     resource_path = Path(st.session_state[DocumentsEnum.RESOURCE_PATH.value])
     vector_store_path = resource_path / vector_store_name
-    vector_store = create_vector_store(vector_store_name)
+    vector_store_path.mkdir(parents=True, exist_ok=True)
+    catalog = get_resource_catalog(resource_path.as_posix())
+    job_queue = get_job_queue()
     for file in file_paths:
-        logger.info(f"Loading vector store: {vector_store_name}")
-        bytes_data = file.read()
         file_name = vector_store_path / file.name
-        with file_name.open("wb") as f:
-            f.write(bytes_data)
-        vector_store.add_file(file_name, force=force)
+        content_hash = save_upload(file, file_name)
+        catalog.invalidate(vector_store_name)
+        if stored_file_hash(vector_store_path, file_name.as_posix()) == content_hash:
+            logger.info(f"{file.name} is already in vector store: {vector_store_name}")
+            st.toast(f"{file.name} is already in {vector_store_name}, skipped")
+            continue
+        logger.info(f"Queuing {file.name} for vector store: {vector_store_name}")
+        job_queue.submit(
+            vector_store_path.as_posix(),
+            file_name.as_posix(),
+            st.session_state[DocumentsEnum.DOCUMENT_EMBEDDINGS_NAME.value],
+            st.session_state[DocumentsEnum.TEXT_SPLITER_NAME.value],
+            force=force,
+        )
     clean_document()
 
 
 def create_vector_store(vector_store_name):
-    """Create a vector store.
+    """Get a vector store from the store cache shared by all sessions.
 
     Args:
         vector_store_name (str): Name of the vector store.
@@ -55,23 +73,20 @@ def create_vector_store(vector_store_name):
     Returns:
         FaissVectorStore: An instance of FaissVectorStore.
     """
-    logging.info(f"Creating vector store: {vector_store_name}")
     resource_path = Path(st.session_state[DocumentsEnum.RESOURCE_PATH.value])
-    vector_store_path = resource_path / vector_store_name
-    embedding = get_embedding_instance(
-        st.session_state[DocumentsEnum.DOCUMENT_EMBEDDINGS_NAME.value]
+    return get_store_cache().get(
+        (resource_path / vector_store_name).as_posix(),
+        st.session_state[DocumentsEnum.DOCUMENT_EMBEDDINGS_NAME.value],
+        st.session_state[DocumentsEnum.TEXT_SPLITER_NAME.value],
     )
-    loader = LocalLoader(
-        get_text_splitter_instance(
-            st.session_state[DocumentsEnum.TEXT_SPLITER_NAME.value]
-        )
-    )
-    return FaissVectorStore(loader, embedding, vector_store_path.as_posix())
 
 
 def get_files_by_extension(directory_path, extensions):
     """Get files by extension in each folder within the specified directory.
 
+    The folders are listed from the resource catalog shared by all sessions, so a warm
+    rerun does not scan the directory again.
+
     Args:
         directory_path (str): The path to the directory containing folders.
         extensions (list): List of file extensions to filter by.
@@ -80,19 +95,13 @@ def get_files_by_extension(directory_path, extensions):
         dict: A dictionary where keys are folder names and values are dictionaries
               containing the folder path and a list of files with the specified extensions.
     """
-    logging.info(f"Getting files by extension in directory: {directory_path}")
-    folder_dict = {}
-    path = Path(directory_path)
-    path.mkdir(exist_ok=True, parents=True)
-    for item in path.iterdir():
-        if item.is_dir():
-            file_list = [
-                file
-                for file in item.iterdir()
-                if file.is_file() and file.suffix in extensions
-            ]
-            folder_dict[item.name] = {"path": item.as_posix(), "files": file_list}
-    return folder_dict
+    return {
+        name: {
+            "path": store.path.as_posix(),
+            "files": [file for file in store.files if file.path.suffix in extensions],
+        }
+        for name, store in get_resource_catalog(directory_path).stores().items()
+    }
 
 
 def loader_clear():
@@ -196,6 +205,34 @@ def show_vector_store(vector_store_files: dict[str, list[dict[str, str]]]) -> No
             st.button("Update")
 
 
+def show_ingestion_jobs() -> None:
+    """Display the progress of the ingestion jobs, refreshed while some are active."""
+    jobs = get_job_queue().list_jobs(limit=20)
+    run_every = 2 if any(job.active for job in jobs) else None
+
+    @st.fragment(run_every=run_every)
+    def ingestion_progress() -> None:
+        jobs = get_job_queue().list_jobs(limit=20)
+        if not jobs:
+            return
+        st.markdown("**Ingestion jobs**")
+        for job in jobs:
+            label = f"{Path(job.store_path).name} / {Path(job.file_path).name}"
+            if job.status == JobStatus.FAILED:
+                st.error(f"{label}: failed ({job.error})")
+            elif job.status == JobStatus.COMPLETED:
+                st.success(f"{label}: {job.stage} {job.total} chunks")
+            else:
+                st.progress(
+                    job.done / job.total if job.total else 0.0,
+                    text=f"{label}: {job.stage} {job.done}/{job.total}",
+                )
+        if run_every and not any(job.active for job in jobs):
+            st.rerun()
+
+    ingestion_progress()
+
+
 def display_documents_embedding():
     """Display the document embedding interface."""
     available_extensions = [".pdf", ".txt"]
@@ -222,7 +259,7 @@ def display_documents_embedding():
         with row_1[0]:
             st.selectbox(
                 "Model Name of the Instruct Embeddings",
-                ALLOWED_EMBEDDERS,
+                list(ALLOWED_EMBEDDERS),
                 key=DocumentsEnum.DOCUMENT_EMBEDDINGS_NAME.value,
             )
             st.selectbox(
@@ -233,3 +270,5 @@ def display_documents_embedding():
 
         with row_1[1]:
             show_vector_store(vector_store_files)
+
+        show_ingestion_jobs()
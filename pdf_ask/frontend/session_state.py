@@ -26,8 +26,10 @@ class ChatEnum(Enum):
     """Document state."""
 
     CHAT_HISTORY: str = "chat_history"
+    HISTORY_MANAGER: str = "history_manager"
     UPLOADED_FILES: str = "uploaded_files"
     DOCUMENT_EMBEDDINGS_NAME: str = "document_embeddings_name"
     SELECTED_VECTOR_STORE: str = "selected_vector_store"
     NEW_VECTOR_STORE_NAME: str = "new_vector_store_name"
     RESOURCE_PATH: str = "resource_path"
+    SHOW_EARLIER_MESSAGES: str = "show_earlier_messages"
@@ -1,4 +1,6 @@
+import html
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
@@ -62,17 +64,20 @@ def create_tooltip_span(text: str, tooltip_text: str) -> str:
 
     Args:
         text: str
-        tooltip_text: str
+        tooltip_text: str - escaped, as it is usually the raw text of a document
 
     Returns:
         str: HTML span element with tooltip
     """
     logger.debug(f"Creating tooltip span for text: {text} with tooltip: {tooltip_text}")
-    return f'<span class="tooltip">{text}<span class="tooltiptext">{tooltip_text}</span></span>'
+    return f'<span class="tooltip">{text}<span class="tooltiptext">{html.escape(tooltip_text)}</span></span>'
 
 
 def replace_text_with_tooltips(text: str, tooltip_map: dict[str, str]) -> str:
-    """Replaces specified items in the text with tooltips.
+    """Replaces specified items in the text with tooltips, in a single pass.
+
+    The tooltip CSS is not included, inject :data:`TOOLTIP_CSS` once per page instead,
+    e.g. with :func:`add_tooltip_css_to_markdown`.
 
     Args:
         text: str - the text to add the tooltip to
@@ -80,10 +85,19 @@ def replace_text_with_tooltips(text: str, tooltip_map: dict[str, str]) -> str:
 
     Returns:
         str - the text with the appropriate tooltip spans
+
+    Examples:
+        >>> text = replace_text_with_tooltips("See [1], [12].", {"[1]": "a", "[12]": "b"})
+        >>> text.count('<span class="tooltip">'), "[12]<span" in text
+        (2, True)
     """
-    logger.debug("Starting text replacement with tooltips.")
-    for item, tooltip in tooltip_map.items():
-        logger.debug(f"Replacing '{item}' with tooltip.")
-        text = text.replace(item, create_tooltip_span(item, tooltip))
-    logger.debug("Finished replacing text with tooltips.")
-    return add_tooltip_css_to_markdown(text)
+    if not tooltip_map:
+        return text
+    spans = {
+        item: create_tooltip_span(item, tooltip)
+        for item, tooltip in tooltip_map.items()
+    }
+    pattern = re.compile(
+        "|".join(re.escape(item) for item in sorted(spans, key=len, reverse=True))
+    )
+    return pattern.sub(lambda match: spans[match.group()], text)
@@ -2,8 +2,11 @@ import logging
 
 import streamlit as st
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 
+from pdf_ask.backend.clients import get_client_pool
+from pdf_ask.backend.metrics import serve_metrics_from_env
+from pdf_ask.backend.store_cache import get_store_cache
+from pdf_ask.backend.warmup import StoreWarmer, WarmupPlan, get_usage_log
 from pdf_ask.frontend.chat import (
     chat_interface,
     clear_chat_history,
@@ -48,12 +51,50 @@ def display_sidebar():
         st.button("Reset conversation", type="primary", on_click=clear_chat_history)
         st.selectbox("OpenAI model:", ["gpt-4o", "gpt-35-turbo"], key="openai_model")
         st.slider("Temperature", 0.0, 1.0, 0.3, step=0.01, key="model_temperature")
+        st.slider(
+            "Diversity of the retrieved documents",
+            0.0,
+            1.0,
+            0.0,
+            step=0.05,
+            key="retrieval_diversity",
+            help="Re-rank the documents to avoid near-duplicate chunks.",
+        )
+        if not (warmer := start_store_warmup()).ready.is_set():
+            status = warmer.status()
+            st.info(f"Warming up vector stores ({status['warmed']}/{status['total']})")
+
+
+@st.cache_resource
+def start_metrics_server():
+    """Serve the metrics of the process once, if ``PDF_ASK_METRICS_PORT`` is set.
+
+    Returns:
+        ThreadingHTTPServer | None: The running metrics server, if any.
+    """
+    return serve_metrics_from_env()
 
 
 @st.cache_resource
+def start_store_warmup():
+    """Open the stores of the ``PDF_ASK_WARMUP_*`` plan once, in the background.
+
+    The stores are opened in the store cache shared by the sessions, with the default
+    embedder and text splitter for the listed stores.
+
+    Returns:
+        StoreWarmer: The warmer, whose ``ready`` event is set once it finished.
+    """
+    warmer = StoreWarmer(get_store_cache(), get_usage_log())
+    warmer.start(WarmupPlan.from_env(), "openAI", "recursive")
+    return warmer
+
+
 def get_llm_model(model_name, temperature):
     """Get the language model with the specified name and temperature.
 
+    The model is shared by all sessions through the client pool of the process.
+
     Args:
         model_name (str): The name of the model.
         temperature (float): The temperature setting for the model.
@@ -62,12 +103,16 @@ def get_llm_model(model_name, temperature):
         ChatOpenAI: An instance of the ChatOpenAI model.
     """
     logger.info(f"Getting model {model_name} with temperature: {temperature}")
-    return ChatOpenAI(name=model_name, temperature=temperature)
+    return get_client_pool().get_chat_model(
+        "openAI", name=model_name, temperature=temperature
+    )
 
 
 def main():
     """Main function to run the Streamlit application."""
     load_dotenv()
+    start_metrics_server()
+    start_store_warmup()
     display_title()
     initialize_session_state()
     display_documents_embedding()
@@ -0,0 +1,130 @@
+# Python code
+
+import json
+import threading
+
+import httpx
+
+from pdf_ask.backend.api import ApiServer, PdfAskApi
+from pdf_ask.backend.chat_model import ExtractiveChatModel
+from pdf_ask.backend.embedding import HashingEmbeddings
+from pdf_ask.backend.jobs import IngestionJobQueue
+from pdf_ask.backend.loader import LocalLoader
+from pdf_ask.backend.vector_store import FaissVectorStore
+
+import pytest
+
+PUMP_TEXT = "The pump is rated for 10 bar. The valve opens at 2 bar."
+
+
+@pytest.fixture
+def api(tmp_path):
+    store_path = tmp_path / "resources" / "manuals"
+    store_path.mkdir(parents=True)
+    file_path = store_path / "pump.txt"
+    file_path.write_text(PUMP_TEXT)
+    FaissVectorStore(LocalLoader(), HashingEmbeddings(), str(store_path)).add_file(
+        str(file_path)
+    )
+    job_queue = IngestionJobQueue(str(tmp_path / "jobs.sqlite3"))
+    yield PdfAskApi(
+        str(tmp_path / "resources"),
+        ExtractiveChatModel(),
+        job_queue,
+        embedder_name="hashing",
+        splitter_name="recursive",
+    )
+    job_queue.shutdown()
+
+
+@pytest.fixture
+def client(api):
+    server = ApiServer(api, ("127.0.0.1", 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with httpx.Client(
+        base_url=f"http://127.0.0.1:{server.server_address[1]}"
+    ) as client:
+        yield client
+    server.shutdown()
+    server.server_close()
+
+
+def test_search_and_batch_search(client):
+    assert client.get("/stores").json() == {"stores": ["manuals"]}
+
+    response = client.post("/stores/manuals/search", json={"query": "pump", "top_k": 1})
+    assert response.status_code == 200  # noqa: PLR2004
+    assert "pump" in response.json()["results"][0]["content"]
+
+    response = client.post(
+        "/stores/manuals/batch_search", json={"queries": ["pump", "valve"], "top_k": 1}
+    )
+    assert len(response.json()["results"]) == 2  # noqa: PLR2004
+
+
+def test_ask_with_and_without_streaming(client):
+    body = {"question": "What is the pump rated for?"}
+    answer = client.post("/stores/manuals/ask", json=body).json()
+    assert "10 bar" in answer["answer"]
+    assert answer["documents"]
+
+    with client.stream(
+        "POST", "/stores/manuals/ask", json={**body, "stream": True}
+    ) as response:
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+    assert lines[0]["documents"] == answer["documents"]
+    assert "".join(line["answer"] for line in lines[1:]) == answer["answer"]
+
+
+def test_ask_reports_errors_raised_while_streaming(client, api, monkeypatch):
+    def failing_answer():
+        yield "The pump"
+        msg = "LLM connection lost"
+        raise RuntimeError(msg)
+
+    monkeypatch.setattr(api, "ask", lambda *_: ({"documents": {}}, failing_answer()))
+
+    with client.stream(
+        "POST", "/stores/manuals/ask", json={"question": "pump?", "stream": True}
+    ) as response:
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+    assert response.status_code == 200  # noqa: PLR2004
+    assert lines == [
+        {"documents": {}},
+        {"answer": "The pump"},
+        {"error": "Internal server error"},
+    ]
+
+
+def test_ingest_file_as_job(client, api):
+    content = b"The compressor runs at 3000 rpm."
+    response = client.put("/stores/motors/files/compressor.txt", content=content)
+    assert response.status_code == 202  # noqa: PLR2004
+    job_id = response.json()["job"]["id"]
+    assert api.job_queue.wait(timeout=30)
+    assert client.get(f"/jobs/{job_id}").json()["job"]["status"] == "completed"
+
+    results = client.post("/stores/motors/search", json={"query": "compressor"}).json()
+    assert "3000 rpm" in results["results"][0]["content"]
+
+    response = client.put("/stores/motors/files/compressor.txt", content=content)
+    assert response.status_code == 200  # noqa: PLR2004
+    assert response.json()["skipped"]
+
+
+def test_search_snapshot(client, tmp_path):
+    resources = tmp_path / "resources"
+    FaissVectorStore(
+        LocalLoader(), HashingEmbeddings(), str(resources / "manuals")
+    ).export_snapshot(resources / "archive.snapshot")
+
+    results = client.post("/stores/archive/search", json={"query": "pump"}).json()
+    assert "10 bar" in results["results"][0]["content"]
+
+
+def test_errors(client):
+    assert client.post("/stores/unknown/search", json={"query": "x"}).status_code == 404  # noqa: PLR2004
+    assert client.post("/stores/manuals/search", json={}).status_code == 400  # noqa: PLR2004
+    assert client.get("/stores/manuals/search").status_code == 405  # noqa: PLR2004
+    assert client.put("/stores/../files/a.txt", content=b"x").status_code in {400, 404}
+    assert client.put("/stores/a/files/a.exe", content=b"x").status_code == 415  # noqa: PLR2004
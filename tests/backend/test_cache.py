@@ -0,0 +1,43 @@
+from pdf_ask.backend.cache import SemanticAnswerCache
+from pdf_ask.backend.llm import LlmAnswer
+
+ANSWER = LlmAnswer("40 C [1]", documents={"[1]": "max temperature is 40 C"})
+
+
+def test_cache_hit_for_similar_question():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.put("store", "g1", [1.0, 0.0], ANSWER)
+    assert cache.get("store", "g1", [0.99, 0.05]) is ANSWER
+    assert cache.get("store", "g1", [0.0, 1.0]) is None
+    assert cache.get("other", "g1", [1.0, 0.0]) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.hit_rate == 1 / 3
+
+
+def test_cache_keyed_by_search_options():
+    cache = SemanticAnswerCache()
+    cache.put("store", "g1", [1.0, 0.0], ANSWER, {"top_k": 3})
+    assert cache.get("store", "g1", [1.0, 0.0], {"top_k": 3}) is ANSWER
+    assert cache.get("store", "g1", [1.0, 0.0], {"top_k": 5}) is None
+    assert cache.get("store", "g1", [1.0, 0.0], {"top_k": 3, "mmr_lambda": 0.5}) is None
+
+
+def test_cache_invalidated_by_new_generation():
+    cache = SemanticAnswerCache()
+    cache.put("store", "g1", [1.0, 0.0], ANSWER)
+    cache.put("other", "g1", [1.0, 0.0], ANSWER)
+    assert cache.get("store", "g2", [1.0, 0.0]) is None
+    assert len(cache) == 1
+
+
+def test_cache_ttl_and_size_eviction():
+    cache = SemanticAnswerCache(ttl=0)
+    cache.put("store", "g1", [1.0, 0.0], ANSWER)
+    assert cache.get("store", "g1", [1.0, 0.0]) is None
+
+    cache = SemanticAnswerCache(max_size=2)
+    cache.put("store", "g1", [1.0, 0.0], ANSWER)
+    cache.put("store", "g1", [0.0, 1.0], ANSWER)
+    cache.put("store", "g1", [0.0, -1.0], ANSWER)
+    assert len(cache) == 2  # noqa: PLR2004
+    assert cache.get("store", "g1", [1.0, 0.0]) is None
@@ -0,0 +1,49 @@
+# Python code
+
+import os
+
+from pdf_ask.backend.catalog import ResourceCatalog
+
+
+def test_catalog_lists_stores_and_documents(tmp_path):
+    (tmp_path / "manuals").mkdir()
+    (tmp_path / "manuals" / "pump.pdf").write_bytes(b"1234")
+    (tmp_path / "manuals" / "index.faiss").write_bytes(b"index")
+    (tmp_path / "notes").mkdir()
+    (tmp_path / "readme.txt").write_text("not a store")
+    stores = ResourceCatalog(tmp_path).stores()
+    assert list(stores) == ["manuals", "notes"]
+    assert [(file.name, file.size) for file in stores["manuals"].files] == [
+        ("pump.pdf", 4)
+    ]
+    assert stores["notes"].files == []
+
+
+def test_catalog_is_cached_until_invalidated(tmp_path):
+    (tmp_path / "manuals").mkdir()
+    catalog = ResourceCatalog(tmp_path, refresh_interval=3600)
+    assert catalog.stores()["manuals"].files == []
+
+    (tmp_path / "manuals" / "pump.pdf").write_bytes(b"1234")
+    (tmp_path / "notes").mkdir()
+    assert catalog.store_names() == ["manuals"]
+    assert catalog.stores()["manuals"].files == []
+
+    catalog.invalidate("manuals")
+    assert [file.name for file in catalog.stores()["manuals"].files] == ["pump.pdf"]
+    catalog.invalidate()
+    assert catalog.store_names() == ["manuals", "notes"]
+
+
+def test_catalog_rescans_changed_folders(tmp_path):
+    (tmp_path / "manuals").mkdir()
+    (tmp_path / "notes").mkdir()
+    catalog = ResourceCatalog(tmp_path, refresh_interval=0)
+    catalog.stores()
+    notes_files = catalog.stores()["notes"].files
+
+    (tmp_path / "manuals" / "pump.txt").write_text("pump")
+    os.utime(tmp_path / "manuals", ns=(1, 1))
+    stores = catalog.stores()
+    assert [file.name for file in stores["manuals"].files] == ["pump.txt"]
+    assert stores["notes"].files is notes_files
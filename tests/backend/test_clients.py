@@ -0,0 +1,119 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pdf_ask.backend.clients import ClientPool, TokenBucket
+
+import pytest
+
+
+class _OpenAIHandler(BaseHTTPRequestHandler):
+    """Answer embedding requests, rate limiting the first one."""
+
+    protocol_version = "HTTP/1.1"
+    requests = 0
+    delay = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests += 1
+        if type(self).requests == 1:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        time.sleep(self.delay)
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        content = json.dumps(
+            {
+                "object": "list",
+                "model": body["model"],
+                "data": [
+                    {"object": "embedding", "index": index, "embedding": [0.6, 0.8]}
+                    for index in range(len(inputs))
+                ],
+                "usage": {"prompt_tokens": 1, "total_tokens": 1},
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *_args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _OpenAIHandler.requests = 0
+    _OpenAIHandler.delay = 0.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+
+
+@pytest.fixture
+def pool():
+    pool = ClientPool(base_delay=0.01)
+    yield pool
+    pool.close()
+
+
+def test_token_bucket_reserve():
+    bucket = TokenBucket(rate_per_minute=60, capacity=2)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(1, abs=0.1)
+
+
+def test_pool_retries_rate_limited_embedding_requests(pool, server):
+    embeddings = pool.get_embeddings(
+        "openAI", api_key="test", base_url=server, check_embedding_ctx_length=False
+    )
+
+    assert embeddings.embed_query("pump pressure") == [0.6, 0.8]
+    assert _OpenAIHandler.requests == 2  # noqa: PLR2004
+    assert embeddings is pool.get_embeddings(
+        "openAI", api_key="test", base_url=server, check_embedding_ctx_length=False
+    )
+
+
+def test_pool_coalesces_identical_embedding_requests(pool, server):
+    _OpenAIHandler.requests = 1
+    _OpenAIHandler.delay = 0.2
+    body = {"model": "test", "input": ["pump pressure"]}
+
+    with ThreadPoolExecutor(2) as executor:
+        responses = list(
+            executor.map(
+                lambda _: pool.http_client.post(f"{server}/embeddings", json=body),
+                range(2),
+            )
+        )
+
+    assert [response.json()["data"][0]["embedding"] for response in responses] == [
+        [0.6, 0.8],
+        [0.6, 0.8],
+    ]
+    assert _OpenAIHandler.requests == 2  # noqa: PLR2004
+    assert pool.coalesced == 1
+
+
+def test_pool_async_client_serves_successive_event_loops(pool, server):
+    _OpenAIHandler.requests = 1
+    body = {"model": "test", "input": ["pump pressure"]}
+
+    async def embed():
+        response = await pool.http_async_client.post(f"{server}/embeddings", json=body)
+        return response.json()["data"][0]["embedding"]
+
+    assert asyncio.run(embed()) == [0.6, 0.8]
+    assert asyncio.run(embed()) == [0.6, 0.8]
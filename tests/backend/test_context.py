@@ -0,0 +1,70 @@
+from pdf_ask.backend.context import ContextPacker
+from pdf_ask.backend.loader import load_and_parse_document
+from pdf_ask.backend.spliter import LinearTokenTextSplitter
+
+
+def test_pack_merges_chunks_of_same_page():
+    page = {"source": "manual.pdf", "page": 3}
+    documents = [
+        {"id": 0, "content": "The pump is rated for 10 bar.", "metadata": page},
+        {"id": 1, "content": "Clean the filter monthly.", "metadata": {"page": 1}},
+        {"id": 2, "content": "Intro. The pump is rated", "metadata": page},
+    ]
+
+    passages = ContextPacker(min_overlap=5).pack(documents)
+
+    assert passages == [
+        {"id": 1, "content": "Intro. The pump is rated for 10 bar.", "metadata": page},
+        {"id": 2, "content": "Clean the filter monthly.", "metadata": {"page": 1}},
+    ]
+
+
+def test_pack_drops_duplicates():
+    documents = [
+        {"id": 0, "content": "The pump is rated for 10 bar."},
+        {"id": 1, "content": "rated for 10 bar"},
+        {"id": 2, "content": "Clean the filter monthly."},
+    ]
+
+    passages = ContextPacker().pack(documents)
+
+    assert [passage["id"] for passage in passages] == [1, 2]
+    assert passages[1]["content"] == "Clean the filter monthly."
+
+
+def test_pack_respects_token_budget():
+    documents = [
+        {"id": 0, "content": "first chunk " * 10},
+        {"id": 1, "content": "second chunk " * 10},
+        {"id": 2, "content": "third"},
+    ]
+
+    passages = ContextPacker(token_budget=25).pack(documents)
+
+    assert [passage["content"] for passage in passages] == [
+        documents[0]["content"].strip(),
+        "third",
+    ]
+
+
+def test_pack_merges_only_neighbour_chunks_of_text_window(tmp_path):
+    file_path = tmp_path / "manual.txt"
+    file_path.write_text(
+        "The pump is rated for ten bar. Clean the filter every month. "
+        "Check the valve seal yearly. Drain the tank before winter."
+    )
+    chunks = load_and_parse_document(
+        file_path.as_posix(), LinearTokenTextSplitter(chunk_size=8, chunk_overlap=3)
+    )
+    assert {chunk.metadata["start_byte"] for chunk in chunks} == {0}
+    documents = [
+        {"content": chunks[index].page_content, "metadata": chunks[index].metadata}
+        for index in (0, 3, 1)
+    ]
+
+    passages = ContextPacker(min_overlap=5).pack(documents)
+
+    assert [passage["content"] for passage in passages] == [
+        "The pump is rated for ten bar  Clean the filter every month  Check",
+        chunks[3].page_content,
+    ]
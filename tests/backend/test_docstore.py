@@ -0,0 +1,159 @@
+# Python code
+
+import pickle
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+from pdf_ask.backend.docstore import (
+    TRAINING_SIZE,
+    CompressedDocstore,
+    dump_docstore,
+    load_docstore,
+)
+from pdf_ask.backend.embedding import HashingEmbeddings
+from pdf_ask.backend.vector_store import FaissVectorStore
+
+import pytest
+
+
+def make_documents(count: int) -> dict[str, Document]:
+    return {
+        f"id{index}": Document(
+            page_content=f"The rated voltage of the pump {index} is {index * 7} volts.",
+            metadata={"source": f"manual_{index % 3}.pdf", "page": index % 2},
+        )
+        for index in range(count)
+    }
+
+
+def _round_trip(docstore: CompressedDocstore) -> CompressedDocstore:
+    return pickle.loads(pickle.dumps(docstore))  # noqa: S301 # nosec
+
+
+def test_search_documents_in_blocks():
+    documents = make_documents(500)
+    docstore = _round_trip(CompressedDocstore(documents, block_size=1024))
+
+    assert len(docstore) == 500  # noqa: PLR2004
+    assert docstore.search("id42") == documents["id42"]
+    assert docstore.search("missing") == "ID missing not found."
+    assert docstore.metadata("id7") == {"source": "manual_1.pdf", "page": 1}
+    stats = docstore.stats()
+    assert stats["metadata_records"] == 6  # noqa: PLR2004
+    assert stats["blocks"] > 1
+    assert stats["compression_ratio"] > 1
+
+
+def test_pickle_round_trip():
+    documents = make_documents(50)
+    docstore = _round_trip(CompressedDocstore(documents))
+
+    assert list(docstore) == list(documents)
+    assert all(docstore.search(_id) == document for _id, document in documents.items())
+    docstore.add({"new": Document(page_content="new", metadata={"source": "a"})})
+    assert docstore.search("new").page_content == "new"
+
+
+def test_dump_and_load_without_pickle():
+    documents = make_documents(TRAINING_SIZE // 20)
+    docstore = CompressedDocstore(documents, block_size=1024)
+    docstore.delete(["id3"])
+    index_to_docstore_id = dict(enumerate(documents))
+
+    loaded, loaded_ids = load_docstore(dump_docstore(docstore, index_to_docstore_id))
+    assert loaded_ids == index_to_docstore_id
+    assert loaded.stats() == _round_trip(docstore).stats()
+    assert loaded.dictionary == docstore.dictionary
+    assert list(loaded) == list(docstore)
+    assert loaded.search("id3") == "ID id3 not found."
+    assert loaded.search("id42") == documents["id42"]
+    loaded.add({"new": Document(page_content="new", metadata={"source": "a"})})
+    assert loaded.search("new").page_content == "new"
+
+    in_memory, _ = load_docstore(dump_docstore(InMemoryDocstore(documents), {}))
+    assert isinstance(in_memory, InMemoryDocstore)
+    assert in_memory.search("id42") == documents["id42"]
+    with pytest.raises(ValueError, match="Not a serialized docstore"):
+        load_docstore(pickle.dumps((docstore, index_to_docstore_id)))
+
+
+def test_pickling_leaves_the_docstore_unchanged():
+    docstore = CompressedDocstore(make_documents(50))
+    pickle.dumps(docstore)
+
+    assert not docstore.dictionary
+    assert docstore.stats()["blocks"] == 0
+
+
+def test_dictionary_trained_once_large_enough_after_round_trip():
+    docstore = _round_trip(CompressedDocstore(make_documents(50)))
+    assert not docstore.dictionary
+    assert docstore.stats()["blocks"] == 1
+
+    more = {
+        f"more{_id}": document
+        for _id, document in make_documents(TRAINING_SIZE // 20).items()
+    }
+    docstore.add(more)
+
+    assert docstore.dictionary
+    assert docstore.search("id7") == make_documents(8)["id7"]
+    assert docstore.search("moreid7") == make_documents(8)["id7"]
+
+
+def test_delete_and_compact():
+    docstore = _round_trip(CompressedDocstore(make_documents(100), block_size=256))
+
+    docstore.delete([f"id{index}" for index in range(60)])
+    assert len(docstore) == 40  # noqa: PLR2004
+    assert docstore.search("id10") == "ID id10 not found."
+    docstore.compact()
+    assert docstore.stats()["documents"] == 40  # noqa: PLR2004
+    assert docstore.search("id99").page_content.startswith("The rated voltage")
+    with pytest.raises(ValueError, match="already exist"):
+        docstore.add(make_documents(100))
+    with pytest.raises(ValueError, match="does not exist"):
+        docstore.delete(["id0"])
+
+
+def test_search_decompresses_outside_the_lock():
+    documents = make_documents(100)
+    docstore = _round_trip(CompressedDocstore(documents, block_size=256))
+    decompress = docstore._decompress
+    held = []
+
+    def compacting_decompress(compressed, dictionary):
+        held.append(docstore._lock._is_owned())
+        # a compaction between the lookup of the row and the decompression of its
+        # block must not leave the stale block in the cache
+        docstore._decompress = decompress
+        docstore.delete([f"id{index}" for index in range(50)])
+        docstore.compact()
+        return decompress(compressed, dictionary)
+
+    docstore._decompress = compacting_decompress
+    assert docstore.search("id10") == documents["id10"]
+
+    assert held == [False]
+    assert docstore._cache_bytes == sum(map(len, docstore._cache.values()))
+    assert all(docstore.search(f"id{i}") == documents[f"id{i}"] for i in range(50, 100))
+
+
+def test_vector_store_with_compressed_docstore(tmp_path):
+    store_path = (tmp_path / "store").as_posix()
+    store = FaissVectorStore(None, HashingEmbeddings(), store_path)
+    store._add_documents(list(make_documents(20).values()))
+    assert not isinstance(store._vector_store.docstore, CompressedDocstore)
+
+    compressed = FaissVectorStore(None, HashingEmbeddings(), store_path, compress=True)
+    assert isinstance(compressed._vector_store.docstore, CompressedDocstore)
+    assert compressed.documents_source.keys() == store.documents_source.keys()
+    assert sorted(compressed.list_documents()) == sorted(store.list_documents())
+    assert compressed.similarity_search("pump 12 volts", top_k=1) == (
+        store.similarity_search("pump 12 volts", top_k=1)
+    )
+    compressed.remove_documents(compressed.documents_source["manual_0.pdf"])
+    reopened = FaissVectorStore(None, HashingEmbeddings(), store_path)
+    assert isinstance(reopened._vector_store.docstore, CompressedDocstore)
+    assert "manual_0.pdf" not in reopened.documents_source
@@ -6,6 +6,7 @@ from langchain_openai import OpenAIEmbeddings
 from pdf_ask.backend.embedding import (
     ALLOWED_EMBEDDERS,
     EmbedderNotAllowedError,
+    HashingEmbeddings,
     get_embedding_instance,
 )
 
@@ -25,3 +26,24 @@ def test_get_embedding_instance_invalid():
 
 def test_allowed_embedders():
     assert "openAI" in ALLOWED_EMBEDDERS
+
+
+def test_hashing_embeddings_are_deterministic_and_normalized():
+    embedder = get_embedding_instance("hashing", size=32)
+    assert isinstance(embedder, HashingEmbeddings)
+    vector = embedder.embed_query("max operating temperature")
+    assert vector == embedder.embed_documents(["max operating temperature"])[0]
+    assert len(vector) == 32  # noqa: PLR2004
+    assert sum(value * value for value in vector) == pytest.approx(1.0)
+
+
+def test_hashing_embeddings_similar_texts_are_closer():
+    embedder = HashingEmbeddings()
+    query = embedder.embed_query("maximum operating temperature")
+    related = embedder.embed_query("the maximum operating temperature is 40 C")
+    unrelated = embedder.embed_query("warranty covers two years of repairs")
+
+    def dot(left, right):
+        return sum(a * b for a, b in zip(left, right, strict=True))
+
+    assert dot(query, related) > dot(query, unrelated)
@@ -0,0 +1,137 @@
+import json
+
+from pdf_ask.backend.chat_model import ExtractiveChatModel, get_chat_model_instance
+from pdf_ask.backend.embedding import HashingEmbeddings
+from pdf_ask.backend.evaluation import (
+    BatchRunner,
+    EvaluationQuestion,
+    load_questions,
+    summarize,
+    write_results,
+)
+from pdf_ask.backend.llm import SimpleRAGChatBot
+from pdf_ask.backend.loader import LocalLoader
+from pdf_ask.backend.spliter import LinearTokenTextSplitter
+from pdf_ask.backend.vector_store import FaissVectorStore
+
+import pytest
+
+FACTS = {
+    "pump.txt": "The pump pressure is 10 bar. Clean the pump filter monthly.",
+    "valve.txt": "The valve opens at 20 degrees. Replace the valve seal yearly.",
+}
+
+
+@pytest.fixture
+def bot(tmp_path):
+    vector_store = FaissVectorStore(
+        LocalLoader(LinearTokenTextSplitter(chunk_size=16, chunk_overlap=2)),
+        HashingEmbeddings(size=64),
+        (tmp_path / "store").as_posix(),
+    )
+    for name, text in FACTS.items():
+        (tmp_path / name).write_text(text)
+        vector_store.add_file((tmp_path / name).as_posix())
+    return SimpleRAGChatBot(
+        get_chat_model_instance("extractive"), vector_store, top_k=1
+    )
+
+
+def test_batch_similarity_search(bot):
+    queries = ["pump pressure", "valve seal"]
+
+    batched = bot.vector_store.batch_similarity_search(queries, top_k=1)
+
+    assert batched == [bot.vector_store.similarity_search(q, top_k=1) for q in queries]
+
+
+def test_batch_runner(bot, tmp_path):
+    questions_path = tmp_path / "questions.jsonl"
+    questions_path.write_text(
+        "\n".join(
+            [
+                json.dumps(
+                    {
+                        "question": "What is the pump pressure?",
+                        "expected_answer": "10 bar",
+                        "expected_sources": ["pump.txt"],
+                    }
+                ),
+                json.dumps(
+                    {
+                        "question": "When to replace the valve seal?",
+                        "expected_answer": "daily",
+                    }
+                ),
+            ]
+        )
+    )
+
+    results = BatchRunner(bot, concurrency=2, batch_size=1).run(
+        load_questions(questions_path.as_posix())
+    )
+
+    assert "10 bar" in results[0].answer
+    assert results[0].answer.endswith("[1]")
+    assert results[0].retrieval_hit
+    assert results[0].answer_match
+    assert results[1].sources == ["valve.txt"]
+    assert results[1].retrieval_hit is None
+    assert results[1].answer_match is False
+    summary = summarize(results)
+    assert summary["retrieval_hit_rate"] == 1.0
+    assert summary["answer_accuracy"] == 0.5  # noqa: PLR2004
+    output_path = tmp_path / "results.jsonl"
+    write_results(results, output_path.as_posix())
+    assert len(output_path.read_text().splitlines()) == len(results)
+
+
+def test_batch_runner_records_errors(bot):
+    bot.chain = bot.prompt | _FailingChatModel()
+
+    results = BatchRunner(bot).run([EvaluationQuestion("What is the pump pressure?")])
+
+    assert results[0].error is not None
+    assert summarize(results)["errors"] == 1
+
+
+class _FailingChatModel(ExtractiveChatModel):
+    def _generate(self, *_args, **_kwargs):
+        msg = "rate limited"
+        raise RuntimeError(msg)
+
+
+def test_batch_runner_records_retrieval_errors(bot, monkeypatch):
+    batch_similarity_search = bot.vector_store.batch_similarity_search
+
+    def failing_search(queries, **kwargs):
+        if "valve" in " ".join(queries):
+            msg = "index unavailable"
+            raise RuntimeError(msg)
+        return batch_similarity_search(queries, **kwargs)
+
+    monkeypatch.setattr(bot.vector_store, "batch_similarity_search", failing_search)
+
+    results = BatchRunner(bot).run(
+        [
+            EvaluationQuestion("What is the pump pressure?"),
+            EvaluationQuestion("When to replace the valve seal?"),
+        ]
+    )
+
+    assert "10 bar" in results[0].answer
+    assert results[0].error is None
+    assert "index unavailable" in results[1].error
+    assert summarize(results)["errors"] == 1
+
+
+def test_batch_runner_records_packing_errors(bot, monkeypatch):
+    def failing_pack(_documents):
+        msg = "malformed document"
+        raise ValueError(msg)
+
+    monkeypatch.setattr(bot.context_packer, "pack", failing_pack)
+
+    results = BatchRunner(bot).run([EvaluationQuestion("What is the pump pressure?")])
+
+    assert "malformed document" in results[0].error
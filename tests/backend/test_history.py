@@ -0,0 +1,74 @@
+from unittest.mock import Mock
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from pdf_ask.backend.history import ChatHistoryManager
+from pdf_ask.backend.llm import ChatMessage, Role
+
+
+def _conversation(turns):
+    history = []
+    for turn in range(turns):
+        history.append(ChatMessage(Role.USER, f"question {turn}"))
+        history.append(ChatMessage(Role.BOT, f"answer {turn}"))
+    return history
+
+
+def test_history_excludes_current_question():
+    question = ChatMessage(Role.USER, "What is AI?")
+    history = [ChatMessage(Role.BOT, "How can I help you?"), question]
+    assert ChatHistoryManager().build(question, history) == (
+        "Assistant: How can I help you?"
+    )
+
+
+def test_history_keeps_last_turns_and_drops_older_without_llm():
+    history = _conversation(5)
+    question = ChatMessage(Role.USER, "new question")
+    formatted = ChatHistoryManager(keep_turns=2).build(question, [*history, question])
+    assert formatted == (
+        "User: question 3\nAssistant: answer 3\nUser: question 4\nAssistant: answer 4"
+    )
+
+
+def test_history_respects_token_budget():
+    history = _conversation(3)
+    question = ChatMessage(Role.USER, "new question")
+    formatted = ChatHistoryManager(token_budget=4).build(question, history)
+    assert formatted == "User: question 2\nAssistant: answer 2"
+
+
+def test_history_folds_older_turns_into_summary_in_background():
+    manager = ChatHistoryManager(keep_turns=1)
+    manager.chain = Mock()
+    manager.chain.invoke.return_value = Mock(content="summary of turns 0-1")
+    history = _conversation(3)
+    question = ChatMessage(Role.USER, "new question")
+
+    assert manager.build(question, history) == "User: question 2\nAssistant: answer 2"
+    assert manager.wait(timeout=5)
+    formatted = manager.build(question, history)
+    assert formatted == (
+        "Summary of the earlier conversation: summary of turns 0-1\n"
+        "User: question 2\nAssistant: answer 2"
+    )
+    folded = manager.chain.invoke.call_args.args[0]["messages"]
+    assert "question 0" in folded
+    assert "question 2" not in folded
+    manager.chain.invoke.assert_called_once()
+
+    history.extend(_conversation(1))
+    manager.build(question, history)
+    assert manager.wait(timeout=5)
+    assert "question 2" in manager.chain.invoke.call_args.args[0]["messages"]
+    assert "question 0" not in manager.chain.invoke.call_args.args[0]["messages"]
+
+
+def test_history_summarizes_with_the_new_llm():
+    manager = ChatHistoryManager(Mock(), keep_turns=1)
+    llm = FakeListChatModel(responses=["summary from the new model"])
+    manager.llm = llm
+    question = ChatMessage(Role.USER, "new question")
+    manager.build(question, _conversation(3))
+    assert manager.wait(timeout=5)
+    assert manager.summary == "summary from the new model"
@@ -0,0 +1,151 @@
+# Python code
+
+import sqlite3
+import threading
+from unittest.mock import patch
+
+from pdf_ask.backend.embedding import HashingEmbeddings
+from pdf_ask.backend.jobs import IngestionJobQueue, JobStatus
+from pdf_ask.backend.loader import LocalLoader
+from pdf_ask.backend.vector_store import FaissVectorStore
+
+import pytest
+
+
+def hashing_store(job):
+    return FaissVectorStore(LocalLoader(), HashingEmbeddings(), job.store_path)
+
+
+@pytest.fixture
+def text_file(tmp_path):
+    file_path = tmp_path / "store" / "pump.txt"
+    file_path.parent.mkdir()
+    file_path.write_text("The pump is rated for 10 bar. The valve opens at 2 bar.")
+    return file_path
+
+
+def test_submit_ingests_file(tmp_path, text_file):
+    queue = IngestionJobQueue(
+        str(tmp_path / "jobs.sqlite3"), store_factory=hashing_store
+    )
+    job = queue.submit(str(tmp_path / "store"), str(text_file), "hashing", "default")
+    assert queue.wait(timeout=30)
+    job = queue.get_job(job.id)
+    assert job.status == JobStatus.COMPLETED
+    assert job.stage == "indexed"
+    assert job.done == job.total > 0
+    store = hashing_store(job)
+    assert str(text_file) in store.documents_source
+    queue.shutdown()
+
+
+def test_connections_are_closed(tmp_path, text_file):
+    connections = []
+    connect = sqlite3.connect
+
+    class RecordedConnection(sqlite3.Connection):
+        closed = False
+
+        def close(self):
+            self.closed = True
+            super().close()
+
+    def record_connect(*args, **kwargs):
+        connections.append(connect(*args, factory=RecordedConnection, **kwargs))
+        return connections[-1]
+
+    with patch("sqlite3.connect", record_connect):
+        queue = IngestionJobQueue(
+            str(tmp_path / "jobs.sqlite3"), store_factory=hashing_store
+        )
+        job = queue.submit(
+            str(tmp_path / "store"), str(text_file), "hashing", "default"
+        )
+        assert queue.wait(timeout=30)
+        assert queue.get_job(job.id).status == JobStatus.COMPLETED
+        queue.shutdown()
+
+    assert connections
+    assert all(connection.closed for connection in connections)
+
+
+def test_failed_job_records_error(tmp_path):
+    queue = IngestionJobQueue(
+        str(tmp_path / "jobs.sqlite3"), store_factory=hashing_store
+    )
+    job = queue.submit(
+        str(tmp_path / "store"), str(tmp_path / "missing.txt"), "hashing", "default"
+    )
+    assert queue.wait(timeout=30)
+    job = queue.get_job(job.id)
+    assert job.status == JobStatus.FAILED
+    assert job.error
+    assert not job.active
+    queue.shutdown()
+
+
+def test_jobs_of_same_store_are_serialized(tmp_path):
+    running = []
+    overlaps = []
+    lock = threading.Lock()
+
+    class SlowStore:
+        def add_file(self, file_path, progress, **_kwargs):
+            with lock:
+                overlaps.append(bool(running))
+                running.append(file_path)
+            threading.Event().wait(0.05)
+            progress("indexed", 1, 1)
+            with lock:
+                running.remove(file_path)
+
+    queue = IngestionJobQueue(
+        str(tmp_path / "jobs.sqlite3"),
+        max_workers=4,
+        store_factory=lambda _job: SlowStore(),
+    )
+    jobs = [
+        queue.submit("store", f"file{idx}", "hashing", "default") for idx in range(4)
+    ]
+    assert queue.wait(timeout=30)
+    assert overlaps == [False] * 4
+    assert [job.id for job in queue.list_jobs()] == [job.id for job in jobs]
+    assert all(job.status == JobStatus.COMPLETED for job in queue.list_jobs())
+    queue.shutdown()
+
+
+def test_jobs_of_same_store_reuse_the_opened_store(tmp_path, text_file):
+    opened = []
+
+    def counting_store(job):
+        opened.append(job.id)
+        return hashing_store(job)
+
+    queue = IngestionJobQueue(
+        str(tmp_path / "jobs.sqlite3"), max_workers=1, store_factory=counting_store
+    )
+    other_file = text_file.with_name("valve.txt")
+    other_file.write_text("The valve opens at 2 bar.")
+    jobs = [
+        queue.submit(str(tmp_path / "store"), str(path), "hashing", "default")
+        for path in (text_file, other_file)
+    ]
+    assert queue.wait(timeout=30)
+    assert [queue.get_job(job.id).status for job in jobs] == [JobStatus.COMPLETED] * 2
+    assert len(opened) == 1
+    queue.shutdown()
+
+
+def test_unfinished_jobs_are_resumed(tmp_path, text_file):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    queue = IngestionJobQueue(db_path, store_factory=hashing_store)
+    job = queue.submit(str(tmp_path / "store"), str(text_file), "hashing", "default")
+    assert queue.wait(timeout=30)
+    queue.shutdown()
+    queue._update(job.id, status=JobStatus.RUNNING.value, stage="embedding")
+
+    resumed = IngestionJobQueue(db_path, store_factory=hashing_store)
+    assert resumed.wait(timeout=30)
+    assert resumed.get_job(job.id).status == JobStatus.COMPLETED
+    assert len(hashing_store(job).documents_source) == 1
+    resumed.shutdown()
@@ -0,0 +1,50 @@
+# Python code
+
+import subprocess
+import sys
+
+from pdf_ask.backend.embedding import ALLOWED_EMBEDDERS, HashingEmbeddings
+from pdf_ask.backend.lazy import LazyRegistry
+
+import pytest
+
+HEAVY_MODULES = (
+    "langchain_openai",
+    "openai",
+    "pymupdf",
+    "faiss",
+    "langchain_community",
+)
+
+
+def test_registry_imports_entries_on_lookup():
+    registry = LazyRegistry({"ordered": "collections:OrderedDict"})
+    assert "ordered" in registry
+    assert registry.copy() == {"ordered": "collections:OrderedDict"}
+
+    ordered_dict = registry["ordered"]
+    assert ordered_dict.__name__ == "OrderedDict"
+    assert registry.copy() == {"ordered": ordered_dict}
+    assert registry.get("missing") is None
+
+
+def test_registry_raises_on_unknown_module():
+    registry = LazyRegistry({"missing": "pdf_ask.missing:Missing"})
+    with pytest.raises(ModuleNotFoundError):
+        registry["missing"]
+
+
+def test_allowed_embedders_keep_local_classes():
+    assert list(ALLOWED_EMBEDDERS) == ["openAI", "hashing"]
+    assert ALLOWED_EMBEDDERS["hashing"] is HashingEmbeddings
+
+
+def test_app_import_does_not_load_heavy_modules():
+    code = (
+        "import sys, streamlit_app; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
@@ -1,6 +1,16 @@
-from unittest.mock import MagicMock, Mock
-
-from pdf_ask.backend.llm import ChatMessage, Role, SimpleRAGChatBot
+import asyncio
+import threading
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, Mock
+
+from pdf_ask.backend.cache import SemanticAnswerCache
+from pdf_ask.backend.chat_model import ExtractiveChatModel
+from pdf_ask.backend.llm import (
+    ChatMessage,
+    Role,
+    SimpleRAGChatBot,
+    is_standalone_question,
+)
 from pdf_ask.backend.vector_store import VectorStoreProtocol
 
 import pytest
@@ -55,3 +65,132 @@ def test_get_response(chatbot, mock_vector_store, mock_llm):
 
     assert response.text == "AI stands for Artificial Intelligence. [1]"
     assert response.documents == {"[1]": "AI stands for Artificial Intelligence."}
+
+
+def test_stream_response(chatbot, mock_vector_store):
+    question = ChatMessage(role=Role.USER, text="What is AI?")
+    mock_vector_store.similarity_search.return_value = [
+        {"id": "1", "content": "AI stands for Artificial Intelligence."}
+    ]
+    chatbot.chain.stream.return_value = iter(
+        [Mock(content="AI stands for "), Mock(content="Artificial Intelligence. [1]")]
+    )
+
+    response = chatbot.stream_response(question, [])
+
+    assert response.documents == {"[1]": "AI stands for Artificial Intelligence."}
+    assert list(response) == ["AI stands for ", "Artificial Intelligence. [1]"]
+    assert response.text == "AI stands for Artificial Intelligence. [1]"
+    assert response.time_to_first_token is not None
+    assert response.to_answer().text == response.text
+
+
+def test_aget_response(chatbot, mock_vector_store):
+    question = ChatMessage(role=Role.USER, text="What is AI?")
+    mock_vector_store.asimilarity_search.return_value = [
+        {"id": "1", "content": "AI stands for Artificial Intelligence."}
+    ]
+    chatbot.chain.ainvoke = AsyncMock(
+        return_value=Mock(content="AI stands for Artificial Intelligence. [1]")
+    )
+
+    response = asyncio.run(chatbot.aget_response(question, []))
+
+    assert response.text == "AI stands for Artificial Intelligence. [1]"
+    assert response.documents == {"[1]": "AI stands for Artificial Intelligence."}
+    mock_vector_store.asimilarity_search.assert_awaited_once_with(
+        "What is AI?", top_k=chatbot.top_k
+    )
+
+
+def test_aget_response_builds_history_during_retrieval(chatbot, mock_vector_store):
+    building = threading.Event()
+
+    async def similarity_search(*_args, **_kwargs):
+        assert await asyncio.to_thread(building.wait, 5)
+        return [{"id": "1", "content": "AI stands for Artificial Intelligence."}]
+
+    def build(*_args):
+        building.set()
+        return ""
+
+    mock_vector_store.asimilarity_search = similarity_search
+    chatbot.history_manager = Mock(build=Mock(side_effect=build))
+    chatbot.chain.ainvoke = AsyncMock(return_value=Mock(content="AI [1]"))
+
+    response = asyncio.run(
+        chatbot.aget_response(ChatMessage(Role.USER, "What is AI?"), [])
+    )
+
+    assert response.text == "AI [1]"
+    chatbot.history_manager.build.assert_called_once()
+
+
+def test_retrieve_with_diversity_factor(chatbot, mock_vector_store):
+    chatbot.mmr_lambda = 0.5
+    mock_vector_store.similarity_search.return_value = [
+        {"id": "1", "content": "AI stands for Artificial Intelligence."}
+    ]
+    chatbot.chain.invoke.return_value = Mock(content="Artificial Intelligence [1]")
+
+    chatbot.get_response(ChatMessage(Role.USER, "What is AI?"), [])
+
+    mock_vector_store.similarity_search.assert_called_once_with(
+        "What is AI?", top_k=chatbot.top_k, mmr_lambda=0.5
+    )
+
+
+def test_get_response_uses_answer_cache(chatbot, mock_vector_store):
+    chatbot.answer_cache = SemanticAnswerCache()
+    mock_vector_store.store_path = Path("resources/manuals")
+    mock_vector_store.generation = "g1"
+    mock_vector_store.embed_query.return_value = [0.1, 0.2, 0.3]
+    documents = [{"id": "1", "content": "AI stands for Artificial Intelligence."}]
+    mock_vector_store.similarity_search_by_vector.return_value = documents
+    mock_vector_store.similarity_search.return_value = documents
+    chatbot.chain.invoke.return_value = Mock(content="Artificial Intelligence [1]")
+
+    question = ChatMessage(role=Role.USER, text="What is AI?")
+    first = chatbot.get_response(question, [question])
+    second = chatbot.get_response(ChatMessage(Role.USER, "What is AI?"), [])
+
+    assert second is first
+    chatbot.chain.invoke.assert_called_once()
+
+    follow_up = ChatMessage(role=Role.USER, text="Who invented it?")
+    chatbot.get_response(follow_up, [question, follow_up])
+    assert chatbot.chain.invoke.call_count == 2  # noqa: PLR2004
+
+
+def test_answer_cache_keyed_by_chat_model(mock_vector_store):
+    answer_cache = SemanticAnswerCache()
+    mock_vector_store.store_path = Path("resources/manuals")
+    mock_vector_store.generation = "g1"
+    mock_vector_store.embed_query.return_value = [0.1, 0.2, 0.3]
+    mock_vector_store.similarity_search_by_vector.return_value = [
+        {"id": "1", "content": "The pump is rated for 10 bar."}
+    ]
+    bots = [
+        SimpleRAGChatBot(
+            ExtractiveChatModel(), mock_vector_store, answer_cache=answer_cache
+        ),
+        SimpleRAGChatBot(Mock(), mock_vector_store, answer_cache=answer_cache),
+    ]
+    bots[1].chain = Mock()
+    bots[1].chain.invoke.return_value = Mock(content="10 bar [1]")
+
+    question = ChatMessage(Role.USER, "What is the pump rated for?")
+    first = bots[0].get_response(question, [question])
+    second = bots[1].get_response(question, [question])
+
+    assert second is not first
+    bots[1].chain.invoke.assert_called_once()
+    assert bots[0].get_response(question, [question]) is first
+
+
+def test_is_standalone_question():
+    question = ChatMessage(Role.USER, "What is the rated voltage?")
+    assert is_standalone_question(question, [question])
+    assert is_standalone_question(
+        question, [ChatMessage(Role.USER, "What is the weight?"), question]
+    )
@@ -1,16 +1,39 @@
 from unittest.mock import MagicMock, patch
 
+import pymupdf
 from langchain_core.documents import Document
 
 from pdf_ask.backend.loader import (
     DOC_PARSER,
+    MmapTextLoader,
     ParseDocumentError,
+    PyMuPDFLayoutLoader,
+    iter_parsed_documents,
     load_and_parse_document,
 )
+from pdf_ask.backend.spliter import LayoutAwareTextSplitter
 
 import pytest
 
 
+@pytest.fixture
+def layout_pdf(tmp_path):
+    file_path = tmp_path / "manual.pdf"
+    with pymupdf.open() as pdf:
+        page = pdf.new_page()
+        page.insert_text((72, 72), "1 Introduction", fontsize=18)
+        page.insert_text((72, 100), "Body text, line one.", fontsize=10)
+        page.insert_text((72, 112), "Body continues here.", fontsize=10)
+        page.insert_text((72, 150), "1.1 Scope", fontsize=14)
+        page.insert_text((72, 170), "Scope text goes here.", fontsize=10)
+        page.insert_text((72, 182), "More scope text.", fontsize=10)
+        page.insert_text((72, 220), "2 Operation", fontsize=18)
+        page.insert_text((72, 240), "Operation text.", fontsize=10)
+        page.insert_text((72, 280), "Second operation paragraph.", fontsize=10)
+        pdf.save(file_path)
+    return file_path.as_posix()
+
+
 @pytest.fixture
 def mock_pdf_loader():
     mock_loader = MagicMock()
@@ -29,7 +52,9 @@ def mock_txt_loader():
     DOC_PARSER,
     {
         ".pdf": MagicMock(
-            return_value=MagicMock(load=lambda: [Document(page_content="PDF content")])
+            return_value=MagicMock(
+                lazy_load=lambda: iter([Document(page_content="PDF content")])
+            )
         )
     },
 )
@@ -43,7 +68,9 @@ def test_load_and_parse_pdf():
     DOC_PARSER,
     {
         ".txt": MagicMock(
-            return_value=MagicMock(load=lambda: [Document(page_content="TXT content")])
+            return_value=MagicMock(
+                lazy_load=lambda: iter([Document(page_content="TXT content")])
+            )
         )
     },
 )
@@ -57,3 +84,85 @@ def test_load_and_parse_unsupported_file():
     with pytest.raises(ParseDocumentError) as excinfo:
         load_and_parse_document("test.docx")
     assert "File type .docx not allowed" in str(excinfo.value)
+
+
+def test_mmap_text_loader_windows_align_to_paragraphs(tmp_path):
+    file_path = tmp_path / "log.txt"
+    file_path.write_text("first line\nsecond line\n\nthird, paragraph\n")
+    documents = list(MmapTextLoader(file_path.as_posix(), window_size=30).lazy_load())
+    assert [document.page_content for document in documents] == [
+        "first line second line  ",
+        "third  paragraph ",
+    ]
+    assert documents[0].metadata == {
+        "source": file_path.as_posix(),
+        "start_byte": 0,
+        "end_byte": 24,
+    }
+    assert documents[1].metadata["start_byte"] == documents[0].metadata["end_byte"]
+    assert documents[1].metadata["end_byte"] == file_path.stat().st_size
+
+
+def test_mmap_text_loader_decodes_multibyte_across_windows(tmp_path):
+    file_path = tmp_path / "utf8.txt"
+    file_path.write_text("zażółć gęślą jaźń" * 10, encoding="utf-8")
+    documents = MmapTextLoader(file_path.as_posix(), window_size=7).load()
+    assert "".join(document.page_content for document in documents) == (
+        "zażółć gęślą jaźń" * 10
+    )
+
+
+def test_mmap_text_loader_rejects_invalid_bytes(tmp_path):
+    file_path = tmp_path / "latin1.txt"
+    file_path.write_bytes("caf\u00e9\n".encode("latin-1"))
+    with pytest.raises(ParseDocumentError, match="not valid utf-8 after byte 3"):
+        MmapTextLoader(file_path.as_posix()).load()
+    documents = MmapTextLoader(file_path.as_posix(), errors="replace").load()
+    assert documents[0].page_content == "caf  "
+
+
+def test_mmap_text_loader_empty_file(tmp_path):
+    file_path = tmp_path / "empty.txt"
+    file_path.touch()
+    assert MmapTextLoader(file_path.as_posix()).load() == []
+
+
+def test_iter_parsed_documents_reads_lazily(tmp_path):
+    file_path = tmp_path / "notes.txt"
+    file_path.write_text("alpha\n\nbeta\n")
+    with patch.object(
+        MmapTextLoader, "lazy_load", side_effect=MmapTextLoader.lazy_load, autospec=True
+    ) as lazy_load:
+        documents = iter_parsed_documents(file_path.as_posix())
+        lazy_load.assert_not_called()
+        assert next(documents).page_content == "alpha  beta "
+
+
+def test_load_and_parse_txt_streams_windows(tmp_path):
+    file_path = tmp_path / "notes.txt"
+    file_path.write_text("alpha\n\nbeta\n")
+    result = load_and_parse_document(file_path.as_posix())
+    assert [document.page_content for document in result] == ["alpha  beta "]
+
+
+def test_layout_loader_groups_paragraphs_by_section(layout_pdf):
+    documents = PyMuPDFLayoutLoader(layout_pdf).load()
+    assert [
+        (document.metadata["section_path"], document.page_content)
+        for document in documents
+    ] == [
+        ("1 Introduction", "Body text, line one. Body continues here."),
+        ("1 Introduction > 1.1 Scope", "Scope text goes here. More scope text."),
+        ("2 Operation", "Operation text.\n\nSecond operation paragraph."),
+    ]
+    assert all(document.metadata["page"] == 0 for document in documents)
+    assert all(document.metadata["block_type"] == "text" for document in documents)
+
+
+def test_load_and_parse_pdf_uses_splitter_document_parser(layout_pdf):
+    result = load_and_parse_document(layout_pdf, splitter=LayoutAwareTextSplitter())
+    assert [document.metadata["section_path"] for document in result] == [
+        "1 Introduction",
+        "1 Introduction > 1.1 Scope",
+        "2 Operation",
+    ]
@@ -0,0 +1,68 @@
+import urllib.request
+
+from pdf_ask.backend.embedding import HashingEmbeddings
+from pdf_ask.backend.loader import LocalLoader
+from pdf_ask.backend.metrics import METRICS, MetricsRegistry
+from pdf_ask.backend.spliter import LinearTokenTextSplitter
+from pdf_ask.backend.vector_store import FaissVectorStore
+
+import pytest
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry(buckets=(0.1, 1))
+    registry.increment("chunks_total", 3)
+    registry.increment("answer_cache_lookups_total", result="hit")
+    registry.observe("stage_seconds", 0.5, stage="embed")
+    registry.observe("stage_seconds", 2, stage="embed")
+
+    lines = registry.render().splitlines()
+
+    assert "pdf_ask_chunks_total 3" in lines
+    assert 'pdf_ask_answer_cache_lookups_total{result="hit"} 1' in lines
+    assert "# TYPE pdf_ask_stage_seconds histogram" in lines
+    assert 'pdf_ask_stage_seconds_bucket{stage="embed",le="0.1"} 0' in lines
+    assert 'pdf_ask_stage_seconds_bucket{stage="embed",le="1"} 1' in lines
+    assert 'pdf_ask_stage_seconds_bucket{stage="embed",le="+Inf"} 2' in lines
+    assert 'pdf_ask_stage_seconds_count{stage="embed"} 2' in lines
+
+
+def test_span_records_failed_stages():
+    registry = MetricsRegistry()
+
+    msg = "parse failed"
+    with pytest.raises(ValueError, match=msg), registry.span("parse"):
+        raise ValueError(msg)
+
+    assert registry.stage_seconds("parse")[0] == 1
+
+
+def test_serve_and_write(tmp_path):
+    registry = MetricsRegistry()
+    registry.increment("chunks_total")
+    server = registry.serve(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:  # nosec B310
+            assert "pdf_ask_chunks_total 1" in response.read().decode()
+    finally:
+        server.shutdown()
+
+    registry.write((tmp_path / "pdf_ask.prom").as_posix())
+    assert "pdf_ask_chunks_total 1" in (tmp_path / "pdf_ask.prom").read_text()
+
+
+def test_pipeline_stages_are_instrumented(tmp_path):
+    (tmp_path / "doc.txt").write_text("The pump pressure is 10 bar.")
+    store = FaissVectorStore(
+        LocalLoader(LinearTokenTextSplitter()),
+        HashingEmbeddings(size=32),
+        (tmp_path / "store").as_posix(),
+    )
+    stages = ["parse", "split", "embed", "index", "save", "embed_query", "faiss_search"]
+    before = {stage: METRICS.stage_seconds(stage)[0] for stage in stages}
+
+    store.add_file((tmp_path / "doc.txt").as_posix())
+    store.similarity_search("pump pressure", top_k=1)
+
+    assert all(METRICS.stage_seconds(stage)[0] > before[stage] for stage in stages)
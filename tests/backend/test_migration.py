@@ -0,0 +1,145 @@
+from pdf_ask.backend.clients import get_client_pool
+from pdf_ask.backend.embedding import HashingEmbeddings
+from pdf_ask.backend.jobs import IngestionJobQueue, JobStatus
+from pdf_ask.backend.loader import LocalLoader
+from pdf_ask.backend.migration import EmbeddingMigration, MigrationStatus
+from pdf_ask.backend.spliter import LinearTokenTextSplitter
+from pdf_ask.backend.store_cache import StoreCache
+from pdf_ask.backend.vector_store import EmbeddingMismatchError, FaissVectorStore
+
+import pytest
+
+
+@pytest.fixture
+def store(tmp_path):
+    source = tmp_path / "manual.txt"
+    source.write_text(" ".join(f"word{index}" for index in range(40)))
+    loader = LocalLoader(LinearTokenTextSplitter(chunk_size=8, chunk_overlap=0))
+    store = FaissVectorStore(
+        loader, HashingEmbeddings(size=16), (tmp_path / "store").as_posix()
+    )
+    store.add_file(source.as_posix())
+    return store
+
+
+def test_migration_swaps_index(store):
+    ids = sorted(store.list_documents())
+    migration = EmbeddingMigration(store, HashingEmbeddings(size=32), batch_size=2)
+    migration.run()
+
+    assert migration.status == MigrationStatus.COMPLETED
+    assert migration.progress == (len(ids), len(ids))
+    assert store._vector_store.index.d == 32  # noqa: PLR2004
+    assert store.manifest["dimension"] == 32  # noqa: PLR2004
+    assert sorted(store.list_documents()) == ids
+    assert store.similarity_search("word3", top_k=1)
+    with pytest.raises(EmbeddingMismatchError):
+        FaissVectorStore(store.loader, HashingEmbeddings(size=16), store.store_path)
+
+
+def test_migration_rollback(store):
+    migration = EmbeddingMigration(store, HashingEmbeddings(size=32))
+    migration.run()
+    migration.rollback()
+    assert store._vector_store.index.d == 16  # noqa: PLR2004
+    assert FaissVectorStore(store.loader, HashingEmbeddings(size=16), store.store_path)
+
+
+def test_migration_resumes_after_cancel(store, monkeypatch):
+    embeddings = HashingEmbeddings(size=32)
+    migration = EmbeddingMigration(store, embeddings, batch_size=1)
+    get_documents = store.get_documents
+
+    def get_documents_and_cancel(ids):
+        migration.cancel()
+        return get_documents(ids)
+
+    monkeypatch.setattr(store, "get_documents", get_documents_and_cancel)
+    migration.run()
+    assert migration.status == MigrationStatus.CANCELLED
+    assert store._vector_store.index.d == 16  # noqa: PLR2004
+
+    monkeypatch.undo()
+    resumed = EmbeddingMigration(store, embeddings)
+    resumed.start().join()
+    assert resumed.status == MigrationStatus.COMPLETED
+    assert store._vector_store.index.d == 32  # noqa: PLR2004
+
+
+def test_migration_catches_up_writes_of_other_instances(store, tmp_path):
+    other = FaissVectorStore(
+        store.loader, HashingEmbeddings(size=16), store.store_path.as_posix()
+    )
+    source = tmp_path / "valve.txt"
+    source.write_text("The valve opens at 3 bar.")
+    other.add_file(source.as_posix())
+
+    migration = EmbeddingMigration(store, HashingEmbeddings(size=32))
+    migration.run()
+
+    assert source.as_posix() in store.list_sources()
+    assert sorted(store.list_documents()) == sorted(other.list_documents())
+    assert store.file_hashes == other.file_hashes
+    reopened = FaissVectorStore(
+        store.loader, HashingEmbeddings(size=32), store.store_path.as_posix()
+    )
+    assert reopened.file_hashes == other.file_hashes
+    assert sorted(path.name for path in store.store_path.glob("index*")) == [
+        f"{store.manifest['index']}.faiss",
+        f"{store.manifest['index']}.pkl",
+    ]
+
+
+def test_migration_checkpoints_shadow_store(store, monkeypatch):
+    saves = []
+    save = FaissVectorStore._save
+
+    def record_save(self):
+        saves.append(self.store_path.name)
+        save(self)
+
+    monkeypatch.setattr(FaissVectorStore, "_save", record_save)
+    migration = EmbeddingMigration(
+        store, HashingEmbeddings(size=32), batch_size=1, checkpoint_size=4
+    )
+    migration.run()
+    checkpoints = -(-migration.progress[1] // 4)
+    # The shadow store is also saved when created and before being swapped in
+    assert saves.count("shadow") == checkpoints + 2
+
+
+def test_open_stores_switch_to_migrated_embedder(tmp_path):
+    store_path = (tmp_path / "store").as_posix()
+    source = tmp_path / "pump.txt"
+    source.write_text("The pump is rated for 10 bar.")
+    store = FaissVectorStore(
+        LocalLoader(), get_client_pool().get_embeddings("hashing"), store_path
+    )
+    store.add_file(source.as_posix())
+    store_cache = StoreCache(check_interval=0)
+    cached = store_cache.get(store_path, "hashing", "recursive")
+    job_queue = IngestionJobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_queue.submit(store_path, source.as_posix(), "hashing", "recursive", force=True)
+    assert job_queue.wait(timeout=30)
+
+    migration = EmbeddingMigration(
+        store,
+        HashingEmbeddings(size=32),
+        embedder_name="hashing",
+        embedder_kwargs={"size": 32},
+    )
+    migration.run()
+
+    reopened = store_cache.get(store_path, "hashing", "recursive")
+    assert reopened is not cached
+    assert reopened._vector_store.index.d == 32  # noqa: PLR2004
+    assert reopened.similarity_search("pump", top_k=1)
+    valve = tmp_path / "valve.txt"
+    valve.write_text("The valve opens at 3 bar.")
+    job = job_queue.submit(store_path, valve.as_posix(), "hashing", "recursive")
+    assert job_queue.wait(timeout=30)
+    assert job_queue.get_job(job.id).status == JobStatus.COMPLETED
+    assert store_cache.get(store_path, "hashing", "recursive").similarity_search(
+        "valve", top_k=1
+    )
+    job_queue.shutdown()
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import threading
+
+from pdf_ask.backend.metrics import METRICS
+from pdf_ask.backend.profiling import is_profiling_enabled, profiled, profiling
+
+
+@profiled("ingest")
+def _ingest(size):
+    with METRICS.span("parse"):
+        data = [str(index) for index in range(size)]
+    return len(data)
+
+
+def test_profiled_runs_without_profiling(tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_ASK_PROFILE_DIR", tmp_path.as_posix())
+    monkeypatch.delenv("PDF_ASK_PROFILE", raising=False)
+
+    assert _ingest(10) == 10  # noqa: PLR2004
+    assert not list(tmp_path.iterdir())
+
+
+def test_profiling_saves_profile_with_request_id(tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_ASK_PROFILE_DIR", tmp_path.as_posix())
+
+    with profiling("upload-42"):
+        assert _ingest(1000) == 1000  # noqa: PLR2004
+
+    (summary_path,) = tmp_path.glob("*-ingest-upload-42.json")
+    summary = json.loads(summary_path.read_text())
+    assert summary["request_id"] == "upload-42"
+    assert set(summary["stage_timings_s"]) == {"parse"}
+    assert summary["peak_memory_bytes"] > 0
+    assert any("_ingest" in entry["function"] for entry in summary["functions"])
+    assert summary_path.with_suffix(".prof").exists()
+
+
+def test_concurrent_calls_are_profiled_one_at_a_time(tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_ASK_PROFILE_DIR", tmp_path.as_posix())
+    started, release = threading.Event(), threading.Event()
+
+    @profiled("ingest")
+    def wait():
+        started.set()
+        release.wait(5)
+
+    def profile_wait():
+        with profiling("first"):
+            wait()
+
+    thread = threading.Thread(target=profile_wait)
+    thread.start()
+    started.wait(5)
+    with profiling("concurrent"):
+        assert _ingest(10) == 10  # noqa: PLR2004
+    release.set()
+    thread.join()
+
+    (summary_path,) = tmp_path.glob("*.json")
+    assert summary_path.name.endswith("-ingest-first.json")
+
+
+def test_profiled_coroutine_function(tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_ASK_PROFILE_DIR", tmp_path.as_posix())
+
+    @profiled("ingest")
+    async def ingest(size):
+        await asyncio.sleep(0)
+        return _ingest(size)
+
+    with profiling("async-7"):
+        assert asyncio.run(ingest(10)) == 10  # noqa: PLR2004
+
+    assert len(list(tmp_path.glob("*-ingest-async-7.json"))) == 1
+
+
+def test_profiled_generator_function_until_consumed(tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_ASK_PROFILE_DIR", tmp_path.as_posix())
+
+    @profiled("stream")
+    def stream(size):
+        for index in range(size):
+            yield _ingest(index)
+
+    with profiling("stream-3"):
+        chunks = stream(3)
+        assert not list(tmp_path.iterdir())
+        assert list(chunks) == [0, 1, 2]
+
+    (summary_path,) = tmp_path.glob("*-stream-stream-3.json")
+    summary = json.loads(summary_path.read_text())
+    assert set(summary["stage_timings_s"]) == {"parse"}
+    assert any("_ingest" in entry["function"] for entry in summary["functions"])
+
+
+def test_is_profiling_enabled_by_environment(monkeypatch):
+    monkeypatch.setenv("PDF_ASK_PROFILE", "add_file, get_response")
+
+    assert is_profiling_enabled("get_response")
+    assert not is_profiling_enabled("ingest")
@@ -0,0 +1,61 @@
+from unittest.mock import patch
+
+from pdf_ask.backend.rebuild import (
+    list_store_files,
+    partition_files,
+    rebuild_vector_store,
+)
+from pdf_ask.backend.vector_store import FaissVectorStore
+
+import pytest
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = tmp_path / "store"
+    path.mkdir()
+    for index, size in enumerate([30, 10, 20]):
+        (path / f"doc{index}.txt").write_text(
+            " ".join(f"topic{index} word{word}" for word in range(size))
+        )
+    (path / "notes.md").write_text("not a source file")
+    return path
+
+
+def test_list_store_files(store_path):
+    assert list_store_files(store_path.as_posix()) == [
+        (store_path / f"doc{index}.txt").as_posix() for index in range(3)
+    ]
+
+
+def test_partition_files_balances_sizes(store_path):
+    shards = partition_files(list_store_files(store_path.as_posix()), 2)
+    assert sorted(sorted(shard) for shard in shards) == [
+        [(store_path / "doc0.txt").as_posix()],
+        [(store_path / "doc1.txt").as_posix(), (store_path / "doc2.txt").as_posix()],
+    ]
+
+
+def test_rebuild_vector_store_merges_shards(store_path):
+    store = rebuild_vector_store(
+        store_path.as_posix(), "hashing", "token", workers=2, size=32
+    )
+    assert sorted(store.list_sources()) == list_store_files(store_path.as_posix())
+    assert store._vector_store.index.ntotal == len(store.list_documents())
+    assert "topic2" in store.similarity_search("topic2 word3", top_k=1)[0]["content"]
+
+
+def test_rebuild_vector_store_saves_merged_store_once(store_path):
+    saved = []
+    save = FaissVectorStore._save
+
+    def record_save(store: FaissVectorStore) -> None:
+        saved.append(store.store_path.name)
+        save(store)
+
+    with patch.object(FaissVectorStore, "_save", record_save):
+        rebuild_vector_store(
+            store_path.as_posix(), "hashing", "token", workers=3, size=32
+        )
+    # once when created, once after its last shard
+    assert saved.count("merged") == 2  # noqa: PLR2004
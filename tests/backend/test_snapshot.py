@@ -0,0 +1,130 @@
+# Python code
+
+import struct
+from pathlib import Path
+
+from pdf_ask.backend.embedding import HashingEmbeddings
+from pdf_ask.backend.loader import LocalLoader
+from pdf_ask.backend.snapshot import (
+    SNAPSHOT_FOOTER,
+    SnapshotError,
+    import_snapshot,
+    install_snapshot,
+    read_snapshot_header,
+    verify_snapshot,
+)
+from pdf_ask.backend.store_cache import StoreCache
+from pdf_ask.backend.vector_store import FaissVectorStore, ReadOnlyVectorStoreError
+
+import pytest
+
+
+def add_text(store: FaissVectorStore, path: Path, text: str) -> None:
+    path.write_text(text)
+    store.add_file(str(path))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FaissVectorStore(
+        LocalLoader(), HashingEmbeddings(), str(tmp_path / "resources" / "manuals")
+    )
+    add_text(store, tmp_path / "pump.txt", "The pump is rated for 10 bar.")
+    add_text(store, tmp_path / "valve.txt", "The valve opens at 3 bar.")
+    return store
+
+
+def test_open_snapshot_without_unpacking(tmp_path, store):
+    snapshot_path = tmp_path / "manuals.snapshot"
+    header = store.export_snapshot(snapshot_path)
+
+    assert header.sections["index"].offset == 0
+    assert header.sections["docstore"].offset % 4096 == 0
+    assert verify_snapshot(snapshot_path) == header
+    opened = FaissVectorStore(LocalLoader(), HashingEmbeddings(), str(snapshot_path))
+    assert opened.read_only
+    assert opened.generation == store.generation
+    assert opened.file_hashes == store.file_hashes
+    assert opened.documents_source.keys() == store.documents_source.keys()
+    assert opened.similarity_search("valve", top_k=2) == store.similarity_search(
+        "valve", top_k=2
+    )
+    with pytest.raises(ReadOnlyVectorStoreError):
+        add_text(opened, tmp_path / "motor.txt", "The motor runs at 50 Hz.")
+
+
+def test_corrupted_snapshot(tmp_path, store):
+    snapshot_path = tmp_path / "manuals.snapshot"
+    header = store.export_snapshot(snapshot_path)
+    content = bytearray(snapshot_path.read_bytes())
+    content[header.sections["docstore"].offset + 10] ^= 0xFF
+    snapshot_path.write_bytes(content)
+
+    assert read_snapshot_header(snapshot_path) == header
+    with pytest.raises(SnapshotError, match="docstore"):
+        verify_snapshot(snapshot_path)
+    with pytest.raises(SnapshotError, match="not a snapshot"):
+        read_snapshot_header(store.store_path / "store.json")
+
+
+def test_hot_swap_installed_snapshot(tmp_path, store):
+    served_path = tmp_path / "replica" / "manuals.snapshot"
+    store.export_snapshot(tmp_path / "v1.snapshot")
+    install_snapshot(tmp_path / "v1.snapshot", served_path)
+    store_cache = StoreCache(check_interval=0)
+    old = store_cache.get(served_path.as_posix(), "hashing", "recursive")
+
+    add_text(store, tmp_path / "motor.txt", "The motor runs at 50 Hz.")
+    store.export_snapshot(tmp_path / "v2.snapshot")
+    install_snapshot(tmp_path / "v2.snapshot", served_path)
+    new = store_cache.get(served_path.as_posix(), "hashing", "recursive")
+
+    assert new is not old
+    assert new.generation == store.generation
+    assert (tmp_path / "motor.txt").as_posix() in new.documents_source
+    assert old.similarity_search("pump", top_k=1)
+    assert [path.name for path in served_path.parent.iterdir()] == [served_path.name]
+
+
+def test_import_snapshot_into_store_folder(tmp_path, store):
+    snapshot_path = tmp_path / "manuals.snapshot"
+    store.export_snapshot(snapshot_path)
+
+    import_snapshot(snapshot_path, tmp_path / "imported")
+    imported = FaissVectorStore(
+        LocalLoader(), HashingEmbeddings(), str(tmp_path / "imported")
+    )
+    assert not imported.read_only
+    assert imported.generation == store.generation
+    assert imported.similarity_search("pump", top_k=2) == store.similarity_search(
+        "pump", top_k=2
+    )
+
+
+def test_snapshot_of_compressed_store_without_pickle(tmp_path):
+    store = FaissVectorStore(
+        LocalLoader(), HashingEmbeddings(), str(tmp_path / "store"), compress=True
+    )
+    add_text(store, tmp_path / "pump.txt", "The pump is rated for 10 bar.")
+    snapshot_path = tmp_path / "manuals.snapshot"
+    header = store.export_snapshot(snapshot_path)
+
+    section = header.sections["docstore"]
+    content = snapshot_path.read_bytes()
+    assert content[section.offset : section.offset + 8] == b"PDFASKDS"
+    opened = FaissVectorStore(LocalLoader(), HashingEmbeddings(), str(snapshot_path))
+    assert opened.similarity_search("pump", top_k=1) == store.similarity_search(
+        "pump", top_k=1
+    )
+
+
+def test_reject_pickled_snapshot_version(tmp_path, store):
+    snapshot_path = tmp_path / "manuals.snapshot"
+    store.export_snapshot(snapshot_path)
+    content = bytearray(snapshot_path.read_bytes())
+    footer = len(content) - SNAPSHOT_FOOTER.size
+    struct.pack_into("<I", content, footer + 8, 1)
+    snapshot_path.write_bytes(content)
+
+    with pytest.raises(SnapshotError, match="version 1, export it again"):
+        FaissVectorStore(LocalLoader(), HashingEmbeddings(), str(snapshot_path))
@@ -1,6 +1,12 @@
+from langchain_core.documents import Document
+
+from pdf_ask.backend.loader import PyMuPDFLayoutLoader
 from pdf_ask.backend.spliter import (
+    LayoutAwareTextSplitter,
+    LinearTokenTextSplitter,
     SimpleRecursiveCharacterTextSplitter,
     TextSplitterNotAllowedError,
+    count_tokens,
     get_text_splitter_instance,
 )
 
@@ -15,3 +21,62 @@ def test_get_text_splitter_instance_allowed():
 def test_get_text_splitter_instance_not_allowed():
     with pytest.raises(TextSplitterNotAllowedError):
         get_text_splitter_instance("non_recursive")
+
+
+def test_get_text_splitter_instance_token():
+    splitter = get_text_splitter_instance("token", chunk_size=64, chunk_overlap=8)
+    assert isinstance(splitter, LinearTokenTextSplitter)
+
+
+def test_linear_token_text_splitter_respects_size_and_overlap():
+    text = " ".join(f"word{index}" for index in range(10))
+    chunks = LinearTokenTextSplitter(chunk_size=4, chunk_overlap=1).split_text(text)
+    assert chunks == [
+        "word0 word1 word2 word3",
+        "word3 word4 word5 word6",
+        "word6 word7 word8 word9",
+    ]
+    assert all(count_tokens(chunk) <= 4 for chunk in chunks)  # noqa: PLR2004
+
+
+def test_linear_token_text_splitter_empty_text():
+    assert LinearTokenTextSplitter().split_text("   ") == []
+
+
+def test_linear_token_text_splitter_invalid_overlap():
+    with pytest.raises(ValueError, match="must be smaller"):
+        LinearTokenTextSplitter(chunk_size=4, chunk_overlap=4)
+
+
+def test_layout_aware_text_splitter_packs_paragraphs():
+    splitter = get_text_splitter_instance("layout", chunk_size=6, chunk_overlap=1)
+    assert isinstance(splitter, LayoutAwareTextSplitter)
+    assert splitter.document_parsers[".pdf"] is PyMuPDFLayoutLoader
+
+    document = Document(
+        page_content="one two three\n\nfour five\n\nsix seven eight nine ten eleven twelve",
+        metadata={"section_path": "1 Intro", "page": 0},
+    )
+    chunks = splitter.split_documents([document])
+    assert [chunk.page_content for chunk in chunks] == [
+        "one two three\n\nfour five",
+        "six seven eight nine ten eleven",
+        "eleven twelve",
+    ]
+    assert all(chunk.metadata["section_path"] == "1 Intro" for chunk in chunks)
+
+
+def test_linear_token_text_splitter_records_chunk_index():
+    splitter = LinearTokenTextSplitter(chunk_size=2, chunk_overlap=1)
+    documents = [
+        Document(page_content="one two three", metadata={"start_byte": 0}),
+        Document(page_content="four five", metadata={"start_byte": 14}),
+    ]
+
+    chunks = splitter.split_documents(documents)
+
+    assert [(chunk.page_content, chunk.metadata) for chunk in chunks] == [
+        ("one two", {"start_byte": 0, "chunk_index": 0}),
+        ("two three", {"start_byte": 0, "chunk_index": 1}),
+        ("four five", {"start_byte": 14, "chunk_index": 0}),
+    ]
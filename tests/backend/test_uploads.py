@@ -0,0 +1,25 @@
+# Python code
+
+import hashlib
+import io
+
+from pdf_ask.backend.uploads import hash_file, save_upload
+
+
+def test_save_upload_copies_and_hashes(tmp_path):
+    content = b"%PDF-1.4 " * 1000
+    upload = io.BytesIO(content)
+    upload.read(10)
+    destination = tmp_path / "doc.pdf"
+    content_hash = save_upload(upload, destination, chunk_size=100)
+    assert destination.read_bytes() == content
+    assert content_hash == hashlib.sha256(content).hexdigest()
+    assert hash_file(destination, chunk_size=7) == content_hash
+    assert list(tmp_path.iterdir()) == [destination]
+
+
+def test_save_upload_replaces_existing_file(tmp_path):
+    destination = tmp_path / "doc.txt"
+    destination.write_bytes(b"old content")
+    save_upload(io.BytesIO(b"new"), destination)
+    assert destination.read_bytes() == b"new"
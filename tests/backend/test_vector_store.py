@@ -1,15 +1,23 @@
 # Python code
 
+import asyncio
+import threading
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 
-from pdf_ask.backend.loader import LoaderProtocol
+from pdf_ask.backend.embedding import HashingEmbeddings
+from pdf_ask.backend.loader import LoaderProtocol, ParseDocumentError
+from pdf_ask.backend.uploads import hash_file
 from pdf_ask.backend.vector_store import (
+    EmbeddingMismatchError,
     FaissVectorStore,
+    ReadOnlyVectorStoreError,
     VectorStoreNotAllowedError,
     get_vector_store_class,
+    stored_file_hash,
 )
 
 import pytest
@@ -62,6 +70,48 @@ def test_similarity_search(vector_store, mock_loader):
     assert len(results) > 0
 
 
+def test_similarity_search_skips_documents_removed_after_the_search(
+    vector_store, mock_loader
+):
+    mock_loader.load_document.return_value = [
+        Document(page_content="content", metadata={"source": "source"})
+    ]
+    vector_store.add_file("test_file")
+    vector_store._vector_store.index_to_docstore_id.clear()
+
+    assert vector_store.similarity_search("query") == []
+
+
+def test_similarity_search_while_documents_are_removed(tmp_path):
+    store = FaissVectorStore(None, HashingEmbeddings(), str(tmp_path / "store"))
+    words = [
+        "".join(chr(ord("a") + int(digit)) for digit in f"{i:02}") for i in range(50)
+    ]
+    texts = [f"pump {word} {word}x {word}y" for word in words]
+    store._add_documents(
+        [Document(page_content=text, metadata={"source": "a"}) for text in texts],
+        ids=[f"id{index}" for index in range(50)],
+    )
+    stop = threading.Event()
+
+    def remove_and_add() -> None:
+        while not stop.is_set():
+            store.remove_documents(["id0"], save=False)
+            with store._lock:
+                store._vector_store.add_texts([texts[0]], [{"source": "a"}], ["id0"])
+
+    thread = threading.Thread(target=remove_and_add)
+    thread.start()
+    try:
+        for index in range(1, 50):
+            for _ in range(5):
+                results = store.similarity_search(texts[index], top_k=1)
+                assert results[0]["content"] == texts[index]
+    finally:
+        stop.set()
+        thread.join()
+
+
 def test_get_vector_store_class():
     assert get_vector_store_class("faiss") == FaissVectorStore
     with pytest.raises(VectorStoreNotAllowedError):
@@ -77,3 +127,153 @@ def test_add_same_document(vector_store, mock_loader):
 
     with pytest.raises(FileExistsError):
         vector_store.add_file("test_file")
+
+
+def test_store_manifest_rejects_other_embeddings(vector_store, mock_loader):
+    with pytest.raises(EmbeddingMismatchError):
+        FaissVectorStore(
+            mock_loader, HashingEmbeddings(size=3), vector_store.store_path
+        )
+
+
+def test_asimilarity_search(vector_store, mock_loader, mock_embeddings):
+    mock_loader.load_document.return_value = [
+        Document(page_content="content", metadata={"source": "source"})
+    ]
+    mock_embeddings.aembed_query.return_value = [0.1, 0.2, 0.3]
+    vector_store.add_file("test_file")
+    results = asyncio.run(vector_store.asimilarity_search("query", top_k=1))
+    assert len(results) == 1
+    mock_embeddings.aembed_query.assert_awaited_once_with("query")
+
+
+def test_add_file_records_content_hash(mock_loader, tmp_path):
+    file_path = tmp_path / "pump.txt"
+    file_path.write_text("The pump is rated for 10 bar.")
+    mock_loader.load_document.return_value = [
+        Document(page_content="The pump", metadata={"source": str(file_path)})
+    ]
+    store_path = tmp_path / "vector_store"
+    store = FaissVectorStore(mock_loader, HashingEmbeddings(), str(store_path))
+    store.add_file(str(file_path))
+    assert stored_file_hash(store_path, str(file_path)) == hash_file(file_path)
+
+    store.add_file(str(file_path), force=True)
+    assert mock_loader.load_document.call_count == 2  # noqa: PLR2004
+    assert len(store.list_documents()) == 1
+
+    file_path.write_text("The pump is rated for 12 bar.")
+    store.add_file(str(file_path), force=True)
+    assert mock_loader.load_document.call_count == 3  # noqa: PLR2004
+    assert store.file_hashes[str(file_path)] == hash_file(file_path)
+
+
+def test_read_only_store_maps_index(mock_loader, tmp_path):
+    mock_loader.load_document.return_value = [
+        Document(page_content="The pump", metadata={"source": "pump.txt"})
+    ]
+    store_path = str(tmp_path / "vector_store")
+    FaissVectorStore(mock_loader, HashingEmbeddings(), store_path).add_file("pump.txt")
+
+    store = FaissVectorStore(
+        mock_loader, HashingEmbeddings(), store_path, read_only=True
+    )
+    assert store.similarity_search("pump", top_k=1)[0]["content"] == "The pump"
+    with pytest.raises(ReadOnlyVectorStoreError):
+        store.add_file("valve.txt")
+
+
+def test_read_only_store_survives_saves_of_writer(mock_loader, tmp_path):
+    mock_loader.load_document.return_value = [
+        Document(page_content="The pump", metadata={"source": "pump.txt"})
+    ]
+    store_path = str(tmp_path / "vector_store")
+    writer = FaissVectorStore(mock_loader, HashingEmbeddings(), store_path)
+    writer.add_file("pump.txt")
+    reader = FaissVectorStore(
+        mock_loader, HashingEmbeddings(), store_path, read_only=True
+    )
+    mapped = {path.name: path.stat().st_ino for path in Path(store_path).iterdir()}
+
+    mock_loader.load_document.return_value = [
+        Document(page_content="The valve", metadata={"source": "valve.txt"})
+    ]
+    writer.add_file("valve.txt")
+
+    # Saves write new files rather than rewriting the mapped ones in place
+    assert not any(
+        path.stat().st_ino == mapped.get(path.name)
+        for path in Path(store_path).glob("index*")
+    )
+    assert reader.similarity_search("pump", top_k=1)[0]["content"] == "The pump"
+
+
+@pytest.mark.parametrize("read_only", [False, True])
+def test_mmr_search_skips_near_duplicates(mock_loader, tmp_path, read_only):
+    mock_loader.load_document.return_value = [
+        Document(page_content=text, metadata={"source": "pump.txt"})
+        for text in (
+            "pump pressure rated 10 bar",
+            "pump pressure rated 10 bar maximum",
+            "pump pressure rated 10 bar nominal",
+            "pump motor wiring",
+        )
+    ]
+    store_path = str(tmp_path / "vector_store")
+    FaissVectorStore(mock_loader, HashingEmbeddings(), store_path).add_file("pump.txt")
+    store = FaissVectorStore(
+        mock_loader, HashingEmbeddings(), store_path, read_only=read_only
+    )
+
+    relevant = store.similarity_search("pump pressure", top_k=2)
+    diverse = store.similarity_search("pump pressure", top_k=2, mmr_lambda=0.3)
+
+    assert all("rated" in result["content"] for result in relevant)
+    assert diverse[0] == relevant[0]
+    assert diverse[1]["content"] == "pump motor wiring"
+    assert store.batch_similarity_search(["pump pressure"], 2, 0.3) == [diverse]
+    assert store.similarity_search("pump", top_k=10, mmr_lambda=0.5)[-1]["id"] == 3  # noqa: PLR2004
+    with pytest.raises(ValueError, match="between 0 and 1"):
+        store.similarity_search("pump", mmr_lambda=2)
+
+
+def test_add_file_streams_batches_and_rolls_back_on_failure(mock_loader, tmp_path):
+    store = FaissVectorStore(
+        mock_loader, HashingEmbeddings(), str(tmp_path / "vector_store")
+    )
+    mock_loader.load_document.return_value = [
+        Document(page_content="old pump", metadata={"source": "pump.txt"})
+    ]
+    store.add_file("pump.txt")
+    old_ids = list(store.documents_source["pump.txt"])
+
+    def failing_documents():
+        for number in range(300):
+            yield Document(
+                page_content=f"pump {number}", metadata={"source": "pump.txt"}
+            )
+        msg = "truncated file"
+        raise ParseDocumentError(msg)
+
+    mock_loader.load_document.return_value = failing_documents()
+    with (
+        patch("pdf_ask.backend.vector_store.EMBED_BATCH_SIZE", 100),
+        pytest.raises(ParseDocumentError),
+    ):
+        store.add_file("pump.txt", force=True)
+    assert store.documents_source["pump.txt"] == old_ids
+    assert store.list_documents() == old_ids
+
+    stages = []
+    mock_loader.load_document.return_value = (
+        Document(page_content=f"pump {number}", metadata={"source": "pump.txt"})
+        for number in range(250)
+    )
+    with patch("pdf_ask.backend.vector_store.EMBED_BATCH_SIZE", 100):
+        store.add_file(
+            "pump.txt", force=True, progress=lambda *args: stages.append(args)
+        )
+    assert stages[:2] == [("split", 100, 100), ("embedding", 100, 100)]
+    assert stages[-1] == ("indexed", 250, 250)
+    assert len(store.list_documents()) == 250  # noqa: PLR2004
+    assert not set(old_ids) & set(store.list_documents())
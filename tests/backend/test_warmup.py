@@ -0,0 +1,133 @@
+# Python code
+
+import sqlite3
+import time
+from contextlib import closing
+from http import HTTPStatus
+
+from pdf_ask.backend.api import PdfAskApi, WorkerReadiness
+from pdf_ask.backend.chat_model import ExtractiveChatModel
+from pdf_ask.backend.embedding import HashingEmbeddings
+from pdf_ask.backend.jobs import IngestionJobQueue
+from pdf_ask.backend.loader import LocalLoader
+from pdf_ask.backend.metrics import METRICS
+from pdf_ask.backend.store_cache import StoreCache
+from pdf_ask.backend.vector_store import FaissVectorStore
+from pdf_ask.backend.warmup import StoreUsageLog, StoreWarmer, WarmupPlan
+
+import pytest
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    store_path = tmp_path / "resources" / "manuals"
+    store_path.mkdir(parents=True)
+    file_path = store_path / "pump.txt"
+    file_path.write_text("The pump is rated for 10 bar.")
+    FaissVectorStore(LocalLoader(), HashingEmbeddings(), str(store_path)).add_file(
+        str(file_path)
+    )
+    return store_path.as_posix()
+
+
+def test_usage_log_keeps_recent_stores_and_queries(tmp_path):
+    usage_log = StoreUsageLog(str(tmp_path / "usage.sqlite3"), max_queries=2)
+    usage_log.record("stores/a", "hashing", "recursive", ["pump", "valve"])
+    usage_log.record("stores/b", "openAI", "recursive")
+    usage_log.record("stores/a", "hashing", "recursive", ["pump", "motor"])
+
+    assert [usage.store_path for usage in usage_log.recent_stores(5)] == [
+        "stores/a",
+        "stores/b",
+    ]
+    assert [usage.store_path for usage in usage_log.recent_stores(5, "openAI")] == [
+        "stores/b"
+    ]
+    assert usage_log.recent_queries("stores/a", 5) == ["motor", "pump"]
+
+
+def test_usage_log_writes_uses_in_the_background(tmp_path):
+    db_path = tmp_path / "usage.sqlite3"
+    usage_log = StoreUsageLog(str(db_path), flush_interval=0.05)
+    for _ in range(3):
+        usage_log.record("stores/a", "hashing", "recursive", ["pump"])
+
+    def uses():
+        with closing(sqlite3.connect(db_path)) as connection:
+            return connection.execute("SELECT uses FROM store_usage").fetchall()
+
+    deadline = time.monotonic() + 10
+    while not uses() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert uses() == [(3,)]
+
+
+def test_warm_up_opens_stores_and_replays_queries(tmp_path, store_path):
+    usage_log = StoreUsageLog(str(tmp_path / "usage.sqlite3"))
+    usage_log.record(store_path, "hashing", "recursive", ["pump"])
+    store_cache = StoreCache()
+    warmer = StoreWarmer(store_cache, usage_log)
+    embedded, _ = METRICS.stage_seconds("embed_query")
+
+    plan = WarmupPlan(stores=(str(tmp_path / "missing"),), recent=5, queries=3)
+    warmer.start(plan, "hashing", "recursive").join(timeout=30)
+
+    assert warmer.status() == {
+        "ready": True,
+        "warmed": 1,
+        "total": 2,
+        "failed": [(tmp_path / "missing").as_posix()],
+    }
+    assert METRICS.stage_seconds("embed_query")[0] > embedded
+    assert store_cache.get(store_path, "hashing", "recursive").similarity_search("pump")
+
+
+def test_api_is_ready_after_warm_up(tmp_path, store_path):
+    job_queue = IngestionJobQueue(str(tmp_path / "jobs.sqlite3"))
+    api = PdfAskApi(
+        str(tmp_path / "resources"),
+        ExtractiveChatModel(),
+        job_queue,
+        embedder_name="hashing",
+        splitter_name="recursive",
+        usage_log=StoreUsageLog(str(tmp_path / "usage.sqlite3")),
+        warmup_plan=WarmupPlan(stores=(store_path,)),
+    )
+    api.warmer.ready.clear()
+    assert api.ready()[0] == HTTPStatus.SERVICE_UNAVAILABLE
+
+    api.start_warm_up()
+    assert api.warmer.ready.wait(timeout=30)
+    assert api.ready() == (
+        HTTPStatus.OK,
+        {"ready": True, "warmed": 1, "total": 1, "failed": []},
+    )
+
+    api.search("manuals", {"query": "pump"})
+    assert api.usage_log.recent_queries(store_path, 5) == ["pump"]
+    job_queue.shutdown()
+
+
+def test_api_is_ready_once_every_worker_is(tmp_path, store_path):
+    job_queue = IngestionJobQueue(str(tmp_path / "jobs.sqlite3"), run_jobs=False)
+    api = PdfAskApi(
+        str(tmp_path / "resources"),
+        ExtractiveChatModel(),
+        job_queue,
+        embedder_name="hashing",
+        splitter_name="recursive",
+        warmup_plan=WarmupPlan(stores=(store_path,)),
+    )
+    readiness = WorkerReadiness(2)
+
+    api.start_warm_up(readiness, 0)
+    assert api.warmer.ready.wait(timeout=30)
+    deadline = time.monotonic() + 10
+    while not readiness.ready_workers() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    status, content = api.ready()
+    assert status == HTTPStatus.SERVICE_UNAVAILABLE
+    assert content["workers_ready"] == 1
+
+    readiness.mark_ready(1)
+    assert api.ready()[0] == HTTPStatus.OK
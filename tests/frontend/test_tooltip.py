@@ -0,0 +1,17 @@
+# Python code
+
+from pdf_ask.frontend.tooltip import replace_text_with_tooltips
+
+
+def test_replace_text_with_tooltips_in_one_pass():
+    text = replace_text_with_tooltips(
+        "Rated for 10 bar [1][2].", {"[1]": "see [2]", "[2]": "<b>pump</b>"}
+    )
+    assert text.count('class="tooltip"') == 2  # noqa: PLR2004
+    assert "see [2]</span>" in text
+    assert "&lt;b&gt;pump&lt;/b&gt;" in text
+    assert "<style>" not in text
+
+
+def test_replace_text_without_tooltips():
+    assert replace_text_with_tooltips("No citation.", {}) == "No citation."